@@ -47,6 +47,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'apps.products.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -157,6 +158,19 @@ else:
 
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# 上传图片的响应式版本（media/variants/），在进程池中生成；AVIF 需要带 libavif 的 Pillow，不支持时自动跳过
+IMAGE_VARIANT_WIDTHS = [320, 640, 960, 1280, 1920]
+IMAGE_VARIANT_FORMATS = ['webp']  # 可加入 'avif'
+IMAGE_VARIANT_WORKERS = 2
+
+# 按需缩放图片（/media-resize/<宽>x<高>/<路径>）的磁盘缓存，超过总大小上限时淘汰最久未使用的文件
+IMAGE_RESIZE_CACHE_DIR = os.path.join(MEDIA_ROOT, '.resize-cache')
+IMAGE_RESIZE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+IMAGE_RESIZE_MAX_DIMENSION = 2560
+# 允许请求的缩放尺寸（管理后台缩略图使用 120x120），新增用途时在这里加入需要的尺寸
+IMAGE_RESIZE_ALLOWED_SIZES = ['64x64', '120x120', '240x240', '480x480', '0x120', '320x0', '640x0', '1280x0']
+IMAGE_RESIZE_MAX_AGE = 3600  # 不带原图版本号的缩放地址的缓存秒数
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -166,8 +180,9 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # 安装 orjson 时使用 orjson 编码；嵌套分类、模板区块等稳定子对象预编码后直接拼接
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'apps.products.renderers.FastJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
@@ -176,6 +191,36 @@ REST_FRAMEWORK = {
     ],
 }
 
+# 缓存
+# 默认为进程内缓存：API响应条目、重建锁、翻译等只在本进程内共享，每个worker各自重建一份。
+# API响应缓存的命名空间版本号保存在数据库中（products.CacheNamespace），管理命令和其他worker
+# 修改数据后的失效对所有进程可见（最多延迟 API_CACHE_VERSION_TTL 秒）。
+# 多worker部署建议改为共享缓存，响应条目和重建锁即可跨worker共享，例如：
+# CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/1'}}
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'aluminum',
+    }
+}
+
+# API响应缓存（单飞合并 + stale-while-revalidate）
+API_CACHE_ENABLED = True
+API_CACHE_VERSION_TTL = 1  # 各进程缓存命名空间版本号的秒数
+API_CACHE_POLICIES = {
+    'default': {'fresh_ttl': 60, 'stale_ttl': 600},
+    # 产品列表：编辑后并发请求最多，高压力时优先返回旧副本
+    'products.list': {'fresh_ttl': 120, 'stale_ttl': 1800, 'shed_load': True},
+    'products.featured': {'fresh_ttl': 300, 'stale_ttl': 1800, 'shed_load': True},
+    'products.detail': {'fresh_ttl': 120, 'stale_ttl': 1800, 'shed_load': True},
+    'products.search': {'fresh_ttl': 60, 'stale_ttl': 300},
+    'categories.list': {'fresh_ttl': 600, 'stale_ttl': 3600, 'shed_load': True},
+}
+
+# API响应压缩（gzip，安装 brotli 时优先 br），小于阈值的响应不压缩
+API_COMPRESSION_ENABLED = True
+API_COMPRESSION_MIN_SIZE = 1024
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
@@ -21,10 +21,11 @@ from django.views.static import serve
 from rest_framework import routers
 
 # Import ViewSets
-from apps.products.views import CategoryViewSet, ProductViewSet, ProductImageViewSet, TranslationViewSet, ProductTemplateViewSet
+from apps.products.views import CategoryViewSet, ProductViewSet, ProductImageViewSet, TranslationViewSet, ProductTemplateViewSet, PageViewSet
 from apps.news.views import TagViewSet, ArticleViewSet
 from apps.inquiry.views import InquiryViewSet, ContactInfoViewSet
 from apps.about.views import CompanyInfoViewSet, AdvantageViewSet, CertificateViewSet, FactoryImageViewSet, FriendLinkViewSet
+from apps.products.image_resize import serve_resized
 
 # Create router and register ViewSets
 router = routers.DefaultRouter()
@@ -33,6 +34,7 @@ router.register(r'products', ProductViewSet)
 router.register(r'product-images', ProductImageViewSet)
 router.register(r'product-templates', ProductTemplateViewSet)
 router.register(r'translations', TranslationViewSet, basename='translation')
+router.register(r'pages', PageViewSet, basename='page')
 router.register(r'tags', TagViewSet)
 router.register(r'articles', ArticleViewSet)
 router.register(r'inquiries', InquiryViewSet)
@@ -60,6 +62,8 @@ urlpatterns = [
 # 无论开发还是生产环境，都提供静态文件和媒体文件
 # 使用re_path确保能匹配所有静态文件路径
 urlpatterns += [
+    # 按需缩放图片 - /media-resize/<宽>x<高>/<原图路径>
+    re_path(r'^media-resize/(?P<width>\d+)x(?P<height>\d+)/(?P<path>.+)$', serve_resized),
     re_path(r'^static/(?P<path>.*)$', serve, {'document_root': settings.STATIC_ROOT}),
     re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
 ]
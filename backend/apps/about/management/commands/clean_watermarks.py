@@ -0,0 +1,181 @@
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils._os import safe_join
+
+from apps.products.caching import response_cache
+from apps.products.exports import export_format_for_path, write_export
+from apps.products.image_variants import VARIANT_DIR, VARIANT_FORMATS, save_variants, submit_variants
+from apps.products.models import ImageAsset
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+WORK_DIR = '.watermark'             # MEDIA_ROOT 下的清单、备份和报告目录
+SKIPPED_DIRS = {VARIANT_DIR, 'imports'}
+MANIFEST_SAVE_INTERVAL = 100        # 每处理多少张图片保存一次清单，中断后重新执行可继续
+REPORT_COLUMNS = ['path', 'status', 'regions', 'sha256_before', 'sha256_after', 'error']
+
+
+def _iter_images(root, relative_dirs):
+    """逐个产出图片相对于 MEDIA_ROOT 的路径，跳过隐藏目录、图片版本目录和导入文件目录"""
+    for relative_dir in relative_dirs:
+        for current, dirs, files in os.walk(safe_join(root, relative_dir)):
+            dirs[:] = sorted(
+                name for name in dirs
+                if not name.startswith('.') and not (current == root and name in SKIPPED_DIRS)
+            )
+            for name in sorted(files):
+                if not name.startswith('.') and name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.relpath(os.path.join(current, name), root).replace(os.sep, '/')
+
+
+def _load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as file:
+        return json.load(file).get('files', {})
+
+
+def _save_manifest(path, files):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump({'version': 1, 'files': files}, file, ensure_ascii=False, indent=1)
+    os.replace(temp_path, path)
+
+
+class Command(BaseCommand):
+    help = (
+        '在进程池中扫描媒体库图片的角落水印；默认只检测并输出报告，加 --apply 才去除（原图备份在 '
+        'MEDIA_ROOT/.watermark/backups）。清单记录已处理图片的内容哈希，重新执行时跳过已处理的图片'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dirs', nargs='*', help='要扫描的 MEDIA_ROOT 下的目录（如 factory_images）')
+        parser.add_argument('--all', action='store_true', help='扫描整个 MEDIA_ROOT（不指定目录时必须给出）')
+        parser.add_argument('--apply', action='store_true', help='去除检测到的水印并改写原图（默认只检测，不修改图片和清单）')
+        parser.add_argument('--force', action='store_true', help='忽略清单，重新处理所有图片')
+        parser.add_argument('--threshold', type=int, help='水印像素的亮度阈值（0-255，默认180）')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='进程数（默认为CPU核数）')
+        parser.add_argument('--backup-dir', help='原图备份目录（默认 MEDIA_ROOT/.watermark/backups）')
+        parser.add_argument('--report', help='报告文件（.csv/.xlsx/.ndjson，默认 MEDIA_ROOT/.watermark/report-<时间>.csv）')
+
+    def handle(self, *args, **options):
+        try:
+            from apps.about.watermark import BRIGHTNESS_THRESHOLD, init_worker, process_image
+        except ImportError as e:
+            raise CommandError(f'水印检测需要 numpy: {e}')
+
+        root = os.path.abspath(settings.MEDIA_ROOT)
+        if not options['dirs'] and not options['all']:
+            raise CommandError('请指定要扫描的目录，或使用 --all 扫描整个 MEDIA_ROOT')
+        relative_dirs = options['dirs'] or ['']
+        for relative_dir in relative_dirs:
+            try:
+                directory = safe_join(root, relative_dir)
+            except SuspiciousFileOperation:
+                raise CommandError(f'目录不在 MEDIA_ROOT 中: {relative_dir}')
+            if not os.path.isdir(directory):
+                raise CommandError(f'目录不存在: {directory}')
+
+        work_dir = os.path.join(root, WORK_DIR)
+        manifest_path = os.path.join(work_dir, 'manifest.json')
+        backup_dir = options['backup_dir'] or os.path.join(work_dir, 'backups')
+        report_path = options['report'] or os.path.join(
+            work_dir, f'report-{timezone.localtime().strftime("%Y%m%d%H%M%S")}.csv'
+        )
+        dry_run = not options['apply']
+
+        manifest = {} if options['force'] else _load_manifest(manifest_path)
+        known_hashes = {
+            entry[key] for entry in manifest.values() if entry.get('status') in ('clean', 'cleaned', 'skipped')
+            for key in ('sha256_before', 'sha256_after')
+        }
+
+        # 大小和修改时间与清单一致的图片不必读取内容；其余图片在子进程中计算哈希后与清单比对
+        names, skipped = [], 0
+        for name in _iter_images(root, relative_dirs):
+            stat = os.stat(os.path.join(root, name))
+            entry = manifest.get(name)
+            if entry and entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns:
+                skipped += 1
+            else:
+                names.append(name)
+        self.stdout.write(f'待处理 {len(names)} 张图片（清单中未变化 {skipped} 张）{"，只检测（加 --apply 去除水印）" if dry_run else ""}')
+
+        start_time = time.time()
+        counts = {'clean': 0, 'detected': 0, 'cleaned': 0, 'skipped': skipped, 'error': 0}
+        report, cleaned = [], []
+        with ProcessPoolExecutor(
+            max_workers=options['workers'], mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker, initargs=(known_hashes,),
+        ) as executor:
+            futures = {
+                executor.submit(
+                    process_image, os.path.join(root, name), os.path.join(backup_dir, name),
+                    options['threshold'] or BRIGHTNESS_THRESHOLD, dry_run,
+                ): name
+                for name in names
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                name = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    counts['error'] += 1
+                    report.append({'path': name, 'status': 'error', 'error': str(e)})
+                    self.stdout.write(self.style.WARNING(f'  {name}: {e}'))
+                    continue
+
+                counts[result['status']] += 1
+                if result['status'] != 'skipped':
+                    regions = [f'{region[0]} ({region[1]}-{region[2]}, {region[3]}-{region[4]})' for region in result['regions']]
+                    report.append({'path': name, **result, 'regions': regions})
+                if result['status'] == 'cleaned':
+                    cleaned.append(name)
+                if not dry_run:
+                    stat = os.stat(os.path.join(root, name))
+                    if result['status'] == 'skipped' and name in manifest:
+                        # 内容未变（如只更新了修改时间），保留原来的处理记录
+                        manifest[name].update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                    else:
+                        manifest[name] = {
+                            **result, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                            'processed_at': timezone.now().isoformat(),
+                        }
+                    if done % MANIFEST_SAVE_INTERVAL == 0:
+                        _save_manifest(manifest_path, manifest)
+                if done % 100 == 0:
+                    self.stdout.write(f'  已处理 {done}/{len(names)}')
+
+            if not dry_run:
+                _save_manifest(manifest_path, manifest)
+
+            # 已生成响应式版本的图片按去除水印后的内容重新生成
+            regenerate = set(ImageAsset.objects.filter(name__in=cleaned).values_list('name', flat=True))
+            if regenerate and VARIANT_FORMATS:
+                variant_futures = {submit_variants(name, executor): name for name in regenerate}
+                for future in as_completed(variant_futures):
+                    try:
+                        save_variants(variant_futures[future], future.result())
+                    except Exception as e:
+                        self.stdout.write(self.style.WARNING(f'  {variant_futures[future]}: 图片版本生成失败 {e}'))
+
+        if cleaned:
+            response_cache.invalidate('products', 'categories', 'templates', 'factory_images')
+
+        if report:
+            os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+            write_export(export_format_for_path(report_path), REPORT_COLUMNS, report, report_path, title='watermarks')
+            self.stdout.write(f'报告: {report_path}')
+        self.stdout.write(self.style.SUCCESS(
+            f'水印处理完成：去除 {counts["cleaned"]} 张，检测到 {counts["detected"]} 张，无水印 {counts["clean"]} 张，'
+            f'跳过 {counts["skipped"]} 张，失败 {counts["error"]} 张，耗时 {time.time() - start_time:.2f} 秒'
+        ))
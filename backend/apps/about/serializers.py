@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from apps.products.serializers import ImageVariantsField
 from .models import CompanyInfo, Advantage, Certificate, FactoryImage, FriendLink
 
 
@@ -20,20 +21,22 @@ class AdvantageSerializer(serializers.ModelSerializer):
 
 class CertificateSerializer(serializers.ModelSerializer):
     """资质证书序列化器"""
+    image_variants = ImageVariantsField(source='image')
     
     class Meta:
         model = Certificate
         fields = [
-            'id', 'name', 'description', 'image', 'issue_date', 'order'
+            'id', 'name', 'description', 'image', 'image_variants', 'issue_date', 'order'
         ]
 
 
 class FactoryImageSerializer(serializers.ModelSerializer):
     """工厂图片序列化器"""
+    image_variants = ImageVariantsField(source='image')
     
     class Meta:
         model = FactoryImage
-        fields = ['id', 'title', 'description', 'image', 'order']
+        fields = ['id', 'title', 'description', 'image', 'image_variants', 'order']
 
 
 class TranslatedAdvantageSerializer(serializers.ModelSerializer):
@@ -1,3 +1,60 @@
-from django.test import TestCase
+import io
+import json
+import shutil
+import tempfile
+from pathlib import Path
 
-# Create your tests here.
+import numpy as np
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+
+class CleanWatermarksTests(TestCase):
+    """clean_watermarks：默认只检测，--apply 才改写原图"""
+
+    def setUp(self):
+        self.media_root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=str(self.media_root))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        # 深色带纹理的图片，右下角 100x100 的角落中有一块 20x60 的白色水印
+        pixels = np.random.default_rng(0).integers(0, 100, size=(500, 500, 3), dtype=np.uint8)
+        pixels[450:470, 420:480] = 255
+        (self.media_root / 'factory_images').mkdir()
+        self.image = self.media_root / 'factory_images' / 'plant.png'
+        Image.fromarray(pixels).save(self.image)
+        self.original = self.image.read_bytes()
+        self.work_dir = self.media_root / '.watermark'
+
+    def run_command(self, *args):
+        report = self.media_root / 'report.ndjson'
+        call_command('clean_watermarks', 'factory_images', *args, workers=1, report=str(report), stdout=io.StringIO())
+        if not report.exists():
+            return []  # 没有需要处理的图片时不写报告
+        rows = [json.loads(line) for line in report.read_text(encoding='utf-8').splitlines()]
+        report.unlink()
+        return rows
+
+    def test_detection_only_by_default(self):
+        rows = self.run_command()
+        self.assertEqual([(row['path'], row['status']) for row in rows], [('factory_images/plant.png', 'detected')])
+        self.assertTrue(rows[0]['regions'][0].startswith('bottom_right'))
+        # 只检测时不改写原图，也不写备份和清单
+        self.assertEqual(self.image.read_bytes(), self.original)
+        self.assertFalse(self.work_dir.exists())
+
+    def test_apply_cleans_and_keeps_a_backup(self):
+        rows = self.run_command('--apply')
+        self.assertEqual(rows[0]['status'], 'cleaned')
+        self.assertNotEqual(self.image.read_bytes(), self.original)
+        with Image.open(self.image) as image:
+            self.assertLess(np.asarray(image)[450:470, 420:480].mean(), 180)
+        self.assertEqual((self.work_dir / 'backups' / 'factory_images' / 'plant.png').read_bytes(), self.original)
+        manifest = json.loads((self.work_dir / 'manifest.json').read_text(encoding='utf-8'))
+        self.assertEqual(manifest['files']['factory_images/plant.png']['status'], 'cleaned')
+
+        # 清单中未变化的图片再次执行时跳过
+        self.assertEqual(self.run_command('--apply'), [])
@@ -0,0 +1,189 @@
+"""
+角落水印检测与去除 - clean_watermarks 命令使用
+
+检测逻辑来自 remove_watermark_v3.py：在四个角（宽30%、高20%中的较小值为边长）中查找亮度超过阈值的像素，
+占比超过5%时以亮像素的外接矩形（外扩20像素）作为水印区域；修复时用相邻区域缩放后覆盖，
+找不到相邻区域时用周围的平均颜色和模糊纹理混合填充。
+
+白底产品图的角落整体都是亮的，不是水印：亮像素占比超过40%、或角落颜色几乎一致的角落跳过，
+四个角都检测到时视为背景，不做处理。
+
+process_image 在进程池的子进程中执行，只依赖 Pillow 和 numpy，本模块不导入模型。
+"""
+import hashlib
+import os
+import shutil
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+
+BRIGHTNESS_THRESHOLD = 180
+MIN_BRIGHT_RATIO = 0.05
+MAX_BRIGHT_RATIO = 0.4      # 亮像素占比超过该值时是亮色背景而不是水印
+MIN_CORNER_STDDEV = 8.0     # 角落亮度的标准差低于该值时颜色几乎一致（纯色背景）
+REGION_MARGIN = 20
+SAVE_QUALITY = 95
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_hash(path):
+    """文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def detect_watermark_regions(pixels, threshold=BRIGHTNESS_THRESHOLD):
+    """检测四个角的水印区域，返回 [(y_start, y_end, x_start, x_end, 角落名称)]"""
+    height, width = pixels.shape[:2]
+    corner_size = min(int(width * 0.3), int(height * 0.2))
+    if corner_size <= 0:
+        return []
+
+    corners = [
+        ('bottom_right', height - corner_size, height, width - corner_size, width),
+        ('bottom_left', height - corner_size, height, 0, corner_size),
+        ('top_right', 0, corner_size, width - corner_size, width),
+        ('top_left', 0, corner_size, 0, corner_size),
+    ]
+    regions = []
+    for name, y_start, y_end, x_start, x_end in corners:
+        brightness = pixels[y_start:y_end, x_start:x_end].mean(axis=2)
+        bright_mask = brightness > threshold
+        if not MIN_BRIGHT_RATIO < bright_mask.mean() <= MAX_BRIGHT_RATIO or brightness.std() < MIN_CORNER_STDDEV:
+            continue
+        rows, columns = np.nonzero(bright_mask)
+        regions.append((
+            y_start + max(0, int(rows.min()) - REGION_MARGIN),
+            y_start + min(corner_size, int(rows.max()) + REGION_MARGIN + 1),
+            x_start + max(0, int(columns.min()) - REGION_MARGIN),
+            x_start + min(corner_size, int(columns.max()) + REGION_MARGIN + 1),
+            name,
+        ))
+    if len(regions) == len(corners):
+        return []  # 水印不会同时出现在四个角，是背景或边框
+    return regions
+
+
+def inpaint_region(pixels, y_start, y_end, x_start, x_end):
+    """用相邻区域填充水印区域（原地修改）"""
+    height, width = pixels.shape[:2]
+    y_start, y_end = max(0, y_start), min(height, y_end)
+    x_start, x_end = max(0, x_start), min(width, x_end)
+    region_height, region_width = y_end - y_start, x_end - x_start
+    if region_height <= 0 or region_width <= 0:
+        return
+
+    padding = max(region_width, region_height) * 2
+    is_top, is_bottom = y_start < height / 2, y_end > height / 2
+    is_left, is_right = x_start < width / 2, x_end > width / 2
+
+    # 右下角取左上方、右上角取左下方、左上角取右下方的相邻区域，缩放后覆盖
+    candidates = []
+    if is_bottom and is_right:
+        candidates.append(pixels[max(0, y_start - padding):y_start, max(0, x_start - padding):x_start])
+    if is_top and is_right:
+        candidates.append(pixels[y_end:min(height, y_end + padding), max(0, x_start - padding):x_start])
+    if is_top and is_left:
+        candidates.append(pixels[y_end:min(height, y_end + padding), x_end:min(width, x_end + padding)])
+    for reference in candidates:
+        if reference.size:
+            reference = Image.fromarray(np.ascontiguousarray(reference))
+            pixels[y_start:y_end, x_start:x_end] = np.asarray(
+                reference.resize((region_width, region_height), Image.Resampling.LANCZOS)
+            )
+            return
+
+    # 其他情况：周围区域的平均颜色（30%）与模糊纹理（70%）混合
+    ref_y_start, ref_y_end = max(0, y_start - padding), min(height, y_end + padding)
+    ref_x_start, ref_x_end = max(0, x_start - padding), min(width, x_end + padding)
+    reference = np.ascontiguousarray(pixels[ref_y_start:ref_y_end, ref_x_start:ref_x_end])
+    inner = (slice(y_start - ref_y_start, y_end - ref_y_start), slice(x_start - ref_x_start, x_end - ref_x_start))
+    mask = np.ones(reference.shape[:2], dtype=bool)
+    mask[inner] = False
+    if not mask.any():
+        return
+    average = reference[mask].reshape(-1, 3).mean(axis=0)
+    blurred = np.asarray(Image.fromarray(reference).filter(ImageFilter.GaussianBlur(radius=5)))
+    pixels[y_start:y_end, x_start:x_end] = (average * 0.3 + blurred[inner] * 0.7).astype(np.uint8)
+
+
+def clean_image(source, target=None, threshold=BRIGHTNESS_THRESHOLD, dry_run=False, backup=None):
+    """检测并去除水印，返回检测到的区域列表
+
+    写入 target（默认覆盖原图，先写临时文件再替换），保持原图格式、EXIF（含方向）和ICC色彩配置；
+    透明通道原样保留（带透明色的调色板图片保存为 RGBA），灰度和 CMYK 图片保持原模式。
+    指定 backup 时写入前把原图复制到该路径（已有备份时不覆盖）。dry_run 时只检测不写入。
+    """
+    with Image.open(source) as image:
+        image_format, mode = image.format, image.mode
+        save_options = {
+            key: image.info[key] for key in ('exif', 'icc_profile', 'dpi') if image.info.get(key)
+        }
+        has_alpha = mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        rgb = image.convert('RGBA') if has_alpha else image
+        alpha = rgb.getchannel('A') if has_alpha else None
+        pixels = np.array(rgb.convert('RGB'))
+
+    regions = detect_watermark_regions(pixels, threshold)
+    if not regions or dry_run:
+        return regions
+    for y_start, y_end, x_start, x_end, _ in regions:
+        inpaint_region(pixels, y_start, y_end, x_start, x_end)
+
+    result = Image.fromarray(pixels)
+    if mode in ('L', 'LA', 'CMYK'):
+        result = result.convert(mode[0] if mode == 'LA' else mode)
+    if alpha is not None:
+        result.putalpha(alpha)
+    target = target or source
+    if backup and not os.path.exists(backup):
+        os.makedirs(os.path.dirname(backup), exist_ok=True)
+        shutil.copy2(source, backup)
+    temp_path = f'{target}.{os.getpid()}.tmp'
+    try:
+        if image_format in ('JPEG', 'WEBP'):
+            save_options['quality'] = SAVE_QUALITY
+        result.save(temp_path, image_format, **save_options)
+        os.replace(temp_path, target)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return regions
+
+
+# ---------- 进程池 ----------
+
+_known_hashes = frozenset()
+
+
+def init_worker(known_hashes):
+    """进程池初始化：清单中已处理过的内容哈希（处理前后的哈希都包括在内）"""
+    global _known_hashes
+    _known_hashes = frozenset(known_hashes)
+
+
+def process_image(source, backup=None, threshold=BRIGHTNESS_THRESHOLD, dry_run=False):
+    """在子进程中执行：返回 {'status', 'regions', 'sha256_before', 'sha256_after'}
+
+    status 为 skipped（内容已处理过）、clean（未检测到水印）、detected（dry_run 时检测到水印）或 cleaned。
+    """
+    before = file_hash(source)
+    if before in _known_hashes:
+        return {'status': 'skipped', 'regions': [], 'sha256_before': before, 'sha256_after': before}
+    regions = clean_image(source, threshold=threshold, dry_run=dry_run, backup=backup)
+    if not regions:
+        status, after = 'clean', before
+    elif dry_run:
+        status, after = 'detected', before
+    else:
+        status, after = 'cleaned', file_hash(source)
+    return {
+        'status': status,
+        'regions': [[name, y_start, y_end, x_start, x_end] for y_start, y_end, x_start, x_end, name in regions],
+        'sha256_before': before,
+        'sha256_after': after,
+    }
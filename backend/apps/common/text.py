@@ -0,0 +1,74 @@
+"""
+全文搜索的文本处理 - 产品搜索（apps.products.search）和文章搜索（apps.news.search）共用
+
+中文按二元组（bigram）切分后写入FTS5索引，查询时做同样的切分，从而支持中文子串搜索。
+"""
+import html
+import re
+
+
+CJK_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+WORD_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[^\W\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+
+
+def _cjk_bigrams(run):
+    """将连续的中文字符切分为二元组，末字单独保留以支持单字前缀查询"""
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)] + [run[-1]]
+
+
+def tokenize_text(text):
+    """索引前的文本预处理：中文转为二元组，其他文字交给FTS5的unicode61分词器"""
+    if not text:
+        return ''
+    return CJK_RE.sub(lambda m: ' ' + ' '.join(_cjk_bigrams(m.group())) + ' ', text)
+
+
+def build_match_query(query):
+    """将用户输入转换为FTS5 MATCH表达式（各词之间为AND关系）"""
+    terms = []
+    for word in WORD_RE.findall(query or ''):
+        if CJK_RE.fullmatch(word):
+            if len(word) == 1:
+                terms.append(f'"{word}"*')
+            else:
+                terms.extend(f'"{word[i:i + 2]}"' for i in range(len(word) - 1))
+        else:
+            terms.append(f'"{word}"*')
+    return ' '.join(terms)
+
+
+TAG_RE = re.compile(r'<[^>]+>')
+
+
+def make_snippet(text, query, length=160):
+    """从原文中截取命中词最密集的片段，并用<mark>高亮命中词（HTML已转义）"""
+    text = re.sub(r'\s+', ' ', TAG_RE.sub(' ', text or '')).strip()
+    words = sorted(set(WORD_RE.findall(query or '')), key=len, reverse=True)
+    if not text or not words:
+        return html.escape(text[:length])
+
+    pattern = re.compile('|'.join(re.escape(word) for word in words), re.IGNORECASE)
+    positions = [m.start() for m in pattern.finditer(text)]
+    start = 0
+    if positions:
+        # 选择包含最多命中词的窗口：滑动窗口，positions 有序，j 为窗口右端之后的第一个位置
+        best, best_count, j = positions[0], 0, 0
+        for i, position in enumerate(positions):
+            while j < len(positions) and positions[j] < position + length:
+                j += 1
+            if j - i > best_count:
+                best, best_count = position, j - i
+        start = max(0, best - length // 4)
+    end = min(len(text), start + length)
+
+    window = text[start:end]
+    parts = []
+    last = 0
+    for m in pattern.finditer(window):
+        parts.append(html.escape(window[last:m.start()]))
+        parts.append(f'<mark>{html.escape(m.group())}</mark>')
+        last = m.end()
+    parts.append(html.escape(window[last:]))
+    return ('…' if start > 0 else '') + ''.join(parts) + ('…' if end < len(text) else '')
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.utils import timezone
 from .models import Inquiry, ContactInfo
 
 
@@ -30,13 +31,14 @@ class InquiryAdmin(admin.ModelAdmin):
     actions = ['mark_as_replied', 'mark_as_processing']
     
     def mark_as_replied(self, request, queryset):
-        from django.utils import timezone
-        updated = queryset.update(status='replied', replied_at=timezone.now())
+        now = timezone.now()
+        # queryset.update 不会自动更新 auto_now 字段，变更流按 updated_at 同步
+        updated = queryset.update(status='replied', replied_at=now, updated_at=now)
         self.message_user(request, f'成功标记 {updated} 条询价为已回复')
     mark_as_replied.short_description = '标记为已回复'
     
     def mark_as_processing(self, request, queryset):
-        updated = queryset.update(status='processing')
+        updated = queryset.update(status='processing', updated_at=timezone.now())
         self.message_user(request, f'成功标记 {updated} 条询价为处理中')
     mark_as_processing.short_description = '标记为处理中'
 
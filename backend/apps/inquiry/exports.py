@@ -0,0 +1,33 @@
+"""
+询价导出 - 按状态、创建日期范围过滤，逐条产出询价行（写出见 apps.products.exports）
+"""
+from rest_framework.exceptions import ValidationError
+
+from apps.products.exports import EXPORT_CHUNK_SIZE, filter_date_range
+from .models import Inquiry
+
+
+INQUIRY_EXPORT_COLUMNS = [
+    'id', 'created_at', 'status', 'name', 'company', 'email', 'phone', 'whatsapp',
+    'subject', 'message', 'product_name', 'quantity', 'reply', 'replied_at', 'source', 'ip_address',
+]
+
+STATUSES = dict(Inquiry.STATUS_CHOICES)
+
+
+def filter_inquiries(queryset, params):
+    """询价导出的过滤：status（可用逗号分隔多个）、创建日期范围"""
+    if params.get('status'):
+        statuses = [status for status in params['status'].split(',') if status]
+        invalid = [status for status in statuses if status not in STATUSES]
+        if invalid:
+            raise ValidationError({'status': f'状态必须为 {"/".join(STATUSES)}'})
+        queryset = queryset.filter(status__in=statuses)
+    return filter_date_range(queryset, 'created_at', params)
+
+
+def iter_inquiry_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    for inquiry in queryset.order_by('id').iterator(chunk_size=chunk_size):
+        row = {column: getattr(inquiry, column) for column in INQUIRY_EXPORT_COLUMNS}
+        row['status'] = str(STATUSES.get(inquiry.status, inquiry.status))
+        yield row
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+from apps.inquiry.models import Inquiry
+from apps.inquiry.exports import INQUIRY_EXPORT_COLUMNS, filter_inquiries, iter_inquiry_rows
+from apps.products.exports import EXPORT_FORMATS, EXPORT_CHUNK_SIZE, export_format_for_path, write_export
+
+
+class Command(BaseCommand):
+    help = '导出询价（CSV/XLSX/NDJSON），可按状态和创建日期过滤'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-o', '--output', default='-', help='输出文件路径（默认输出到标准输出）')
+        parser.add_argument('--output-format', choices=list(EXPORT_FORMATS), help='导出格式（默认按文件扩展名，否则为csv）')
+        parser.add_argument('--status', help='状态，可用逗号分隔多个（new/processing/replied/closed）')
+        parser.add_argument('--date-from', help='创建日期起（YYYY-MM-DD）')
+        parser.add_argument('--date-to', help='创建日期止（YYYY-MM-DD）')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help='每次从数据库读取的行数')
+
+    def handle(self, *args, **options):
+        output_format = options['output_format'] or export_format_for_path(options['output'])
+        try:
+            queryset = filter_inquiries(Inquiry.objects.all(), options)
+        except ValidationError as e:
+            raise CommandError(e.detail)
+
+        start_time = time.time()
+        rows = iter_inquiry_rows(queryset, chunk_size=options['chunk_size'])
+        size = write_export(output_format, INQUIRY_EXPORT_COLUMNS, rows, options['output'], 'inquiries')
+        if options['output'] != '-':
+            self.stdout.write(self.style.SUCCESS(
+                f'导出完成：{options["output"]}（{size / 1024:.1f} KB），耗时 {time.time() - start_time:.2f} 秒'
+            ))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inquiry', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inquiry',
+            index=models.Index(fields=['updated_at', 'id'], name='inquiry_updated_idx'),
+        ),
+    ]
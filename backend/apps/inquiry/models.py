@@ -45,6 +45,10 @@ class Inquiry(models.Model):
         verbose_name = _('询价咨询')
         verbose_name_plural = _('询价咨询')
         ordering = ['-created_at']
+        indexes = [
+            # 与变更流的游标排序 (updated_at, id) 一致
+            models.Index(fields=['updated_at', 'id'], name='inquiry_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.subject}"
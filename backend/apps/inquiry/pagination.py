@@ -0,0 +1,43 @@
+"""
+询价变更流分页 - 基于 apps.products.pagination 的键集分页，供外部系统增量同步询价
+"""
+from collections import OrderedDict
+
+from rest_framework.response import Response
+
+from apps.products.pagination import KeysetPagination
+
+
+class InquiryChangeFeedPagination(KeysetPagination):
+    """询价变更流：按更新时间、id 升序，响应中的 cursor 总是可用于下一次轮询"""
+    ordering = ('updated_at', 'id')
+    page_size = 100
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        rows = super().paginate_queryset(queryset, request, view)
+        # 没有变更时沿用请求中的游标
+        if rows:
+            self.cursor = self.encode_cursor(self.last_values, False)
+        else:
+            self.cursor = request.query_params.get(self.cursor_query_param)
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('cursor', self.cursor),
+            ('has_more', self.has_next),
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'cursor': {'type': 'string', 'nullable': True},
+                'has_more': {'type': 'boolean'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -15,6 +15,16 @@ class InquirySerializer(serializers.ModelSerializer):
         read_only_fields = ['status', 'created_at']
 
 
+class InquiryChangeSerializer(InquirySerializer):
+    """询价变更流序列化器（CRM同步，包括状态和回复）"""
+    
+    class Meta(InquirySerializer.Meta):
+        fields = InquirySerializer.Meta.fields + [
+            'reply', 'replied_at', 'source', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
 class ContactInfoSerializer(serializers.ModelSerializer):
     """联系信息序列化器"""
     
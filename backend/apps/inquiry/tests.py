@@ -1,3 +1,76 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
+
+from .models import Inquiry
+
+
+class InquiryChangeFeedTests(TestCase):
+    """询价变更流：按 (更新时间, id) 增量同步"""
+
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create_user('crm', password='secret', is_staff=True))
+        self.base = timezone.now() - timedelta(hours=1)
+        # 前两条更新时间相同，由 id 区分先后
+        self.inquiries = [
+            self.create_inquiry(f'Customer {index}', self.base + timedelta(minutes=max(index, 1)))
+            for index in range(5)
+        ]
+
+    def create_inquiry(self, name, updated_at):
+        inquiry = Inquiry.objects.create(
+            name=name, email='buyer@example.com', subject='Window profiles', message='Please quote'
+        )
+        # updated_at 为 auto_now，用 update() 设置
+        Inquiry.objects.filter(pk=inquiry.pk).update(updated_at=updated_at)
+        return inquiry
+
+    def poll(self, cursor=None, **params):
+        if cursor:
+            params['cursor'] = cursor
+        response = self.client.get('/api/inquiries/changes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def ids(self, data):
+        return [item['id'] for item in data['results']]
+
+    def test_requires_staff(self):
+        self.client.logout()
+        self.assertIn(self.client.get('/api/inquiries/changes/').status_code, (401, 403))
+
+    def test_cursor_continues_where_the_last_poll_stopped(self):
+        first = self.poll(page_size=2)
+        self.assertEqual(self.ids(first), [inquiry.id for inquiry in self.inquiries[:2]])
+        self.assertTrue(first['has_more'])
+        second = self.poll(first['cursor'], page_size=2)
+        self.assertEqual(self.ids(second), [inquiry.id for inquiry in self.inquiries[2:4]])
+        third = self.poll(second['cursor'], page_size=2)
+        self.assertEqual(self.ids(third), [self.inquiries[4].id])
+        self.assertFalse(third['has_more'])
+
+        # 没有新变更时游标不变，可继续用于下一次轮询
+        idle = self.poll(third['cursor'])
+        self.assertEqual((self.ids(idle), idle['cursor'], idle['has_more']), ([], third['cursor'], False))
+
+    def test_updated_inquiries_reappear_after_the_cursor(self):
+        cursor = self.poll()['cursor']
+        inquiry = self.inquiries[1]
+        Inquiry.objects.filter(pk=inquiry.pk).update(status='replied', updated_at=self.base + timedelta(minutes=30))
+        data = self.poll(cursor)
+        self.assertEqual(self.ids(data), [inquiry.id])
+        self.assertEqual(data['results'][0]['status'], 'replied')
+        self.assertIn('reply', data['results'][0])
 
-# Create your tests here.
+    def test_recent_changes_wait_for_the_settle_window(self):
+        cursor = self.poll()['cursor']
+        # 刚保存的询价要等提交窗口过后才出现，游标不会越过它
+        inquiry = Inquiry.objects.create(
+            name='Latest', email='buyer@example.com', subject='Door profiles', message='Please quote'
+        )
+        data = self.poll(cursor)
+        self.assertEqual((self.ids(data), data['cursor']), ([], cursor))
+        Inquiry.objects.filter(pk=inquiry.pk).update(updated_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.ids(self.poll(cursor)), [inquiry.id])
@@ -1,9 +1,20 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.permissions import IsAdminUser
+from django.conf import settings
 from django.utils import timezone
+from datetime import timedelta
 from .models import Inquiry, ContactInfo
-from .serializers import InquirySerializer, ContactInfoSerializer
+from .serializers import InquirySerializer, InquiryChangeSerializer, ContactInfoSerializer
+from .exports import INQUIRY_EXPORT_COLUMNS, filter_inquiries, iter_inquiry_rows
+from apps.products.exports import get_export_format, streaming_export_response
+from .pagination import InquiryChangeFeedPagination
+
+
+# 变更流不返回最近几秒内更新的询价：更新时间在保存时生成，提交可能晚于更新时间更晚的其他询价，
+# 留出时间窗口避免游标越过尚未提交的变更
+FEED_SETTLE_SECONDS = getattr(settings, 'INQUIRY_FEED_SETTLE_SECONDS', 2)
 
 
 class InquiryViewSet(viewsets.ModelViewSet):
@@ -39,6 +50,27 @@ class InquiryViewSet(viewsets.ModelViewSet):
             status=status.HTTP_201_CREATED, 
             headers=headers
         )
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def changes(self, request):
+        """询价变更流（CRM增量同步）：返回游标之后新增或更新的询价，按 (updated_at, id) 升序
+
+        首次请求不带游标，之后每次使用上次响应中的 cursor 轮询（?cursor=&page_size=），
+        has_more 为 true 时立即继续拉取；每次轮询的代价与变更数量成正比。
+        """
+        cutoff = timezone.now() - timedelta(seconds=FEED_SETTLE_SECONDS)
+        queryset = Inquiry.objects.filter(updated_at__lt=cutoff)
+        paginator = InquiryChangeFeedPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = InquiryChangeSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        """流式导出询价（?output=csv|xlsx|ndjson&status=new,processing&date_from=&date_to=）"""
+        output_format = get_export_format(request)
+        queryset = filter_inquiries(Inquiry.objects.all(), request.query_params)
+        return streaming_export_response(output_format, INQUIRY_EXPORT_COLUMNS, iter_inquiry_rows(queryset), 'inquiries')
 
 
 class ContactInfoViewSet(viewsets.ReadOnlyModelViewSet):
@@ -5,3 +5,7 @@ class NewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.news'
     verbose_name = '技术资讯'
+    
+    def ready(self):
+        """应用准备就绪时导入信号"""
+        import apps.news.signals
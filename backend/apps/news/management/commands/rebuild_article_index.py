@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from apps.news.search import article_search_index
+
+
+class Command(BaseCommand):
+    help = '全量重建文章全文搜索索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help='每批处理的文章数量（默认：200）',
+        )
+
+    def handle(self, *args, **options):
+        if not article_search_index.is_available():
+            self.stdout.write(self.style.WARNING('搜索索引表不存在（需要SQLite FTS5并执行migrate），已跳过'))
+            return
+
+        start_time = time.time()
+        total = article_search_index.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'文章索引重建完成：{total} 篇文章，耗时 {time.time() - start_time:.2f} 秒')
+        )
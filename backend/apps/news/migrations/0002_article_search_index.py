@@ -0,0 +1,41 @@
+from django.db import migrations
+
+
+def create_search_table(apps, schema_editor):
+    """创建FTS5文章搜索表（仅SQLite，未编译FTS5时跳过并回退到模糊查询）"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS news_article_search USING fts5("
+            "title, excerpt, content, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    except Exception as e:
+        print(f"FTS5不可用，跳过创建搜索索引: {e}")
+
+
+def fill_search_index(apps, schema_editor):
+    """为已发布的文章回填索引，否则迁移后所有搜索都没有结果，直到手动执行 rebuild_article_index"""
+    from apps.news.search import article_search_index
+
+    if article_search_index.is_available():
+        article_search_index.rebuild(apps=apps)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS news_article_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("news", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
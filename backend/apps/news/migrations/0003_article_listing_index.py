@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0002_article_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['status', '-published_at', '-created_at', 'id'], name='news_article_published_idx'),
+        ),
+    ]
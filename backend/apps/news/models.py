@@ -56,6 +56,10 @@ class Article(models.Model):
         verbose_name = _('文章')
         verbose_name_plural = _('文章')
         ordering = ['-published_at', '-created_at']
+        indexes = [
+            # 与游标分页的排序 (-published_at, -created_at, id) 一致
+            models.Index(fields=['status', '-published_at', '-created_at', 'id'], name='news_article_published_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -0,0 +1,151 @@
+"""
+文章全文搜索索引 - 基于SQLite FTS5
+
+只收录已发布的文章，文章发布、编辑、撤回或删除时增量更新。
+"""
+from django.apps import apps as global_apps
+from django.db import connection, OperationalError, ProgrammingError
+
+from apps.common.text import tokenize_text, build_match_query
+from .models import Article, Tag
+
+
+SEARCH_TABLE = 'news_article_search'
+
+# bm25列权重：title, excerpt, content
+COLUMN_WEIGHTS = (10.0, 4.0, 1.0)
+
+
+class ArticleSearchIndex:
+    """文章搜索索引服务"""
+
+    def __init__(self):
+        self._available = None
+
+    def is_available(self):
+        """索引表是否存在（非SQLite数据库或SQLite未编译FTS5时不可用）
+
+        只缓存“可用”的结果：迁移 0002 执行前检查过的进程，迁移后无需重启即可使用索引。
+        """
+        if self._available:
+            return True
+        if connection.vendor != 'sqlite':
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [SEARCH_TABLE])
+            self._available = cursor.fetchone() is not None
+        return self._available
+
+    # ---------- 索引维护 ----------
+
+    def index_articles(self, articles):
+        """写入（或更新）一批文章的索引，未发布的文章从索引中移除"""
+        if not self.is_available():
+            return 0
+        rows = []
+        ids = []
+        for article in articles:
+            ids.append(article.id)
+            if article.status == 'published':
+                rows.append((
+                    article.id,
+                    tokenize_text(article.title),
+                    tokenize_text(article.excerpt),
+                    tokenize_text(article.content),
+                ))
+        with connection.cursor() as cursor:
+            if ids:
+                cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [(pk,) for pk in ids])
+            if rows:
+                cursor.executemany(
+                    f"INSERT INTO {SEARCH_TABLE} (rowid, title, excerpt, content) VALUES (%s, %s, %s, %s)",
+                    rows
+                )
+        return len(rows)
+
+    def index_article(self, article):
+        """更新单篇文章的索引"""
+        return self.index_articles([article])
+
+    def remove_articles(self, article_ids):
+        """从索引中移除文章"""
+        if not self.is_available() or not article_ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [(pk,) for pk in article_ids])
+
+    def rebuild(self, chunk_size=200, apps=global_apps):
+        """全量重建索引（迁移中传入历史模型注册表 apps 回填已有文章）"""
+        if not self.is_available():
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        total = 0
+        last_id = 0
+        queryset = apps.get_model('news', 'Article').objects.filter(status='published').only(
+            'id', 'status', 'title', 'excerpt', 'content'
+        ).order_by('id')
+        while True:
+            chunk = list(queryset.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            total += self.index_articles(chunk)
+            last_id = chunk[-1].id
+        return total
+
+    # ---------- 查询 ----------
+
+    def search(self, query, offset=0, limit=20, tag_id=None):
+        """按相关度排序搜索，返回 (总数, 文章ID列表, 标签分面)
+
+        标签分面统计的是不加标签过滤时的命中数，方便前端切换标签。
+        索引不可用时返回None，由调用方回退到数据库模糊查询。
+        """
+        if not self.is_available():
+            return None
+        match = build_match_query(query)
+        if not match:
+            return 0, [], []
+
+        through_table = Article.tags.through._meta.db_table
+        weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+        where = f"{SEARCH_TABLE} MATCH %s"
+        params = [match]
+        if tag_id:
+            where += f" AND rowid IN (SELECT article_id FROM {through_table} WHERE tag_id = %s)"
+            params.append(tag_id)
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT count(*) FROM {SEARCH_TABLE} WHERE {where}", params)
+                total = cursor.fetchone()[0]
+                cursor.execute(
+                    f"SELECT rowid FROM {SEARCH_TABLE} WHERE {where} "
+                    f"ORDER BY bm25({SEARCH_TABLE}, {weights}), rowid LIMIT %s OFFSET %s",
+                    params + [limit, offset]
+                )
+                ids = [row[0] for row in cursor.fetchall()]
+                cursor.execute(
+                    f"SELECT t.tag_id, count(*) FROM {through_table} t "
+                    f"JOIN {SEARCH_TABLE} ON {SEARCH_TABLE}.rowid = t.article_id "
+                    f"WHERE {SEARCH_TABLE} MATCH %s GROUP BY t.tag_id",
+                    [match]
+                )
+                tag_counts = dict(cursor.fetchall())
+        except (OperationalError, ProgrammingError) as e:
+            print(f"文章全文搜索查询失败: {e}")
+            return 0, [], []
+
+        tags = Tag.objects.in_bulk(list(tag_counts))
+        facets = sorted(
+            (
+                {'id': tag.id, 'name': tag.name, 'slug': tag.slug, 'count': tag_counts[tag.id]}
+                for tag in tags.values()
+            ),
+            key=lambda item: (-item['count'], item['name'])
+        )
+        return total, ids, facets
+
+
+# 全局文章搜索索引实例
+article_search_index = ArticleSearchIndex()
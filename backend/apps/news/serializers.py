@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from apps.products.serializers import ImageVariantsField
 from .models import Tag, Article
 
 
@@ -12,24 +13,26 @@ class TagSerializer(serializers.ModelSerializer):
 
 class ArticleSerializer(serializers.ModelSerializer):
     """文章序列化器"""
+    featured_image_variants = ImageVariantsField(source='featured_image')
     tags = TagSerializer(many=True, read_only=True)
     
     class Meta:
         model = Article
         fields = [
-            'id', 'title', 'slug', 'excerpt', 'featured_image',
+            'id', 'title', 'slug', 'excerpt', 'featured_image', 'featured_image_variants',
             'tags', 'is_featured', 'views', 'created_at', 'published_at'
         ]
 
 
 class ArticleDetailSerializer(serializers.ModelSerializer):
     """文章详情序列化器"""
+    featured_image_variants = ImageVariantsField(source='featured_image')
     tags = TagSerializer(many=True, read_only=True)
     
     class Meta:
         model = Article
         fields = [
-            'id', 'title', 'slug', 'content', 'excerpt', 'featured_image',
+            'id', 'title', 'slug', 'content', 'excerpt', 'featured_image', 'featured_image_variants',
             'tags', 'is_featured', 'views', 'created_at', 'updated_at', 'published_at',
             'meta_title', 'meta_description', 'meta_keywords'
         ]
@@ -37,6 +40,7 @@ class ArticleDetailSerializer(serializers.ModelSerializer):
 
 class TranslatedArticleSerializer(serializers.ModelSerializer):
     """翻译后的文章序列化器"""
+    featured_image_variants = ImageVariantsField(source='featured_image')
     tags = TagSerializer(many=True, read_only=True)
     translated_title = serializers.SerializerMethodField()
     translated_content = serializers.SerializerMethodField()
@@ -46,7 +50,7 @@ class TranslatedArticleSerializer(serializers.ModelSerializer):
         model = Article
         fields = [
             'id', 'slug', 'translated_title', 'translated_content', 'translated_excerpt',
-            'featured_image', 'tags', 'is_featured', 'views', 'created_at', 'published_at'
+            'featured_image', 'featured_image_variants', 'tags', 'is_featured', 'views', 'created_at', 'published_at'
         ]
     
     def get_translated_title(self, obj):
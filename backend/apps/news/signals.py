@@ -0,0 +1,22 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Article
+from .search import article_search_index
+
+
+@receiver(post_save, sender=Article)
+def update_article_search_index(sender, instance, **kwargs):
+    """文章发布或编辑后更新搜索索引（撤回为草稿时移除）"""
+    try:
+        article_search_index.index_article(instance)
+    except Exception as e:
+        print(f"文章搜索索引更新失败 ID {instance.id}: {e}")
+
+
+@receiver(post_delete, sender=Article)
+def remove_article_search_index(sender, instance, **kwargs):
+    """文章删除后移除搜索索引"""
+    try:
+        article_search_index.remove_articles([instance.id])
+    except Exception as e:
+        print(f"文章搜索索引移除失败 ID {instance.id}: {e}")
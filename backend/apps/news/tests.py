@@ -1,3 +1,99 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.utils import timezone
+
+from .models import Article, Tag
+from .search import article_search_index
+
+
+class ArticleSearchTests(TestCase):
+    """文章全文搜索：相关度排序、高亮摘要和标签分面"""
+
+    def setUp(self):
+        self.guides = Tag.objects.create(name='Guides', slug='guides')
+        self.news = Tag.objects.create(name='News', slug='news')
+        self.anodizing = self.create_article(
+            'Anodizing aluminium profiles', 'How anodizing protects aluminium from corrosion.', [self.guides]
+        )
+        self.coating = self.create_article(
+            'Powder coating', 'Powder coating compared with anodizing for outdoor use.', [self.guides, self.news]
+        )
+        self.draft = self.create_article('Anodizing draft', 'Unpublished anodizing notes.', [], status='draft')
+
+    def create_article(self, title, content, tags, status='published'):
+        article = Article.objects.create(
+            title=title, slug=title.lower().replace(' ', '-'), content=content, status=status
+        )
+        article.tags.set(tags)
+        return article
+
+    def search(self, query, **params):
+        response = self.client.get('/api/articles/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_index_is_available(self):
+        self.assertTrue(article_search_index.is_available())
+
+    def test_title_matches_rank_first_and_drafts_are_excluded(self):
+        data = self.search('anodizing')
+        self.assertEqual(data['count'], 2)
+        self.assertEqual([item['id'] for item in data['results']], [self.anodizing.id, self.coating.id])
+
+    def test_snippet_highlights_matches(self):
+        data = self.search('corrosion')
+        self.assertIn('<mark>corrosion</mark>', data['results'][0]['snippet'])
+
+    def test_tag_facets_ignore_the_tag_filter(self):
+        data = self.search('anodizing', tag=self.news.id)
+        self.assertEqual([item['id'] for item in data['results']], [self.coating.id])
+        self.assertEqual(data['count'], 1)
+        counts = {facet['slug']: facet['count'] for facet in data['facets']['tags']}
+        self.assertEqual(counts, {'guides': 2, 'news': 1})
+
+    def test_unpublishing_removes_from_index(self):
+        self.coating.status = 'draft'
+        self.coating.save()
+        self.assertEqual(self.search('powder')['count'], 0)
+        self.anodizing.delete()
+        self.assertEqual(self.search('anodizing')['count'], 0)
+
+
+class ArticlePaginationTests(TestCase):
+    """文章列表的键集分页：发布时间为空的文章排在最后"""
+
+    def setUp(self):
+        now = timezone.now()
+        self.articles = []
+        for index in range(5):
+            article = Article.objects.create(
+                title=f'Article {index}', slug=f'article-{index}', content='Aluminium', status='published'
+            )
+            self.articles.append(article)
+        for index, article in enumerate(self.articles[:3]):
+            Article.objects.filter(pk=article.pk).update(published_at=now - timedelta(days=index))
+        Article.objects.filter(pk__in=[article.pk for article in self.articles[3:]]).update(published_at=None)
+
+    def walk(self, url, link, **params):
+        ids = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            ids.extend(item['id'] for item in data['results'])
+            if not data[link]:
+                return ids, data
+            response = self.client.get(data[link])
+
+    def test_pages_follow_published_order(self):
+        expected = [article.id for article in self.articles[:3]] + sorted(
+            [article.id for article in self.articles[3:]],
+            key=lambda pk: (-Article.objects.get(pk=pk).created_at.timestamp(), pk)
+        )
+        ids, last_page = self.walk('/api/articles/', 'next', page_size=2)
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(last_page['results']), 1)
 
-# Create your tests here.
+        response = self.client.get(last_page['previous'])
+        self.assertEqual([item['id'] for item in response.json()['results']], expected[2:4])
@@ -1,12 +1,20 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from django.db.models import Q
 from .models import Tag, Article
 from .serializers import (
     TagSerializer, ArticleSerializer, ArticleDetailSerializer,
     TranslatedArticleSerializer
 )
+from .search import article_search_index
+from apps.common.text import make_snippet
+from apps.products.pagination import ArticleCursorPagination
+
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
 
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
@@ -21,26 +29,29 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
         articles = Article.objects.filter(
             tags=tag, 
             status='published'
-        ).order_by('-published_at', '-created_at')
+        )
+        paginator = ArticleCursorPagination()
+        page = paginator.paginate_queryset(articles, request, view=self)
         
         # 检查是否需要翻译
         language = request.query_params.get('lang', 'zh')
         if language != 'zh':
             serializer = TranslatedArticleSerializer(
-                articles, 
+                page, 
                 many=True, 
                 context={'language': language}
             )
         else:
-            serializer = ArticleSerializer(articles, many=True)
+            serializer = ArticleSerializer(page, many=True)
         
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
 
 
 class ArticleViewSet(viewsets.ReadOnlyModelViewSet):
     """文章视图集"""
     queryset = Article.objects.filter(status='published').order_by('-published_at', '-created_at')
     serializer_class = ArticleSerializer
+    pagination_class = ArticleCursorPagination
     
     def get_serializer_class(self):
         """根据action选择序列化器"""
@@ -76,32 +87,51 @@ class ArticleViewSet(viewsets.ReadOnlyModelViewSet):
     def featured(self, request):
         """获取推荐文章"""
         articles = self.get_queryset().filter(is_featured=True)
+        page = self.paginate_queryset(articles)
         
         # 检查是否需要翻译
         language = request.query_params.get('lang', 'zh')
         if language != 'zh':
             serializer = TranslatedArticleSerializer(
-                articles, 
+                page, 
                 many=True, 
                 context={'language': language}
             )
         else:
-            serializer = self.get_serializer(articles, many=True)
+            serializer = self.get_serializer(page, many=True)
         
-        return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def search(self, request):
-        """搜索文章"""
-        query = request.query_params.get('q', '')
+        """搜索文章（全文索引，按相关度排序并分页，附带高亮摘要和标签分面）"""
+        query = request.query_params.get('q', '').strip()
         if not query:
             return Response({'error': '请提供搜索关键词'}, status=status.HTTP_400_BAD_REQUEST)
         
-        articles = self.get_queryset().filter(
-            Q(title__icontains=query) | 
-            Q(content__icontains=query) | 
-            Q(excerpt__icontains=query)
-        )
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+            page_size = min(max(int(request.query_params.get('page_size', SEARCH_PAGE_SIZE)), 1), SEARCH_MAX_PAGE_SIZE)
+            tag_id = int(request.query_params['tag']) if request.query_params.get('tag') else None
+        except ValueError:
+            return Response({'error': '分页或标签参数无效'}, status=status.HTTP_400_BAD_REQUEST)
+        offset = (page - 1) * page_size
+        
+        result = article_search_index.search(query, offset, page_size, tag_id=tag_id)
+        if result is None:
+            # 索引不可用时回退到数据库模糊查询
+            queryset = self.get_queryset().filter(
+                Q(title__icontains=query) | 
+                Q(content__icontains=query) | 
+                Q(excerpt__icontains=query)
+            )
+            total = queryset.count()
+            articles = list(queryset.prefetch_related('tags')[offset:offset + page_size])
+            facets = []
+        else:
+            total, ids, facets = result
+            article_map = Article.objects.filter(status='published').prefetch_related('tags').in_bulk(ids)
+            articles = [article_map[pk] for pk in ids if pk in article_map]
         
         # 检查是否需要翻译
         language = request.query_params.get('lang', 'zh')
@@ -114,4 +144,15 @@ class ArticleViewSet(viewsets.ReadOnlyModelViewSet):
         else:
             serializer = self.get_serializer(articles, many=True)
         
-        return Response(serializer.data)
+        results = serializer.data
+        for item, article in zip(results, articles):
+            item['snippet'] = make_snippet(article.content or article.excerpt, query)
+        
+        url = request.build_absolute_uri()
+        return Response({
+            'count': total,
+            'next': replace_query_param(url, 'page', page + 1) if offset + page_size < total else None,
+            'previous': replace_query_param(url, 'page', page - 1) if page > 1 else None,
+            'results': results,
+            'facets': {'tags': facets},
+        })
@@ -1,23 +1,29 @@
 from django.contrib import admin
 from django.http import JsonResponse
 from django.urls import path, reverse
-from django.utils.html import format_html
+from django.utils.html import format_html, format_html_join
 from django.contrib import messages
 from django.utils import timezone
+from django.db import transaction
 from django import forms
-from django.shortcuts import redirect
-from io import BytesIO
-import openpyxl
+from django.shortcuts import redirect, render, get_object_or_404
+import os
+import tempfile
+import uuid
 from .models import (
     Product, Category, SubCategory, ProductImage, TranslationLog, TranslationManagement,
     ProductSpecification, ProductFeature, ProductApplication,
-    ProductTemplate, TemplateSpecification, TemplateFeature, TemplateApplication, TemplateFactoryImage, TemplateProcess
+    ProductTemplate, TemplateSpecification, TemplateFeature, TemplateApplication, TemplateFactoryImage, TemplateProcess,
+    ImportJob
 )
 from .widgets import ExcelTableWidget
 from apps.news.models import Article
 from apps.about.models import CompanyInfo, Advantage, Certificate
 from apps.inquiry.models import ContactInfo
 from .services import translation_service
+from .spec_import import IMPORT_MODES, PREVIEW_LIMIT, read_spec_rows, plan_spec_import, apply_spec_import
+from .catalog_import import resumable_jobs, start_import_in_background
+from .image_resize import resized_url
 import json
 import time
 
@@ -146,11 +152,11 @@ class ProductAdmin(admin.ModelAdmin):
     template_display.short_description = '使用模板'
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('category', 'subcategory', 'template').prefetch_related('images')
+        return super().get_queryset(request).select_related('category', 'subcategory', 'template')
     
     def image_count(self, obj):
-        """显示图片数量"""
-        count = obj.images.count()
+        """显示图片数量（冗余字段，无需查询图片表）"""
+        count = obj.image_count
         if count == 0:
             return format_html('<span style="color: red;">0 张图片</span>')
         elif count == 1:
@@ -159,6 +165,7 @@ class ProductAdmin(admin.ModelAdmin):
             return format_html('<span style="color: green;">{} 张图片</span>', count)
     
     image_count.short_description = '图片数量'
+    image_count.admin_order_field = 'image_count'
     
     def translation_status(self, obj):
         """显示翻译状态"""
@@ -182,11 +189,11 @@ class ProductImageAdmin(admin.ModelAdmin):
     list_editable = ['is_primary', 'order']
     
     def image_preview(self, obj):
-        """图片预览"""
+        """图片预览（按需缩放的 120x120 缩略图，地址带原图版本号，可长期缓存）"""
         if obj.image:
             return format_html(
-                '<img src="{}" style="max-height: 50px; max-width: 50px; object-fit: cover;" />',
-                obj.image.url
+                '<img src="{}" loading="lazy" style="max-height: 50px; max-width: 50px; object-fit: cover;" />',
+                resized_url(obj.image.name, 120, 120, fit='cover')
             )
         return "无图片"
     
@@ -628,53 +635,88 @@ class ProductTemplateAdmin(admin.ModelAdmin):
         ]
         return custom_urls + urls
     
+    def _spec_import_path(self, token):
+        """预览时上传的文件暂存路径（确认导入时读取）"""
+        return os.path.join(tempfile.gettempdir(), f'spec_import_{token}.xlsx')
+    
     def import_specifications(self, request, template_id):
-        """导入Excel规格表格"""
-        if request.method == 'POST':
-            try:
-                template = ProductTemplate.objects.get(id=template_id)
-                excel_file = request.FILES.get('excel_file')
-                
-                if not excel_file:
-                    messages.error(request, '请选择Excel文件')
-                    return redirect(f'../products/producttemplate/{template_id}/change/')
-                
-                # 读取Excel文件
-                workbook = openpyxl.load_workbook(BytesIO(excel_file.read()))
-                sheet = workbook.active
-                
-                # 解析Excel（假设第一列是规格名称，第二列是规格值）
-                imported_count = 0
-                existing_count = template.specification_items.count()
-                
-                for row_num, row in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2):  # 跳过标题行
-                    if row[0] and row[1]:  # 确保两列都有值
-                        # 去除空白字符
-                        spec_name = str(row[0]).strip() if row[0] else ''
-                        spec_value = str(row[1]).strip() if row[1] else ''
-                        
-                        if spec_name and spec_value:
-                            TemplateSpecification.objects.create(
-                                template=template,
-                                name=spec_name,
-                                value=spec_value,
-                                order=existing_count + imported_count
-                            )
-                            imported_count += 1
-                
-                if imported_count > 0:
-                    messages.success(request, f'成功导入 {imported_count} 条规格记录')
-                else:
-                    messages.warning(request, '未导入任何数据，请检查Excel格式是否正确')
-                
-                return redirect(f'../products/producttemplate/{template_id}/change/')
-                
-            except Exception as e:
-                messages.error(request, f'导入失败: {str(e)}')
-                return redirect(f'../products/producttemplate/{template_id}/change/')
+        """导入Excel规格表格（先预览差异，确认后写入；也可直接导入）"""
+        template = get_object_or_404(ProductTemplate, id=template_id)
+        change_url = reverse('admin:products_producttemplate_change', args=[template_id])
+        if request.method != 'POST':
+            return redirect(change_url)
+        
+        mode = request.POST.get('mode', 'append')
+        if mode not in IMPORT_MODES:
+            messages.error(request, f'不支持的导入方式: {mode}')
+            return redirect(change_url)
+        
+        session_key = f'spec_import_{template_id}'
+        token = request.POST.get('token')
+        if token:
+            # 确认预览过的导入：读取暂存的文件
+            if token != request.session.get(session_key):
+                messages.error(request, '导入预览已失效，请重新上传Excel文件')
+                return redirect(change_url)
+            excel_file = self._spec_import_path(token)
+        else:
+            excel_file = request.FILES.get('excel_file')
+            if not excel_file:
+                messages.error(request, '请选择Excel文件')
+                return redirect(change_url)
+            if 'preview' in request.POST:
+                previous = request.session.get(session_key)
+                if previous and os.path.exists(self._spec_import_path(previous)):
+                    os.remove(self._spec_import_path(previous))
+                token = uuid.uuid4().hex
+                with open(self._spec_import_path(token), 'wb') as f:
+                    for chunk in excel_file.chunks():
+                        f.write(chunk)
+                request.session[session_key] = token
+                excel_file = self._spec_import_path(token)
         
-        # GET请求，返回导入页面
-        return redirect(f'../products/producttemplate/{template_id}/change/')
+        try:
+            plan = plan_spec_import(template, read_spec_rows(excel_file), mode)
+        except Exception as e:
+            messages.error(request, f'导入失败: {str(e)}')
+            return redirect(change_url)
+        
+        if 'preview' in request.POST:
+            context = {
+                **self.admin_site.each_context(request),
+                'title': f'规格导入预览 - {template.name}',
+                'opts': self.model._meta,
+                'original': template,
+                'plan': plan,
+                'mode': mode,
+                'mode_name': IMPORT_MODES[mode],
+                'token': token,
+                'change_url': change_url,
+                'preview_limit': PREVIEW_LIMIT,
+            }
+            return render(request, 'admin/products/producttemplate/import_preview.html', context)
+        
+        if plan.errors:
+            row_num, error = plan.errors[0]
+            messages.error(request, f'导入失败: 共 {len(plan.errors)} 行有误（第 {row_num} 行: {error}），请预览后修正')
+            return redirect(change_url)
+        
+        try:
+            apply_spec_import(plan)
+        except Exception as e:
+            messages.error(request, f'导入失败: {str(e)}')
+            return redirect(change_url)
+        finally:
+            if token:
+                request.session.pop(session_key, None)
+                if os.path.exists(self._spec_import_path(token)):
+                    os.remove(self._spec_import_path(token))
+        
+        if plan.has_changes:
+            messages.success(request, f'规格导入完成（{IMPORT_MODES[mode]}）: {plan.summary()}')
+        else:
+            messages.warning(request, '未导入任何数据，请检查Excel格式是否正确')
+        return redirect(change_url)
     
     def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
         """添加Excel导入按钮到模板编辑页面"""
@@ -688,3 +730,46 @@ class ProductTemplateAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related('category', 'subcategory').prefetch_related(
             'specification_items', 'process_items', 'feature_items', 'application_items', 'factory_images'
         )
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    """产品目录导入任务 - 上传表格后在后台导入，列表中查看进度"""
+    list_display = ['__str__', 'status', 'progress_display', 'created_count', 'updated_count', 'error_count',
+                    'created_at', 'finished_at']
+    list_filter = ['status', 'created_at']
+    readonly_fields = ['status', 'progress_display', 'created_count', 'updated_count', 'error_count',
+                       'error_list', 'message', 'created_at', 'finished_at']
+    fields = ['file'] + readonly_fields
+    actions = ['resume_import']
+    
+    def get_readonly_fields(self, request, obj=None):
+        if obj:
+            return ['file'] + self.readonly_fields
+        return self.readonly_fields
+    
+    def progress_display(self, obj):
+        """显示导入进度"""
+        return f"{obj.processed_rows}/{obj.total_rows} ({obj.progress}%)"
+    progress_display.short_description = '进度'
+    
+    def error_list(self, obj):
+        """显示错误行"""
+        return format_html_join(format_html('<br>'), '第 {} 行: {}', obj.errors) or '-'
+    error_list.short_description = '错误行'
+    
+    def save_model(self, request, obj, form, change):
+        """上传表格后自动开始导入（事务提交后启动，后台线程才能读到任务）"""
+        super().save_model(request, obj, form, change)
+        if not change:
+            transaction.on_commit(lambda: start_import_in_background(obj))
+            messages.info(request, '导入已在后台开始，刷新页面查看进度')
+    
+    def resume_import(self, request, queryset):
+        """开始或继续导入（从上次中断处继续）；导入中但长时间没有进度的任务（进程已中断）同样可以继续"""
+        started = 0
+        for job in resumable_jobs(queryset):
+            started += start_import_in_background(job)
+        self.message_user(request, f'已在后台开始 {started} 个导入任务（导入中或已完成的任务会被跳过）')
+    resume_import.short_description = '开始/继续导入所选任务'
+
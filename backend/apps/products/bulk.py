@@ -0,0 +1,150 @@
+"""
+产品批量写入 - 一次请求创建/更新多个产品
+
+先校验全部条目（外键存在性、slug 唯一性各用一次查询完成），任一条目有误时整体拒绝，不写入任何数据。
+校验通过后按分块在事务中 bulk_create / bulk_update，不逐条触发 post_save；写入在 events.batch() 中进行，
+结束时只发送一次 products_changed，由其接收器统一更新规格数值、相关产品、搜索索引、缓存和翻译。
+
+条目带 id 时更新该产品；否则按 slug 匹配已有产品更新，不存在时创建。更新只修改条目中提供的字段。
+"""
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from . import events
+from .models import Category, SubCategory, Product, ProductTemplate
+
+
+BULK_MAX_ITEMS = 5000   # 单次请求的条目上限
+BULK_CHUNK_SIZE = 500   # 每个事务写入的产品数
+
+# 创建产品时必须提供的字段（更新时均可省略）
+REQUIRED_ON_CREATE = ['category_id', 'name', 'description', 'slug']
+
+
+class ProductBulkItemSerializer(serializers.ModelSerializer):
+    """批量写入的单个条目（外键以ID提供，存在性和 slug 唯一性由 bulk_write_products 统一校验）"""
+    id = serializers.IntegerField(required=False)
+    category_id = serializers.IntegerField()
+    subcategory_id = serializers.IntegerField(required=False, allow_null=True)
+    template_id = serializers.IntegerField(required=False, allow_null=True)
+    slug = serializers.SlugField(max_length=50)
+
+    class Meta:
+        model = Product
+        fields = [
+            'id', 'category_id', 'subcategory_id', 'template_id', 'use_template',
+            'name', 'description', 'features', 'applications', 'specifications',
+            'range_param', 'type_param', 'surface_treatment', 'colors', 'grade', 'temper',
+            'slug', 'is_featured', 'is_active', 'order',
+        ]
+
+
+# 外键字段 -> 允许引用的对象
+FOREIGN_KEYS = [
+    ('category_id', lambda: Category.objects.all()),
+    ('subcategory_id', lambda: SubCategory.objects.all()),
+    ('template_id', lambda: ProductTemplate.objects.filter(is_active=True)),
+]
+
+
+def _chunks(objects, size):
+    for start in range(0, len(objects), size):
+        yield objects[start:start + size]
+
+
+def _validate(rows):
+    """返回 (与条目一一对应的目标产品（新建为None）, 与条目一一对应的错误字典)"""
+    errors = [{} for _ in rows]
+
+    for field, queryset in FOREIGN_KEYS:
+        wanted = {row[field] for row in rows if row.get(field) is not None}
+        existing = set(queryset().filter(id__in=wanted).values_list('id', flat=True)) if wanted else set()
+        for index, row in enumerate(rows):
+            if row.get(field) is not None and row[field] not in existing:
+                errors[index][field] = [f'无效的ID "{row[field]}"']
+
+    by_id = Product.objects.in_bulk({row['id'] for row in rows if 'id' in row})
+    by_slug = Product.objects.in_bulk({row['slug'] for row in rows if 'slug' in row}, field_name='slug')
+
+    targets = []
+    seen_products = {}  # 产品ID -> 条目序号
+    seen_slugs = {}     # 写入后的 slug -> 条目序号
+    for index, row in enumerate(rows):
+        item_errors = errors[index]
+        if 'id' in row:
+            target = by_id.get(row['id'])
+            if target is None:
+                item_errors['id'] = [f'产品 {row["id"]} 不存在']
+        else:
+            target = by_slug.get(row.get('slug'))
+            if target is None:
+                for field in REQUIRED_ON_CREATE:
+                    if field not in row:
+                        item_errors[field] = ['该字段是必填项。']
+        targets.append(target)
+
+        if target is not None:
+            if target.id in seen_products:
+                item_errors.setdefault('non_field_errors', []).append(f'与条目 {seen_products[target.id]} 是同一产品')
+            seen_products.setdefault(target.id, index)
+
+        slug = row.get('slug', target.slug if target is not None else None)
+        if slug:
+            owner = by_slug.get(slug)
+            if owner is not None and owner != target:
+                item_errors.setdefault('slug', []).append('具有 URL别名 的 产品 已存在。')
+            elif slug in seen_slugs:
+                item_errors.setdefault('slug', []).append(f'与条目 {seen_slugs[slug]} 的 URL别名 重复')
+            seen_slugs.setdefault(slug, index)
+    return targets, errors
+
+
+def bulk_write_products(items, chunk_size=BULK_CHUNK_SIZE):
+    """校验并批量写入产品，返回 (创建的产品ID列表, 更新的产品ID列表)
+
+    校验失败时抛出 ValidationError，items 为与输入逐条对应的错误列表（无错误的条目为空字典）。
+    """
+    if not isinstance(items, list) or not items:
+        raise ValidationError({'items': '请提供产品列表'})
+    if len(items) > BULK_MAX_ITEMS:
+        raise ValidationError({'items': f'一次最多写入 {BULK_MAX_ITEMS} 个产品'})
+
+    serializer = ProductBulkItemSerializer(data=items, many=True, partial=True)
+    if not serializer.is_valid():
+        raise ValidationError({'items': serializer.errors})
+    rows = serializer.validated_data
+    targets, errors = _validate(rows)
+    if any(errors):
+        raise ValidationError({'items': errors})
+
+    now = timezone.now()
+    creates, updates, update_fields = [], [], {'updated_at'}
+    for row, target in zip(rows, targets):
+        values = {field: value for field, value in row.items() if field != 'id'}
+        if target is None:
+            creates.append(Product(**values))
+        else:
+            for field, value in values.items():
+                setattr(target, field, value)
+            target.updated_at = now  # bulk_update 不会自动更新 auto_now 字段
+            update_fields.update(values)
+            updates.append(target)
+
+    with events.batch():
+        for chunk in _chunks(creates, chunk_size):
+            with transaction.atomic():
+                Product.objects.bulk_create(chunk)
+            if any(product.id is None for product in chunk):
+                # 数据库不支持插入时返回主键，按 slug 取回
+                ids = dict(Product.objects.filter(slug__in=[p.slug for p in chunk]).values_list('slug', 'id'))
+                for product in chunk:
+                    product.id = ids[product.slug]
+            events.record([product.id for product in chunk], created=True)
+        for chunk in _chunks(updates, chunk_size):
+            with transaction.atomic():
+                Product.objects.bulk_update(chunk, sorted(update_fields))
+            events.record([product.id for product in chunk])
+
+    return [product.id for product in creates], [product.id for product in updates]
@@ -0,0 +1,287 @@
+"""
+API响应缓存 - 单飞合并（single-flight）+ 过期后继续提供旧数据（stale-while-revalidate）
+
+缓存条目失效或过期时，只允许一个worker重建，其他并发请求等待重建结果或直接拿到旧副本，
+避免同一页面被同时重建多次导致SQLite锁等待超时。
+
+命名空间版本号保存在数据库中（CacheNamespace），管理命令和其他worker进程的失效对所有进程可见；
+每个进程最多缓存 API_CACHE_VERSION_TTL 秒的版本号，本进程的失效立即生效。
+缓存条目和重建锁保存在 CACHES 中，默认的进程内缓存只在本进程内合并重建（见 settings.CACHES）。
+"""
+import functools
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, OperationalError, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.response import Response
+
+
+# 默认缓存策略，可在 settings.API_CACHE_POLICIES 中按接口覆盖
+DEFAULT_POLICY = {
+    'fresh_ttl': 60,       # 新鲜期（秒），期内直接命中
+    'stale_ttl': 600,      # 新鲜期之后仍可作为旧副本提供的时长（秒）
+    'lock_timeout': 30,    # 重建锁超时（秒），防止重建进程崩溃后锁不释放
+    'wait_timeout': 5,     # 没有旧副本时等待其他worker重建的最长时间（秒）
+    'shed_load': False,    # 降载模式：压力下只要有旧副本就不重建
+    'max_inflight': 4,     # 本进程同时进行的重建数达到此值即视为高压力
+}
+VERSION_TTL = getattr(settings, 'API_CACHE_VERSION_TTL', 1)  # 本进程缓存命名空间版本号的秒数
+
+
+class _Uncacheable(Exception):
+    """重建结果不可缓存（非200响应），原样返回给客户端"""
+
+    def __init__(self, response):
+        super().__init__('uncacheable response')
+        self.response = response
+
+
+class SingleFlightCache:
+    """单飞缓存 - 同一个键同一时刻只有一个重建者"""
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._events = {}  # 本进程内正在重建的键 -> threading.Event
+        self._inflight = 0
+        self._versions = {}       # 命名空间 -> 版本号（从数据库读取）
+        self._versions_at = None  # 读取时间（time.monotonic()），None 表示需要重新读取
+        self._local = threading.local()  # pinned() 期间当前线程固定使用的版本号
+
+    # ---------- 策略与版本 ----------
+
+    def get_policy(self, endpoint):
+        """获取接口的缓存策略"""
+        policies = getattr(settings, 'API_CACHE_POLICIES', {})
+        policy = dict(DEFAULT_POLICY)
+        policy.update(policies.get('default', {}))
+        policy.update(policies.get(endpoint, {}))
+        return policy
+
+    def _load_versions(self):
+        """所有命名空间的版本号（一次查询，本进程缓存 VERSION_TTL 秒）"""
+        from .models import CacheNamespace
+
+        pinned = getattr(self._local, 'versions', None)
+        if pinned is not None:
+            return pinned
+        with self._guard:
+            if self._versions_at is not None and time.monotonic() - self._versions_at < VERSION_TTL:
+                return self._versions
+        try:
+            versions = dict(CacheNamespace.objects.values_list('name', 'version'))
+        except DatabaseError:
+            return self._versions  # 尚未迁移等情况：沿用上次读取的版本号，下次重新读取
+        with self._guard:
+            self._versions, self._versions_at = versions, time.monotonic()
+        return versions
+
+    def _forget_versions(self):
+        with self._guard:
+            self._versions_at = None
+
+    @contextmanager
+    def pinned(self):
+        """在当前线程内固定版本号：构建一个响应期间只读取一次，响应中各片段的版本号一致（可嵌套）"""
+        if getattr(self._local, 'versions', None) is not None:
+            yield
+            return
+        self._local.versions = self._load_versions()
+        try:
+            yield
+        finally:
+            self._local.versions = None
+
+    def namespace_version(self, namespace):
+        """获取命名空间当前版本号"""
+        return self._load_versions().get(namespace, 0)
+
+    def versions(self, namespaces):
+        """获取一组命名空间的版本号元组"""
+        if not namespaces:
+            return ()
+        versions = self._load_versions()
+        return tuple(versions.get(namespace, 0) for namespace in namespaces)
+
+    def synced_versions(self, previous, namespaces, changed):
+        """进程内索引增量同步了本进程的一次变更后，返回应记录的版本号元组
+
+        只有当前版本号恰好是 previous 中 changed 各命名空间加1（即期间只有这一次变更）时才返回当前版本号；
+        否则期间还有其他进程的变更，返回 previous，由索引在下次读取时全量重建。
+        """
+        if previous is None:
+            return None
+        current = self.versions(namespaces)
+        expected = tuple(
+            version + (1 if namespace in changed else 0)
+            for namespace, version in zip(namespaces, previous)
+        )
+        return current if current == expected else previous
+
+    def invalidate(self, *namespaces):
+        """使命名空间下的缓存失效
+
+        只递增（数据库中的）版本号而不删除条目，旧条目仍可作为旧副本提供，由一个worker负责重建。
+        在事务中调用时随事务提交生效。
+        """
+        from .models import CacheNamespace
+
+        namespaces = set(namespaces)
+        if not namespaces:
+            return
+        try:
+            now = timezone.now()
+            updated = CacheNamespace.objects.filter(name__in=namespaces)
+            existing = set(updated.values_list('name', flat=True))
+            updated.update(version=F('version') + 1, updated_at=now)
+            for namespace in namespaces - existing:
+                _, created = CacheNamespace.objects.get_or_create(name=namespace, defaults={'version': 1})
+                if not created:  # 并发创建
+                    CacheNamespace.objects.filter(name=namespace).update(version=F('version') + 1, updated_at=now)
+        except DatabaseError as e:
+            print(f"缓存失效失败 {sorted(namespaces)}: {e}")
+        self._forget_versions()
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(self._forget_versions)
+
+    # ---------- 读取与重建 ----------
+
+    def make_key(self, endpoint, request, kwargs=None):
+        """根据接口名、协议和主机（响应中的图片地址是绝对地址）、路径参数和查询参数生成缓存键"""
+        params = sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            for value in values
+        )
+        raw = repr((request.scheme, request.get_host(), sorted((kwargs or {}).items()), params))
+        digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+        return f"apicache:{endpoint}:{digest}"
+
+    def _under_pressure(self, policy):
+        return self._inflight >= policy['max_inflight']
+
+    def _build(self, key, builder, versions, policy):
+        """执行重建并写入缓存"""
+        with self._guard:
+            self._inflight += 1
+            event = self._events.setdefault(key, threading.Event())
+        try:
+            value = builder()
+            entry = {'value': value, 'built_at': time.time(), 'versions': versions}
+            cache.set(key, entry, policy['fresh_ttl'] + policy['stale_ttl'])
+            return entry
+        finally:
+            with self._guard:
+                self._inflight -= 1
+                self._events.pop(key, None)
+            event.set()
+
+    def _wait_for_rebuild(self, key, lock_key, versions, policy):
+        """等待其他请求完成重建，超时返回None"""
+        deadline = time.time() + policy['wait_timeout']
+        with self._guard:
+            event = self._events.get(key)
+        if event is not None:
+            # 同一进程内的重建：直接等待完成通知
+            event.wait(policy['wait_timeout'])
+        while True:
+            entry = cache.get(key)
+            if entry is not None and entry['versions'] == versions:
+                return entry
+            if cache.get(lock_key) is None or time.time() >= deadline:
+                return None
+            time.sleep(0.05)
+
+    def get_or_build(self, key, builder, endpoint='default', namespaces=()):
+        """读取缓存，必要时单飞重建
+
+        返回 (value, state)，state 为 HIT / STALE / MISS 之一。
+        """
+        entry, state = self.get_entry(key, builder, endpoint, namespaces)
+        return entry['value'], state
+
+    def get_entry(self, key, builder, endpoint='default', namespaces=()):
+        """同 get_or_build，但返回缓存条目本身 (entry, state)，可用 entry_tag() 标识这一版内容"""
+        policy = self.get_policy(endpoint)
+        versions = self.versions(namespaces)
+        entry = cache.get(key)
+
+        if entry is not None and entry['versions'] == versions \
+                and time.time() - entry['built_at'] < policy['fresh_ttl']:
+            return entry, 'HIT'
+
+        # 降载模式：压力下直接提供旧副本
+        if entry is not None and policy['shed_load'] and self._under_pressure(policy):
+            return entry, 'STALE'
+
+        lock_key = f"{key}:lock"
+        if cache.add(lock_key, 1, policy['lock_timeout']):
+            # 获得重建权
+            try:
+                return self._build(key, builder, versions, policy), 'MISS'
+            except OperationalError:
+                # 数据库锁等待超时等情况，有旧副本则先提供旧副本
+                if entry is not None:
+                    return entry, 'STALE'
+                raise
+            finally:
+                cache.delete(lock_key)
+
+        # 其他请求正在重建：有旧副本就直接返回
+        if entry is not None:
+            return entry, 'STALE'
+
+        fresh = self._wait_for_rebuild(key, lock_key, versions, policy)
+        if fresh is not None:
+            return fresh, 'HIT'
+
+        # 等待超时（重建者崩溃或过慢），自行重建
+        return self._build(key, builder, versions, policy), 'MISS'
+
+
+# 全局响应缓存实例
+response_cache = SingleFlightCache()
+
+
+def entry_tag(key, entry):
+    """缓存条目的标识：同一标识对应的内容相同，条目重建后标识随之改变（压缩中间件据此缓存压缩结果）"""
+    return f"{key}:{entry['built_at']!r}"
+
+
+def cached_response(endpoint, namespaces=()):
+    """视图方法装饰器 - 对GET请求的200响应做单飞缓存
+
+    endpoint 对应 settings.API_CACHE_POLICIES 中的策略名，
+    namespaces 为响应所依赖的数据命名空间，数据变更时由信号使其失效。
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(viewset, request, *args, **kwargs):
+            if request.method != 'GET' or not getattr(settings, 'API_CACHE_ENABLED', True):
+                return view_method(viewset, request, *args, **kwargs)
+
+            key = response_cache.make_key(endpoint, request, kwargs)
+
+            def build():
+                response = view_method(viewset, request, *args, **kwargs)
+                if response.status_code != 200:
+                    raise _Uncacheable(response)
+                return response.data
+
+            try:
+                with response_cache.pinned():
+                    entry, state = response_cache.get_entry(key, build, endpoint, namespaces)
+            except _Uncacheable as exc:
+                return exc.response
+
+            response = Response(entry['value'])
+            response['X-Cache'] = state
+            response.cache_tag = entry_tag(key, entry)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,337 @@
+"""
+产品目录导入 - 把供应商表格（XLSX/CSV）按 slug 批量写入产品及其规格/特性/应用
+
+表格第一行为列名，支持的列（列名也可以用产品字段的中文名称，如“产品名称”）：
+- slug：必填，按 slug 匹配已有产品更新，不存在时创建
+- name / description / category：创建产品时必填；category、subcategory 填写分类的 slug 或名称
+- features、applications、specifications、range_param、type_param、surface_treatment、colors、grade、temper
+- is_featured、is_active、use_template（是/否、true/false、1/0），order（整数）
+- spec:<规格名称>（或 规格:<规格名称>）：每列一个规格，单元格为规格值
+- specification_items、feature_items、application_items：每行一项，格式为“名称: 值”
+
+空单元格不修改已有产品的对应字段。某一行的某类子项（规格/特性/应用）有内容时，该产品这一类子项整体替换为表格中的内容。
+
+行按分块（CATALOG_IMPORT_CHUNK_SIZE）在事务中 bulk_create / bulk_update，事务内同时记录导入任务的进度；
+导入失败后重新执行同一任务会跳过已处理的行继续导入。整个导入在 events.batch() 中进行，
+逐条的信号处理被合并，结束（或失败）时统一更新索引、使缓存失效并在后台翻译一次。
+"""
+import csv
+import io
+import itertools
+import threading
+from datetime import timedelta
+
+import openpyxl
+from django.conf import settings
+from django.core.validators import validate_slug
+from django.db import transaction, close_old_connections
+from django.utils import timezone
+
+from . import events
+from .models import (
+    Category, SubCategory, Product, ProductSpecification, ProductFeature, ProductApplication, ImportJob
+)
+
+
+CATALOG_IMPORT_CHUNK_SIZE = 500   # 每个事务写入的行数
+MAX_STORED_ERRORS = 500           # 导入任务中保存的错误行数上限
+# 导入中的任务超过该秒数没有进度（每个分块提交时更新）即视为已中断（进程重启等），可以继续导入
+IMPORT_STALE_SECONDS = getattr(settings, 'CATALOG_IMPORT_STALE_SECONDS', 600)
+
+TEXT_COLUMNS = [
+    'name', 'description', 'features', 'applications', 'specifications',
+    'range_param', 'type_param', 'surface_treatment', 'colors', 'grade', 'temper',
+]
+BOOLEAN_COLUMNS = ['is_featured', 'is_active', 'use_template']
+INTEGER_COLUMNS = ['order']
+REQUIRED_ON_CREATE = ['category', 'name', 'description']
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', '是', '√'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', '否', '×'}
+
+SPEC_COLUMN_PREFIXES = ('spec:', '规格:', '规格：')
+
+# 子项列 -> (模型, 第二个字段名)
+ITEM_COLUMNS = {
+    'specification_items': (ProductSpecification, 'value'),
+    'feature_items': (ProductFeature, 'description'),
+    'application_items': (ProductApplication, 'description'),
+}
+
+
+def _column_aliases():
+    """列名别名：产品字段的中文名称 -> 字段名"""
+    aliases = {}
+    for name in ['slug', 'category', 'subcategory'] + TEXT_COLUMNS + BOOLEAN_COLUMNS + INTEGER_COLUMNS:
+        aliases[name] = name
+        aliases[str(Product._meta.get_field(name).verbose_name).lower()] = name
+    aliases.update({'分类': 'category', '子分类': 'subcategory'})
+    for name in ITEM_COLUMNS:
+        aliases[name] = name
+    return aliases
+
+
+COLUMN_ALIASES = _column_aliases()
+
+
+def normalize_column(header):
+    """把表头规范为列名，规格列返回 ('spec', 规格名称)，无法识别的列返回None"""
+    header = str(header).strip() if header is not None else ''
+    for prefix in SPEC_COLUMN_PREFIXES:
+        if header.lower().startswith(prefix):
+            return ('spec', header[len(prefix):].strip())
+    return COLUMN_ALIASES.get(header.lower())
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # Excel 中的整数以浮点数保存
+    return str(value).strip()
+
+
+def _iter_raw_rows(file):
+    """逐行读取表格的原始单元格（包括表头行）"""
+    name = file.name.lower()
+    file.seek(0)
+    if name.endswith('.csv'):
+        reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+        yield from reader
+        return
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        sheet.reset_dimensions()
+        yield from sheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_catalog_rows(file):
+    """流式读取表格，逐行产出 (行号, {列: 文本})，规格列的键为 ('spec', 规格名称)，跳过空行"""
+    rows = _iter_raw_rows(file)
+    header = next(rows, None)
+    if header is None:
+        return
+    columns = [normalize_column(cell) for cell in header]
+    if 'slug' not in columns:
+        raise ValueError('表格缺少 slug 列')
+    for row_num, row in enumerate(rows, start=2):
+        values = {}
+        for column, cell in zip(columns, row):
+            if column is not None:
+                values[column] = _cell_text(cell)
+        if any(values.values()):
+            yield row_num, values
+
+
+def _parse_items(text):
+    """解析“名称: 值”的多行文本"""
+    items = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        name, sep, value = line.replace('：', ':').partition(':')
+        items.append((name.strip(), value.strip() if sep else ''))
+    return items
+
+
+class CatalogImporter:
+    """执行一个导入任务"""
+
+    def __init__(self, job, chunk_size=CATALOG_IMPORT_CHUNK_SIZE, progress=None):
+        self.job = job
+        self.chunk_size = chunk_size
+        self.progress = progress  # 每个分块写入后调用 progress(job)
+        self.categories = {}
+        self.subcategories = {}
+
+    def _load_categories(self):
+        """分类/子分类的 slug 和名称 -> ID（slug 优先于名称）"""
+        for model, lookup in [(Category, self.categories), (SubCategory, self.subcategories)]:
+            objects = list(model.objects.only('id', 'name', 'slug'))
+            for obj in objects:
+                lookup.setdefault(obj.name.lower(), obj.id)
+            for obj in objects:
+                if obj.slug:
+                    lookup[obj.slug.lower()] = obj.id
+
+    def _parse_row(self, values):
+        """把一行解析为 (产品字段值, {子项列: [(名称, 值)]})，有误时抛出 ValueError"""
+        fields = {}
+        for column in TEXT_COLUMNS:
+            if values.get(column):
+                fields[column] = values[column]
+        for column in BOOLEAN_COLUMNS:
+            text = values.get(column, '').lower()
+            if text in TRUE_VALUES:
+                fields[column] = True
+            elif text in FALSE_VALUES:
+                fields[column] = False
+            elif text:
+                raise ValueError(f'{column} 的值"{values[column]}"不是有效的是/否')
+        for column in INTEGER_COLUMNS:
+            if values.get(column):
+                try:
+                    fields[column] = int(values[column])
+                except ValueError:
+                    raise ValueError(f'{column} 的值"{values[column]}"不是整数')
+        if values.get('category'):
+            fields['category_id'] = self.categories.get(values['category'].lower())
+            if fields['category_id'] is None:
+                raise ValueError(f'分类"{values["category"]}"不存在')
+        if values.get('subcategory'):
+            fields['subcategory_id'] = self.subcategories.get(values['subcategory'].lower())
+            if fields['subcategory_id'] is None:
+                raise ValueError(f'子分类"{values["subcategory"]}"不存在')
+
+        items = {
+            'specification_items': [(key[1], value) for key, value in values.items() if isinstance(key, tuple) and value],
+        }
+        for column in ITEM_COLUMNS:
+            items.setdefault(column, []).extend(_parse_items(values.get(column, '')))
+        items = {column: rows for column, rows in items.items() if rows}
+        for column, rows in items.items():
+            for name, value in rows:
+                if not name or not value:
+                    raise ValueError(f'{column} 中的"{name}: {value}"缺少名称或值')
+                if len(name) > 200:
+                    raise ValueError(f'{column} 中的名称"{name[:20]}..."超过 200 个字符')
+        return fields, items
+
+    def _record_error(self, row_num, error):
+        self.job.error_count += 1
+        if len(self.job.errors) < MAX_STORED_ERRORS:
+            self.job.errors.append([row_num, str(error)])
+
+    def _write_chunk(self, rows):
+        parsed = []
+        seen = set()
+        for row_num, values in rows:
+            slug = values.get('slug', '')
+            try:
+                if not slug or len(slug) > 50 or not validate_slug.regex.match(slug):
+                    raise ValueError(f'slug"{slug}"无效（只能包含字母、数字、下划线或中划线）')
+                if slug in seen:
+                    raise ValueError(f'slug"{slug}"在同一批数据中重复')
+                fields, items = self._parse_row(values)
+            except ValueError as e:
+                self._record_error(row_num, e)
+                continue
+            seen.add(slug)
+            parsed.append((row_num, slug, fields, items))
+
+        existing = Product.objects.in_bulk([slug for _, slug, _, _ in parsed], field_name='slug')
+        now = timezone.now()
+        creates, updates, update_fields = [], [], {'updated_at'}
+        items_by_product = []
+        for row_num, slug, fields, items in parsed:
+            product = existing.get(slug)
+            if product is None:
+                missing = [column for column in REQUIRED_ON_CREATE if f'{column}_id' not in fields and column not in fields]
+                if missing:
+                    self._record_error(row_num, f'新产品缺少必填列: {", ".join(missing)}')
+                    continue
+                product = Product(slug=slug, **fields)
+                creates.append(product)
+            else:
+                for field, value in fields.items():
+                    setattr(product, field, value)
+                product.updated_at = now  # bulk_update 不会自动更新 auto_now 字段
+                update_fields.update(fields)
+                updates.append(product)
+            items_by_product.append((product, items))
+
+        with transaction.atomic():
+            Product.objects.bulk_create(creates)
+            if updates:
+                Product.objects.bulk_update(updates, sorted(update_fields))
+            for column, (model, value_field) in ITEM_COLUMNS.items():
+                replaced = [(product, items[column]) for product, items in items_by_product if column in items]
+                if not replaced:
+                    continue
+                # 直接删除，不逐条发送 post_delete（逐条使响应缓存失效）；批次结束时统一处理
+                stale_items = model.objects.filter(product_id__in=[product.id for product, _ in replaced])
+                stale_items._raw_delete(stale_items.db)
+                model.objects.bulk_create([
+                    model(product=product, name=name, order=order, **{value_field: value})
+                    for product, product_items in replaced
+                    for order, (name, value) in enumerate(product_items)
+                ])
+
+            self.job.processed_rows += len(rows)
+            self.job.created_count += len(creates)
+            self.job.updated_count += len(updates)
+            self.job.save()
+
+        events.record([product.id for product in creates], created=True)
+        events.record([product.id for product in updates])
+        if self.progress:
+            self.progress(self.job)
+
+    def run(self):
+        """执行（或继续）导入，返回导入任务"""
+        job = self.job
+        self._load_categories()
+        if not job.total_rows:
+            with job.file.open('rb') as file:
+                job.total_rows = sum(1 for _ in iter_catalog_rows(file))
+        job.status = 'running'
+        job.message = ''
+        job.save()
+
+        with events.batch():
+            try:
+                with job.file.open('rb') as file:
+                    rows = itertools.islice(iter_catalog_rows(file), job.processed_rows, None)
+                    while True:
+                        chunk = list(itertools.islice(rows, self.chunk_size))
+                        if not chunk:
+                            break
+                        self._write_chunk(chunk)
+            except Exception as e:
+                job.refresh_from_db()  # 丢弃失败分块中未提交的计数
+                job.status = 'failed'
+                job.message = f'已处理 {job.processed_rows} 行后导入失败: {e}'
+                job.save()
+                raise
+        job.status = 'completed'
+        job.finished_at = timezone.now()
+        job.message = (
+            f'新增 {job.created_count} 个，更新 {job.updated_count} 个产品，'
+            f'{job.error_count} 行有误未导入'
+        )
+        job.save()
+        return job
+
+
+def resumable_jobs(queryset):
+    """可以开始或继续的导入任务：未完成，且不在导入中（导入中但长时间没有进度的视为已中断）"""
+    stale_before = timezone.now() - timedelta(seconds=IMPORT_STALE_SECONDS)
+    return queryset.exclude(status='completed').exclude(status='running', updated_at__gte=stale_before)
+
+
+def start_import_in_background(job):
+    """在后台线程中执行导入任务（管理后台使用），进度记录在导入任务中
+
+    先以条件更新把任务标记为导入中，同一任务被同时继续时只启动一次；返回是否已启动。
+    """
+    claimed = resumable_jobs(ImportJob.objects.filter(id=job.id)).update(
+        status='running', updated_at=timezone.now()
+    )
+    if not claimed:
+        return False
+
+    def run():
+        try:
+            CatalogImporter(ImportJob.objects.get(id=job.id)).run()
+        except Exception as e:
+            print(f"产品目录导入失败 任务 {job.id}: {e}")
+        finally:
+            close_old_connections()
+
+    job.status = 'running'
+    threading.Thread(target=run, daemon=True).start()
+    return True
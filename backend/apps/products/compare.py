@@ -0,0 +1,114 @@
+"""
+产品对比 - 服务端计算对齐的规格矩阵
+
+每个产品取有效规格（产品自身规格优先，没有时继承模板规格，与详情页合并逻辑一致），
+规格名称按 normalize_spec_name 归一后对齐为行，产品为列，值不一致的行标记 differs。
+查询次数固定：产品+分类、产品规格、模板、模板规格各一次，与对比的产品数量无关。
+"""
+from django.conf import settings
+
+from .caching import entry_tag, response_cache
+from .models import Product, TemplateSpecification
+from .serializers import primary_image_url
+from .services import translation_service
+from .spec_ranges import effective_specs, normalize_spec_name
+from .template_serializers import build_template_resolver
+
+
+# 一次最多对比的产品数量
+COMPARE_MAX_IDS = 6
+
+# 对比结果依赖的缓存命名空间
+COMPARE_NAMESPACES = ['products', 'categories', 'templates', 'translations']
+
+
+def _normalize_value(value):
+    return ' '.join((value or '').casefold().split())
+
+
+def compare_products(ids, language='zh', request=None):
+    """计算规格对比矩阵，列按 ids 的顺序排列
+
+    返回 {'products': [...], 'rows': [{'key', 'name', 'values', 'differs'}], 'missing': [...]}，
+    某个产品没有该规格时对应的值为 None。
+    """
+    product_map = Product.objects.filter(is_active=True).select_related('category').only(
+        'id', 'name', 'slug', 'category_id', 'category__name', 'subcategory_id',
+        'template_id', 'use_template', 'primary_image'
+    ).prefetch_related('specification_items').in_bulk(ids)
+    products = [product_map[pk] for pk in ids if pk in product_map]
+
+    resolve_template = build_template_resolver()
+    template_ids = set()
+    for product in products:
+        template = resolve_template(product)
+        if template and not product.specification_items.all():
+            template_ids.add(template.id)
+    template_specs = {}
+    for item in TemplateSpecification.objects.filter(template_id__in=template_ids).order_by('order', 'created_at'):
+        template_specs.setdefault(item.template_id, []).append((item.name, item.value))
+
+    translations = {}
+    if language != 'zh':
+        translations = {
+            model_name: translation_service.get_translations(model_name, language)
+            for model_name in ['product', 'category']
+        }
+
+    columns = []
+    rows = {}
+    for index, product in enumerate(products):
+        template_id, specs = effective_specs(product, resolve_template, template_specs)
+        columns.append({
+            'id': product.id,
+            'name': translations.get('product', {}).get(f"name_{product.id}") or product.name,
+            'slug': product.slug,
+            'category_name': translations.get('category', {}).get(f"name_{product.category_id}") or product.category.name,
+            'image': primary_image_url(product, request),
+            'spec_source': 'template' if template_id else 'product',
+        })
+        for name, value in specs:
+            key = normalize_spec_name(name)[0] or name
+            row = rows.setdefault(key, {'key': key, 'name': name, 'values': [None] * len(products)})
+            # 同一产品同名规格出现多次时合并显示
+            current = row['values'][index]
+            row['values'][index] = value if current is None else f"{current}; {value}"
+
+    for row in rows.values():
+        distinct = {None if value is None else _normalize_value(value) for value in row['values']}
+        row['differs'] = len(distinct) > 1
+
+    return {
+        'products': columns,
+        'rows': list(rows.values()),
+        'missing': [pk for pk in ids if pk not in product_map],
+    }
+
+
+def cached_comparison(ids, language='zh', request=None):
+    """按产品ID集合和语言缓存对比矩阵，返回 (矩阵, 缓存状态, 内容标识)
+
+    缓存键与ID顺序无关（同一组产品换个顺序对比命中同一条缓存），取出后再按请求的顺序排列列。
+    内容标识为缓存条目标识加请求的ID顺序，未启用缓存时为None。
+    """
+    canonical = sorted(set(ids))
+    if not getattr(settings, 'API_CACHE_ENABLED', True):
+        matrix, state, tag = compare_products(canonical, language, request), 'MISS', None
+    else:
+        origin = f'{request.scheme}://{request.get_host()}' if request else ''
+        key = f"apicache:products.compare:{origin}:{language}:{','.join(map(str, canonical))}"
+        entry, state = response_cache.get_entry(
+            key, lambda: compare_products(canonical, language, request), 'products.compare', COMPARE_NAMESPACES
+        )
+        matrix, tag = entry['value'], f"{entry_tag(key, entry)}:{','.join(map(str, ids))}"
+
+    positions = {column['id']: index for index, column in enumerate(matrix['products'])}
+    order = [positions[pk] for pk in ids if pk in positions]
+    return {
+        'products': [matrix['products'][index] for index in order],
+        'rows': [
+            dict(row, values=[row['values'][index] for index in order])
+            for row in matrix['rows']
+        ],
+        'missing': [pk for pk in ids if pk not in positions],
+    }, state, tag
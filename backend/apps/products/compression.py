@@ -0,0 +1,105 @@
+"""
+API响应压缩 - 按 Accept-Encoding 协商 br（安装 brotli 时）/ gzip
+
+小于阈值的响应不压缩。来自响应缓存的响应带有 response.cache_tag（缓存条目的标识，见 caching.entry_tag），
+带强ETag的响应以ETag为标识，压缩结果按 "标识 + 内容类型 + 编码" 存入缓存，热点响应只压缩一次，
+命中时不需要对响应内容计算摘要；其他响应直接压缩、不缓存。
+"""
+import gzip
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli 为可选依赖
+    brotli = None
+
+
+# 默认配置，可在 settings 中覆盖
+DEFAULT_MIN_SIZE = 1024           # 小于该字节数的响应不压缩
+DEFAULT_PATH_PREFIXES = ['/api/']  # 只压缩这些路径下的响应
+DEFAULT_CACHE_TIMEOUT = 600       # 压缩结果的缓存时长（秒）
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=BROTLI_QUALITY)
+    return gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def negotiate_encoding(accept_encoding):
+    """根据 Accept-Encoding 选择编码，优先 br，其次 gzip，都不接受时返回None"""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value.strip())
+                except ValueError:
+                    quality = 0.0
+        if name:
+            accepted[name] = quality
+    wildcard = accepted.get('*', 0.0)
+    for encoding in (['br'] if brotli is not None else []) + ['gzip']:
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """API响应压缩中间件（需放在会读取或修改响应内容的中间件之前）"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'API_COMPRESSION_ENABLED', True)
+        self.min_size = getattr(settings, 'API_COMPRESSION_MIN_SIZE', DEFAULT_MIN_SIZE)
+        self.path_prefixes = tuple(getattr(settings, 'API_COMPRESSION_PATH_PREFIXES', DEFAULT_PATH_PREFIXES))
+        self.cache_timeout = getattr(settings, 'API_COMPRESSION_CACHE_TIMEOUT', DEFAULT_CACHE_TIMEOUT)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self.enabled or not request.path.startswith(self.path_prefixes):
+            return response
+        if response.streaming or response.status_code != 200 or response.has_header('Content-Encoding'):
+            return response
+
+        # 无论本次是否压缩，响应内容都随 Accept-Encoding 变化
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < self.min_size:
+            return response
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        tag = getattr(response, 'cache_tag', None)
+        if tag is None and response.get('ETag', '').startswith('"'):
+            tag = response['ETag']
+        if tag is not None:
+            digest = hashlib.md5(f"{tag}:{response.get('Content-Type', '')}".encode('utf-8')).hexdigest()
+            key = f"apicache:compressed:{encoding}:{digest}"
+            compressed = cache.get(key)
+            if compressed is None:
+                compressed = _compress(response.content, encoding)
+                cache.set(key, compressed, self.cache_timeout)
+        else:
+            compressed = _compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # 压缩后的表示与原始字节不同，强ETag改为弱ETag（与 Django GZipMiddleware 一致）
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
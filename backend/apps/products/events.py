@@ -0,0 +1,95 @@
+"""
+产品变更事件 - 批量写入时把逐条的信号处理合并为一次
+
+单个产品保存时，post_save 的接收器会逐条执行自动翻译（8种语言）、搜索索引、规格数值、相关产品等更新，
+批量导入/同步时代价过高。在 batch() 中写入时，这些接收器只记录产品ID（record() 返回True时跳过本次处理），
+退出批次后发送一次 products_changed 信号，由接收器对全部变更的产品统一处理。
+模板及模板规格的变更同样按模板ID记录（record_templates()），批次结束时发送一次 templates_changed。
+bulk_create / bulk_update 不会触发模型信号，调用方需自行 record() / record_templates() 写入的对象。
+"""
+import threading
+from contextlib import contextmanager
+
+from django.dispatch import Signal
+
+
+# 批次结束时发送，参数：product_ids（全部变更的产品ID）、created_ids、deleted_ids、referrer_ids（被删除产品的引用方）
+products_changed = Signal()
+# 批次结束时发送，参数：template_ids（模板本身或其规格等内容变更的模板ID）
+templates_changed = Signal()
+
+_local = threading.local()
+
+
+class ProductBatch:
+    """一次批量写入中记录的产品变更"""
+
+    def __init__(self):
+        self.product_ids = set()
+        self.created_ids = set()
+        self.deleted_ids = set()
+        self.referrer_ids = set()
+        self.template_ids = set()
+
+    def record(self, product_ids, created=False, deleted=False, referrer_ids=()):
+        product_ids = set(product_ids)
+        self.product_ids |= product_ids
+        if created:
+            self.created_ids |= product_ids
+        if deleted:
+            self.deleted_ids |= product_ids
+        self.referrer_ids |= set(referrer_ids)
+
+    def record_templates(self, template_ids):
+        self.template_ids |= set(template_ids)
+
+
+def current_batch():
+    """当前线程正在进行的批次，不在批次中时返回None"""
+    return getattr(_local, 'batch', None)
+
+
+@contextmanager
+def batch():
+    """合并产品变更事件，可嵌套（只有最外层批次结束时发送信号）
+
+    即使批次中途出错也会发送已记录的变更（已提交的分块需要更新派生数据）。
+    """
+    outer = current_batch()
+    if outer is not None:
+        yield outer
+        return
+
+    current = _local.batch = ProductBatch()
+    try:
+        yield current
+    finally:
+        _local.batch = None
+        if current.product_ids:
+            products_changed.send(
+                sender=ProductBatch,
+                product_ids=sorted(current.product_ids),
+                created_ids=sorted(current.created_ids),
+                deleted_ids=sorted(current.deleted_ids),
+                referrer_ids=sorted(current.referrer_ids - current.deleted_ids),
+            )
+        if current.template_ids:
+            templates_changed.send(sender=ProductBatch, template_ids=sorted(current.template_ids))
+
+
+def record(product_ids, created=False, deleted=False, referrer_ids=()):
+    """在批次中记录产品变更，返回是否已记录（不在批次中时返回False，调用方应立即处理）"""
+    current = current_batch()
+    if current is None:
+        return False
+    current.record(product_ids, created=created, deleted=deleted, referrer_ids=referrer_ids)
+    return True
+
+
+def record_templates(template_ids):
+    """在批次中记录模板变更，返回是否已记录（不在批次中时返回False）"""
+    current = current_batch()
+    if current is None:
+        return False
+    current.record_templates(template_ids)
+    return True
@@ -0,0 +1,267 @@
+"""
+数据导出 - CSV / XLSX / NDJSON 流式输出
+
+行数据由生成器逐条产出（查询使用 iterator(chunk_size=...) 分块读取），写出时逐行编码，
+内存占用与导出行数无关：
+- csv：逐行编码后直接输出（带BOM，Excel可直接打开）
+- ndjson：每行一个JSON对象，列表等结构原样保留
+- xlsx：openpyxl 只写模式逐行写入临时文件，完成后分块输出文件内容
+
+产品导出的列与 import_catalog 的导入格式一致（规格/特性/应用为“名称: 值”的多行文本），
+导出的表格修改后可重新导入；规格来自模板的行（spec_source 为 template）重新导入前应清空
+specification_items 列，否则模板规格会写入为产品自身的规格。
+"""
+import csv
+import datetime
+import sys
+import tempfile
+
+import openpyxl
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+from .catalog_import import TEXT_COLUMNS
+from .models import Category, SubCategory, Product
+from .renderers import dumps
+from .services import translation_service
+from .spec_ranges import effective_specs, load_template_specs
+from .template_serializers import build_template_resolver
+
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+EXPORT_CHUNK_SIZE = 500      # 每次从数据库读取的行数
+STREAM_BLOCK_SIZE = 64 * 1024
+XLSX_MAX_CELL_LENGTH = 32767  # Excel 单元格的最大字符数
+
+
+# ---------- 写出 ----------
+
+def _tabular(value):
+    """CSV/XLSX 单元格的值：列表展开为“名称: 值”的多行文本"""
+    if isinstance(value, (list, tuple)):
+        return '\n'.join(
+            f"{item[0]}: {item[1]}" if isinstance(item, (list, tuple)) else str(item) for item in value
+        )
+    if isinstance(value, datetime.datetime):
+        return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S') if timezone.is_aware(value) else value
+    if value is None:
+        return ''
+    return value
+
+
+class _Echo:
+    """csv.writer 的伪文件：write() 直接返回编码后的行"""
+
+    def write(self, value):
+        return value.encode('utf-8')
+
+
+def iter_csv(columns, rows):
+    writer = csv.writer(_Echo())
+    yield '﻿'.encode('utf-8') + writer.writerow(list(columns))
+    for row in rows:
+        yield writer.writerow([_tabular(row.get(key)) for key in columns])
+
+
+def iter_ndjson(columns, rows):
+    for row in rows:
+        yield dumps({key: row.get(key) for key in columns}) + b'\n'
+
+
+def iter_xlsx(columns, rows, title='export'):
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title[:31])
+    sheet.append(list(columns))
+    for row in rows:
+        cells = []
+        for key in columns:
+            value = _tabular(row.get(key))
+            if isinstance(value, str):
+                value = ILLEGAL_CHARACTERS_RE.sub('', value)[:XLSX_MAX_CELL_LENGTH]
+            cells.append(value)
+        sheet.append(cells)
+
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while True:
+            block = output.read(STREAM_BLOCK_SIZE)
+            if not block:
+                break
+            yield block
+
+
+def iter_export(output_format, columns, rows, title='export'):
+    """按格式逐块产出导出内容（bytes）"""
+    if output_format == 'csv':
+        return iter_csv(columns, rows)
+    if output_format == 'ndjson':
+        return iter_ndjson(columns, rows)
+    if output_format == 'xlsx':
+        return iter_xlsx(columns, rows, title)
+    raise ValueError(f'不支持的导出格式: {output_format}')
+
+
+def get_export_format(request):
+    """导出格式（?output=csv|xlsx|ndjson，默认csv）
+
+    ?format= 已被DRF用于选择渲染器，这里使用 output 参数。
+    """
+    output_format = request.query_params.get('output', 'csv')
+    if output_format not in EXPORT_FORMATS:
+        raise ValidationError({'output': f'导出格式必须为 {"/".join(EXPORT_FORMATS)}'})
+    return output_format
+
+
+def streaming_export_response(output_format, columns, rows, filename):
+    """流式导出响应"""
+    response = StreamingHttpResponse(
+        iter_export(output_format, columns, rows, title=filename),
+        content_type=EXPORT_FORMATS[output_format],
+    )
+    stamp = timezone.localtime().strftime('%Y%m%d%H%M%S')
+    response['Content-Disposition'] = f'attachment; filename="{filename}-{stamp}.{output_format}"'
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def export_format_for_path(path):
+    """按输出文件的扩展名确定导出格式，无法识别时为csv"""
+    extension = path.rsplit('.', 1)[-1].lower()
+    return extension if extension in EXPORT_FORMATS else 'csv'
+
+
+def write_export(output_format, columns, rows, path, title='export'):
+    """写出到文件（管理命令使用，path 为 - 时写到标准输出），返回字节数"""
+    total = 0
+    with (open(sys.stdout.fileno(), 'wb', closefd=False) if path == '-' else open(path, 'wb')) as file:
+        for block in iter_export(output_format, columns, rows, title):
+            file.write(block)
+            total += len(block)
+    return total
+
+
+# ---------- 过滤 ----------
+
+def parse_date_range(params):
+    """解析 ?date_from=&date_to=（YYYY-MM-DD，包含两端），返回 (开始日期, 结束日期)"""
+    dates = []
+    for name in ('date_from', 'date_to'):
+        value = params.get(name)
+        try:
+            parsed = parse_date(value) if value else None
+        except ValueError:
+            parsed = None
+        if value and parsed is None:
+            raise ValidationError({name: '日期格式应为 YYYY-MM-DD'})
+        dates.append(parsed)
+    return tuple(dates)
+
+
+def filter_date_range(queryset, field, params):
+    date_from, date_to = parse_date_range(params)
+    if date_from:
+        queryset = queryset.filter(**{f'{field}__date__gte': date_from})
+    if date_to:
+        queryset = queryset.filter(**{f'{field}__date__lte': date_to})
+    return queryset
+
+
+def _id_or_slug(queryset, value):
+    return queryset.filter(id=int(value)) if value.isdigit() else queryset.filter(slug=value)
+
+
+def filter_products(queryset, params):
+    """产品导出的过滤：category / subcategory（ID或slug）、is_active、更新日期范围"""
+    if params.get('category'):
+        queryset = queryset.filter(category__in=_id_or_slug(Category.objects.all(), params['category']))
+    if params.get('subcategory'):
+        queryset = queryset.filter(subcategory__in=_id_or_slug(SubCategory.objects.all(), params['subcategory']))
+    if params.get('is_active') in ('true', 'false'):
+        queryset = queryset.filter(is_active=params['is_active'] == 'true')
+    return filter_date_range(queryset, 'updated_at', params)
+
+
+# ---------- 产品 ----------
+
+# 模型名称 -> (模型, 翻译的字段)，与 TranslationService 保存翻译时使用的键一致
+TRANSLATED_MODELS = {
+    'product': (Product, ['name', 'description', 'features', 'applications']),
+    'category': (Category, ['name', 'description']),
+    'subcategory': (SubCategory, ['name', 'description']),
+}
+
+
+PRODUCT_EXPORT_COLUMNS = [
+    'id', 'slug', 'name', 'description', 'category', 'subcategory', 'template',
+    'features', 'applications', 'specifications', 'range_param', 'type_param',
+    'surface_treatment', 'colors', 'grade', 'temper', 'is_featured', 'is_active', 'order',
+    'specification_items', 'spec_source', 'feature_items', 'application_items',
+    'created_at', 'updated_at',
+]
+
+
+def iter_product_rows(queryset, language=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """逐个产出产品行，规格为合并模板后的有效规格（spec_source 标明来自产品或模板）
+
+    指定 language 时已翻译的字段使用译文，未翻译的字段使用原文。
+    """
+    resolve_template = build_template_resolver()
+    template_specs = load_template_specs()
+    translations = translation_service.get_translations('product', language) if language else {}
+
+    queryset = queryset.select_related('category', 'subcategory').prefetch_related(
+        'specification_items', 'feature_items', 'application_items'
+    ).order_by('id')
+    for product in queryset.iterator(chunk_size=chunk_size):
+        template_id, specs = effective_specs(product, resolve_template, template_specs)
+        template = resolve_template(product)
+        row = {
+            'id': product.id,
+            'slug': product.slug,
+            'category': product.category.slug,
+            'subcategory': product.subcategory.slug if product.subcategory else '',
+            'template': template.name if template else '',
+            'is_featured': product.is_featured,
+            'is_active': product.is_active,
+            'order': product.order,
+            'specification_items': [[name, value] for name, value in specs],
+            'spec_source': 'template' if template_id else 'product',
+            'feature_items': [[item.name, item.description] for item in product.feature_items.all()],
+            'application_items': [[item.name, item.description] for item in product.application_items.all()],
+            'created_at': product.created_at,
+            'updated_at': product.updated_at,
+        }
+        for field in TEXT_COLUMNS:
+            row[field] = getattr(product, field)
+        for field in TRANSLATED_MODELS['product'][1]:
+            row[field] = translations.get(f"{field}_{product.id}") or row[field]
+        yield row
+
+
+# ---------- 翻译 ----------
+
+TRANSLATION_EXPORT_COLUMNS = ['model', 'id', 'field', 'source', 'translation']
+
+
+def iter_translation_rows(language, model_names=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """逐条产出 原文 / 译文 对照行，未翻译的字段译文为空"""
+    for model_name in model_names or TRANSLATED_MODELS:
+        model, fields = TRANSLATED_MODELS[model_name]
+        translations = translation_service.get_translations(model_name, language)
+        for obj in model.objects.only('id', *fields).order_by('id').iterator(chunk_size=chunk_size):
+            for field in fields:
+                yield {
+                    'model': model_name,
+                    'id': obj.id,
+                    'field': field,
+                    'source': getattr(obj, field),
+                    'translation': translations.get(f"{field}_{obj.id}", ''),
+                }
@@ -0,0 +1,264 @@
+"""
+产品属性分面 - 牌号、状态、表面处理、颜色的倒排索引
+
+Product 中这些字段是逗号分隔的自由文本，这里将其规范化为词条集合，
+并在每个worker进程内维护 "属性值 -> 产品ID位图" 的倒排索引。
+位图用Python整数表示（第N位为1表示产品N命中），筛选组合即位运算交集，
+分面计数即 popcount，不需要任何 SQL LIKE 查询。
+"""
+import json
+import re
+import threading
+
+from django.db import connection
+
+from .caching import response_cache
+from .models import Product
+from .template_serializers import build_template_resolver
+
+
+# 可筛选的属性字段
+FACET_ATTRIBUTES = ['grade', 'temper', 'surface_treatment', 'colors']
+
+# 只参与筛选、不输出分面的维度（值为ID）
+FILTER_DIMENSIONS = ['category', 'subcategory']
+
+# 索引依赖的数据命名空间（模板提供属性默认值）
+FACET_NAMESPACES = ['products', 'templates']
+
+SPLIT_RE = re.compile(r'\s*(?:[,，;；/、|]|\bor\b|\band\b|或)\s*', re.IGNORECASE)
+SUFFIX_RE = re.compile(r'\s*(?:series|系列)$', re.IGNORECASE)
+
+
+def normalize_tokens(value):
+    """将自由文本拆分为规范化词条，返回 {词条键: 显示文本}
+
+    例如 "6063 Series" -> {"6063": "6063"}，
+    "Silver, White or customized" -> {"silver": "Silver", "white": "White", "customized": "Customized"}
+    """
+    tokens = {}
+    for part in SPLIT_RE.split(value or ''):
+        label = SUFFIX_RE.sub('', part.strip(' .')).strip()
+        if not label:
+            continue
+        key = label.casefold()
+        if key not in tokens:
+            tokens[key] = label[0].upper() + label[1:]
+    return tokens
+
+
+def product_attribute_tokens(product, resolve_template):
+    """计算产品各维度的词条，属性为空时使用模板值（与详情页合并逻辑一致）
+
+    返回 {维度: {词条键: 显示文本}}，维度包括 FACET_ATTRIBUTES 和 FILTER_DIMENSIONS。
+    """
+    template = None
+    result = {}
+    for attribute in FACET_ATTRIBUTES:
+        value = getattr(product, attribute)
+        if not value:
+            if template is None:
+                template = resolve_template(product) or False
+            value = getattr(template, attribute, '') if template else ''
+        result[attribute] = normalize_tokens(value)
+    for dimension in FILTER_DIMENSIONS:
+        value = getattr(product, f'{dimension}_id')
+        result[dimension] = {str(value): str(value)} if value else {}
+    return result
+
+
+def bitmap_from_ids(ids):
+    """由ID集合构建位图（先写入字节数组再整体转换，避免逐位操作大整数）"""
+    ids = list(ids)
+    if not ids:
+        return 0
+    buffer = bytearray(max(ids) // 8 + 1)
+    for product_id in ids:
+        buffer[product_id >> 3] |= 1 << (product_id & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def ids_from_bitmap(bitmap):
+    """按从小到大的顺序返回位图中为1的位"""
+    bits = bin(bitmap)[:1:-1]
+    return [position for position, bit in enumerate(bits) if bit == '1']
+
+
+def filter_queryset_by_ids(queryset, ids):
+    """按ID集合过滤查询集
+
+    SQLite 上用 json_each 传入单个参数，避免 IN 列表超过SQL变量数上限。
+    """
+    ids = list(ids)
+    if connection.vendor == 'sqlite':
+        table = queryset.model._meta.db_table
+        return queryset.extra(
+            where=[f'"{table}"."id" IN (SELECT value FROM json_each(%s))'],
+            params=[json.dumps(ids)]
+        )
+    return queryset.filter(id__in=ids)
+
+
+class FacetIndex:
+    """属性分面索引服务（每个进程一份）"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._versions = None
+        self._all = 0            # 所有激活产品
+        self._bitmaps = {}       # 属性 -> {词条键: 位图}
+        self._labels = {}        # 属性 -> {词条键: 显示文本}
+        self._product_tokens = {}  # 产品ID -> {属性: 词条键集合}
+
+    # ---------- 构建 ----------
+
+    def _add(self, product_id, tokens_by_dimension):
+        bit = 1 << product_id
+        self._all |= bit
+        tokens_by_attribute = {}
+        for attribute, tokens in tokens_by_dimension.items():
+            tokens_by_attribute[attribute] = set(tokens)
+            bitmaps = self._bitmaps.setdefault(attribute, {})
+            labels = self._labels.setdefault(attribute, {})
+            for key, label in tokens.items():
+                bitmaps[key] = bitmaps.get(key, 0) | bit
+                labels.setdefault(key, label)
+        self._product_tokens[product_id] = tokens_by_attribute
+
+    def _remove(self, product_id):
+        tokens_by_attribute = self._product_tokens.pop(product_id, None)
+        if tokens_by_attribute is None:
+            return
+        mask = ~(1 << product_id)
+        self._all &= mask
+        for attribute, keys in tokens_by_attribute.items():
+            bitmaps = self._bitmaps[attribute]
+            for key in keys:
+                bitmaps[key] &= mask
+                if not bitmaps[key]:
+                    del bitmaps[key]
+
+    def _product_queryset(self):
+        return Product.objects.filter(is_active=True).only(
+            'id', 'template_id', 'use_template', 'category_id', 'subcategory_id', *FACET_ATTRIBUTES
+        )
+
+    def rebuild(self):
+        """从数据库全量构建索引（先读取版本号：构建期间发生的变更在下次查询时再触发重建）"""
+        with self._lock:
+            versions = response_cache.versions(FACET_NAMESPACES)
+            self._all = 0
+            self._bitmaps = {}
+            self._labels = {}
+            self._product_tokens = {}
+            resolve_template = build_template_resolver()
+            all_ids = []
+            ids_by_token = {attribute: {} for attribute in FACET_ATTRIBUTES + FILTER_DIMENSIONS}
+            for product in self._product_queryset().iterator(chunk_size=2000):
+                all_ids.append(product.id)
+                tokens_by_attribute = {}
+                for attribute, tokens in product_attribute_tokens(product, resolve_template).items():
+                    tokens_by_attribute[attribute] = set(tokens)
+                    labels = self._labels.setdefault(attribute, {})
+                    for key, label in tokens.items():
+                        ids_by_token[attribute].setdefault(key, []).append(product.id)
+                        labels.setdefault(key, label)
+                self._product_tokens[product.id] = tokens_by_attribute
+            self._all = bitmap_from_ids(all_ids)
+            self._bitmaps = {
+                attribute: {key: bitmap_from_ids(ids) for key, ids in tokens.items()}
+                for attribute, tokens in ids_by_token.items()
+            }
+            self._versions = versions
+
+    def update_product(self, product, deleted=False):
+        """增量更新单个产品（信号调用）"""
+        with self._lock:
+            if self._versions is None:
+                return  # 尚未构建，首次请求时全量构建
+            self._remove(product.id)
+            if product.is_active and not deleted:
+                self._add(product.id, product_attribute_tokens(product, build_template_resolver()))
+            # 期间只有本次变更时记录最新版本号，其他worker同时有变更时下次查询全量重建
+            self._versions = response_cache.synced_versions(self._versions, FACET_NAMESPACES, ['products'])
+
+    def _ensure_current(self):
+        if self._versions != response_cache.versions(FACET_NAMESPACES):
+            self.rebuild()
+
+    # ---------- 查询 ----------
+
+    @staticmethod
+    def parse_filters(query_params, include_dimensions=False):
+        """从查询参数中解析属性筛选：同一属性多个值为"或"，不同属性之间为"且"
+
+        include_dimensions 为True时同时解析分类/子分类筛选。
+        """
+        filters = {}
+        for attribute in FACET_ATTRIBUTES:
+            values = []
+            for raw in query_params.getlist(attribute):
+                values.extend(normalize_tokens(raw))
+            if values:
+                filters[attribute] = values
+        if include_dimensions:
+            for dimension in FILTER_DIMENSIONS:
+                values = [value.strip() for raw in query_params.getlist(dimension) for value in raw.split(',')]
+                values = [value for value in values if value]
+                if values:
+                    filters[dimension] = values
+        return filters
+
+    def _attribute_bitmap(self, attribute, keys):
+        bitmaps = self._bitmaps.get(attribute, {})
+        result = 0
+        for key in keys:
+            result |= bitmaps.get(key, 0)
+        return result
+
+    def _match(self, filters, exclude=None, base=None):
+        result = self._all if base is None else base & self._all
+        for attribute, keys in filters.items():
+            if attribute != exclude:
+                result &= self._attribute_bitmap(attribute, keys)
+        return result
+
+    def filter_ids(self, filters):
+        """返回满足筛选条件的产品ID列表"""
+        self._ensure_current()
+        with self._lock:
+            return ids_from_bitmap(self._match(filters))
+
+    def facet(self, filters, base_ids=None):
+        """筛选并计算分面
+
+        每个属性的计数基于"除该属性外的其他筛选条件"，这样已选属性的其他取值仍显示可选数量。
+        base_ids 为额外的限定集合（如全文搜索的结果）。
+        返回 (命中ID列表, {属性: [{value, label, count, selected}]})
+        """
+        self._ensure_current()
+        base = bitmap_from_ids(base_ids) if base_ids is not None else None
+
+        with self._lock:
+            matched = self._match(filters, base=base)
+            facets = {}
+            for attribute in FACET_ATTRIBUTES:
+                scope = self._match(filters, exclude=attribute, base=base)
+                selected = set(filters.get(attribute, []))
+                items = []
+                for key, bitmap in self._bitmaps.get(attribute, {}).items():
+                    count = (bitmap & scope).bit_count()
+                    if count or key in selected:
+                        items.append({
+                            'value': key,
+                            'label': self._labels[attribute][key],
+                            'count': count,
+                            'selected': key in selected,
+                        })
+                items.sort(key=lambda item: (-item['count'], item['label']))
+                facets[attribute] = items
+            return ids_from_bitmap(matched), facets
+
+
+# 全局属性分面索引实例（每个worker进程一份）
+facet_index = FacetIndex()
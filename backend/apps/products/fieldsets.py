@@ -0,0 +1,96 @@
+"""
+产品列表的稀疏字段集
+
+?view=card 返回卡片精简结构，?fields=id,name,images 只输出指定字段。
+两种方式都会同步收窄SQL查询的列（.only()），并且只预取输出中实际用到的关联数据，
+不指定时按完整结构一次性预取，避免逐行查询关联表。
+"""
+from .models import Product
+
+
+# 游标分页需要读取排序字段，始终查询
+ALWAYS_COLUMNS = ['id', 'order', 'created_at']
+
+# 卡片视图需要的列（category__name 配合 select_related 只取分类名称）
+CARD_COLUMNS = ['name', 'slug', 'category', 'category__name', 'subcategory', 'is_featured', 'primary_image']
+
+# 序列化字段 -> 需要查询的列
+FIELD_COLUMNS = {
+    'translated_name': 'name',
+    'translated_description': 'description',
+    'translated_features': 'features',
+    'translated_applications': 'applications',
+    'template_name': 'template',
+    'primary_image_variants': 'primary_image',
+}
+
+# 序列化字段 -> 需要 select_related 的关联
+SELECT_RELATED_FIELDS = {
+    'category': 'category',
+    'subcategory': 'subcategory',
+    'template_name': 'template',
+}
+
+# 需要预取的一对多关联
+PREFETCH_FIELDS = ['images', 'specification_items', 'feature_items', 'application_items']
+
+# 非中文时 ?fields= 中的原文字段名对应翻译字段
+TRANSLATED_ALIASES = {
+    'name': 'translated_name',
+    'description': 'translated_description',
+    'features': 'translated_features',
+    'applications': 'translated_applications',
+}
+
+
+class ProductFieldset:
+    """解析请求中的 view/fields 参数，选择序列化器并优化查询集"""
+
+    def __init__(self, query_params, language='zh'):
+        self.language = language
+        self.card = query_params.get('view') == 'card'
+        raw = query_params.get('fields', '')
+        fields = {name.strip() for name in raw.split(',') if name.strip()}
+        if fields and language != 'zh':
+            fields = {TRANSLATED_ALIASES.get(name, name) for name in fields}
+        self.fields = fields if fields and not self.card else None
+
+    def serializer_class(self):
+        from .serializers import ProductCardSerializer, ProductSerializer, TranslatedProductSerializer
+
+        if self.card:
+            return ProductCardSerializer
+        if self.language != 'zh':
+            return TranslatedProductSerializer
+        return ProductSerializer
+
+    def context(self):
+        from .serializers import translation_tables
+
+        return {
+            'language': self.language, 'fields': self.fields,
+            'translations': translation_tables(self.language, ['product', 'category', 'subcategory']),
+        }
+
+    def optimize(self, queryset):
+        """按输出字段收窄查询列，只预取需要的关联"""
+        if self.card:
+            # 图片来自冗余字段 primary_image，不需要预取图片表
+            return queryset.select_related('category').only(*ALWAYS_COLUMNS, *CARD_COLUMNS)
+
+        output = set(self.serializer_class().Meta.fields)
+        if self.fields:
+            output &= self.fields
+        concrete = {field.name for field in Product._meta.concrete_fields}
+
+        columns = set(ALWAYS_COLUMNS)
+        for name in output:
+            column = FIELD_COLUMNS.get(name, name)
+            if column in concrete:
+                columns.add(column)
+        queryset = queryset.select_related(
+            *sorted({SELECT_RELATED_FIELDS[name] for name in output if name in SELECT_RELATED_FIELDS})
+        ).prefetch_related(*[name for name in PREFETCH_FIELDS if name in output])
+        if self.fields:
+            queryset = queryset.only(*columns)
+        return queryset
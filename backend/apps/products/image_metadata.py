@@ -0,0 +1,104 @@
+"""
+图片元数据 - 主色调和 blurhash 占位图
+
+在生成响应式版本的子进程中与版本一起计算（见 image_variants.render_variants），结果保存在 ImageAsset 中，
+前端据此在图片加载前按宽高比预留位置，并用主色调或 blurhash 解码出的模糊图作为占位。
+只依赖 Pillow，本模块不导入模型。
+"""
+import math
+
+from PIL import Image
+
+
+SAMPLE_SIZE = 32                 # 在不超过 32x32 的缩略图上计算
+BLURHASH_COMPONENTS = (4, 3)     # 横向、纵向分量数（横图）
+BASE83_CHARACTERS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+
+
+def _sample(image):
+    """缩小并去掉透明通道（透明部分按白色背景合成）"""
+    sample = image
+    if sample.mode in ('RGBA', 'LA', 'PA') or 'transparency' in sample.info:
+        rgba = sample.convert('RGBA')
+        sample = Image.new('RGB', rgba.size, (255, 255, 255))
+        sample.paste(rgba, mask=rgba.getchannel('A'))
+    elif sample.mode != 'RGB':
+        sample = sample.convert('RGB')
+    sample = sample.copy() if sample is image else sample
+    sample.thumbnail((SAMPLE_SIZE, SAMPLE_SIZE), Image.BILINEAR, reducing_gap=2.0)
+    return sample
+
+
+def dominant_color(sample):
+    """主色调（#rrggbb）：中位切分量化为5种颜色后取像素最多的一种"""
+    quantized = sample.quantize(colors=5, method=Image.Quantize.MEDIANCUT)
+    _, index = max(quantized.getcolors())
+    palette = quantized.getpalette()
+    return '#{:02x}{:02x}{:02x}'.format(*palette[index * 3:index * 3 + 3])
+
+
+# ---------- blurhash（https://github.com/woltapp/blurhash 的编码算法） ----------
+
+def _encode83(value, length):
+    return ''.join(BASE83_CHARACTERS[value // 83 ** (length - i - 1) % 83] for i in range(length))
+
+
+def _srgb_to_linear(value):
+    value = value / 255
+    return value / 12.92 if value <= 0.04045 else ((value + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value):
+    value = max(0.0, min(1.0, value))
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value, exponent):
+    return math.copysign(abs(value) ** exponent, value)
+
+
+def blurhash(sample, components=BLURHASH_COMPONENTS):
+    """把缩略图编码为 blurhash 字符串（竖图交换横纵分量数）"""
+    width, height = sample.size
+    x_components, y_components = components if width >= height else components[::-1]
+    linear = [tuple(_srgb_to_linear(channel) for channel in pixel) for pixel in sample.getdata()]
+
+    factors = []
+    for j in range(y_components):
+        cos_y = [math.cos(math.pi * j * y / height) for y in range(height)]
+        for i in range(x_components):
+            cos_x = [math.cos(math.pi * i * x / width) for x in range(width)]
+            r = g = b = 0.0
+            for y in range(height):
+                row = y * width
+                for x in range(width):
+                    basis = cos_x[x] * cos_y[y]
+                    pixel = linear[row + x]
+                    r += basis * pixel[0]
+                    g += basis * pixel[1]
+                    b += basis * pixel[2]
+            scale = (1 if i == j == 0 else 2) / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _encode83((x_components - 1) + (y_components - 1) * 9, 1)
+    if ac:
+        actual_max = max(abs(channel) for factor in ac for channel in factor)
+        quantised_max = max(0, min(82, math.floor(actual_max * 166 - 0.5)))
+        maximum = (quantised_max + 1) / 166
+    else:
+        quantised_max, maximum = 0, 1
+    result += _encode83(quantised_max, 1)
+    result += _encode83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+    for factor in ac:
+        r, g, b = (max(0, min(18, math.floor(_sign_pow(channel / maximum, 0.5) * 9 + 9.5))) for channel in factor)
+        result += _encode83(r * 19 * 19 + g * 19 + b, 2)
+    return result
+
+
+def image_metadata(image):
+    """已按 EXIF 方向旋转的图片 -> {'dominant_color', 'blurhash'}"""
+    sample = _sample(image)
+    return {'dominant_color': dominant_color(sample), 'blurhash': blurhash(sample)}
@@ -0,0 +1,311 @@
+"""
+按需缩放图片 - /media-resize/<宽>x<高>/<原图路径>
+
+预生成的版本（image_variants.py）只有固定宽度，管理后台、邮件、第三方嵌入等需要其他尺寸时使用：
+- ?fit=contain（默认）等比缩放到目标尺寸以内；?fit=cover 居中裁剪填满目标尺寸。宽或高为0表示不限制
+- ?fm=webp|jpeg|png 输出格式，默认与原图一致（GIF/BMP 输出为PNG）
+- 不放大；JPEG 用 draft() 按 1/2、1/4、1/8 缩小解码，其余缩放经 resize 的 reducing_gap 先用 reduce() 整数倍缩小
+
+尺寸限制：只能请求 IMAGE_RESIZE_ALLOWED_SIZES 中的尺寸，客户端不能任意组合宽高让服务器生成和缓存大量版本；
+以 . 开头的目录和文件（.watermark 备份、缩放缓存等）不对外提供。
+
+结果按内容键（原图路径、大小、修改时间和缩放参数的哈希）保存在磁盘缓存中，总大小超过上限时按最近使用时间
+（命中时更新文件修改时间）淘汰。同一尺寸的并发请求只生成一次：进程内按键加锁，支持 fcntl 时再加文件锁
+在进程间合并。命中时直接从磁盘返回。
+
+原图可能被原地改写（如 clean_watermarks 去除水印），只有带 ?v=<原图版本>（resized_url() 生成，如管理后台的
+缩略图）且与当前原图一致的响应才按 immutable 长期缓存；不带版本的地址缓存 IMAGE_RESIZE_MAX_AGE 秒，之后凭 ETag 重新验证。
+"""
+import hashlib
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows 上只在进程内合并
+    fcntl = None
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponseBadRequest, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import urlencode
+from django.views.decorators.http import require_safe
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+RESIZE_CACHE_DIR = getattr(settings, 'IMAGE_RESIZE_CACHE_DIR', os.path.join(settings.MEDIA_ROOT, '.resize-cache'))
+RESIZE_CACHE_MAX_BYTES = getattr(settings, 'IMAGE_RESIZE_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+RESIZE_MAX_DIMENSION = getattr(settings, 'IMAGE_RESIZE_MAX_DIMENSION', 2560)
+# 可以请求的尺寸（"宽x高"，0 表示该方向不限制）
+RESIZE_ALLOWED_SIZES = frozenset(getattr(settings, 'IMAGE_RESIZE_ALLOWED_SIZES', [
+    '64x64', '120x120', '240x240', '480x480', '0x120', '320x0', '640x0', '1280x0',
+]))
+RESIZE_MAX_AGE = getattr(settings, 'IMAGE_RESIZE_MAX_AGE', 3600)
+RESIZE_QUALITY = {'jpeg': 85, 'webp': 80}
+REDUCING_GAP = 3.0
+TOUCH_INTERVAL = 60      # 命中时最多每分钟更新一次修改时间
+EVICT_TARGET = 0.9       # 超过上限时淘汰到上限的 90%
+LOCK_STRIPES = 2         # 文件锁按键的前两位十六进制分为 256 个
+
+FIT_MODES = ('contain', 'cover')
+# 输出格式 -> (Pillow 格式, Content-Type, 扩展名)
+OUTPUT_FORMATS = {
+    'jpeg': ('JPEG', 'image/jpeg', 'jpg'),
+    'png': ('PNG', 'image/png', 'png'),
+    'webp': ('WEBP', 'image/webp', 'webp'),
+}
+# 原图扩展名 -> 默认输出格式
+SOURCE_FORMATS = {
+    '.jpg': 'jpeg', '.jpeg': 'jpeg', '.png': 'png', '.webp': 'webp', '.gif': 'png', '.bmp': 'png',
+}
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# 原图解码失败：格式无法识别、文件损坏（Pillow 对部分损坏文件抛 SyntaxError/ValueError/EOFError）或像素数过大
+IMAGE_ERRORS = (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError, ValueError, EOFError)
+
+
+class ResizeCache:
+    """按内容键存储的磁盘缓存，总大小超过上限时按修改时间（最近使用时间）淘汰"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._guard = threading.Lock()
+        self._locks = {}    # 键 -> [锁, 引用数]
+        self._size = None   # 本进程估计的总大小，首次写入时扫描
+
+    def path(self, key, extension):
+        return os.path.join(self.directory, key[:2], f'{key}.{extension}')
+
+    def touch(self, path):
+        """命中时更新修改时间，作为LRU的最近使用时间"""
+        try:
+            if time.time() - os.stat(path).st_mtime > TOUCH_INTERVAL:
+                os.utime(path)
+        except OSError:
+            pass
+
+    @contextmanager
+    def lock(self, key):
+        """同一键的生成互斥：进程内线程锁 + 进程间文件锁"""
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                if fcntl is None:
+                    yield
+                    return
+                lock_dir = os.path.join(self.directory, '.locks')
+                os.makedirs(lock_dir, exist_ok=True)
+                with open(os.path.join(lock_dir, f'{key[:LOCK_STRIPES]}.lock'), 'a') as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    try:
+                        yield
+                    finally:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    self._locks.pop(key, None)
+
+    def store(self, path, write):
+        """write(临时文件路径) 生成文件后原子替换到缓存中"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            write(temp_path)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        size = os.path.getsize(path)
+        with self._guard:
+            if self._size is not None:
+                self._size += size
+            need_scan = self._size is None or self._size > self.max_bytes
+        if need_scan:
+            self.evict()
+
+    def _scan(self):
+        entries = []
+        for root, dirs, files in os.walk(self.directory):
+            dirs[:] = [name for name in dirs if not name.startswith('.')]
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """扫描缓存目录（其他进程写入的文件也计入），超过上限时删除最久未使用的文件"""
+        entries = self._scan()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                if total <= self.max_bytes * EVICT_TARGET:
+                    break
+        with self._guard:
+            self._size = total
+
+
+resize_cache = ResizeCache(RESIZE_CACHE_DIR, RESIZE_CACHE_MAX_BYTES)
+
+
+def _convert(image, output_format):
+    if output_format == 'jpeg':
+        return image if image.mode in ('RGB', 'L') else image.convert('RGB')
+    if image.mode in ('RGB', 'RGBA', 'L', 'LA'):
+        return image
+    has_alpha = image.mode in ('PA', 'P') and 'transparency' in image.info
+    return image.convert('RGBA' if has_alpha or image.mode.endswith('A') else 'RGB')
+
+
+def render(source, width, height, fit, output_format, target):
+    """缩放原图并编码到 target（宽或高为0表示该方向不限制）"""
+    with Image.open(source) as image:
+        # 按显示方向（EXIF 旋转后）计算缩放比例，比例与方向无关，可直接用于 draft
+        orientation = image.getexif().get(0x0112, 1)
+        source_width, source_height = image.size
+        if orientation in (5, 6, 7, 8):
+            source_width, source_height = source_height, source_width
+
+        ratios = [ratio for ratio in (width / source_width if width else 0, height / source_height if height else 0) if ratio]
+        scale = max(ratios) if fit == 'cover' and len(ratios) == 2 else min(ratios)
+        if scale > 1:
+            # 不放大：cover 按原图分辨率裁剪出目标比例，contain 保持原尺寸
+            width, height = (round(width / scale) if width else 0), (round(height / scale) if height else 0)
+            scale = 1
+
+        if image.format == 'JPEG':
+            raw_width, raw_height = image.size
+            image.draft('RGB', (math.ceil(raw_width * scale), math.ceil(raw_height * scale)))
+        image = ImageOps.exif_transpose(image)
+        current_width, current_height = image.size
+
+        if fit == 'cover' and width and height:
+            crop_scale = max(width / current_width, height / current_height)
+            crop_width, crop_height = width / crop_scale, height / crop_scale
+            left, top = (current_width - crop_width) / 2, (current_height - crop_height) / 2
+            box = (left, top, left + crop_width, top + crop_height)
+            size = (width, height)
+        else:
+            box = None
+            size = (max(1, round(source_width * scale)), max(1, round(source_height * scale)))
+
+        if size != image.size or box is not None:
+            image = image.resize(size, Image.LANCZOS, box=box, reducing_gap=REDUCING_GAP)
+        image = _convert(image, output_format)
+        pillow_format = OUTPUT_FORMATS[output_format][0]
+        options = {'quality': RESIZE_QUALITY[output_format]} if output_format in RESIZE_QUALITY else {'optimize': True}
+        with open(target, 'wb') as output:
+            image.save(output, pillow_format, **options)
+
+
+def _cache_key(path, stat, width, height, fit, output_format):
+    raw = f'{path}|{stat.st_size}|{stat.st_mtime_ns}|{width}x{height}|{fit}|{output_format}'
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _source_version(stat):
+    """原图版本：原图被改写后变化"""
+    return hashlib.sha1(f'{stat.st_size}|{stat.st_mtime_ns}'.encode('ascii')).hexdigest()[:12]
+
+
+def resized_url(path, width, height, fit=None, output_format=None):
+    """生成缩放地址（尺寸需在 IMAGE_RESIZE_ALLOWED_SIZES 中），原图存在时带版本号（可按 immutable 长期缓存）"""
+    params = {}
+    if fit and fit != 'contain':
+        params['fit'] = fit
+    if output_format:
+        params['fm'] = output_format
+    try:
+        params['v'] = _source_version(os.stat(safe_join(settings.MEDIA_ROOT, path)))
+    except (OSError, SuspiciousFileOperation):
+        pass
+    url = f'/media-resize/{width}x{height}/{path}'
+    return f'{url}?{urlencode(params)}' if params else url
+
+
+def _cached_headers(response, etag, state, versioned):
+    response['Cache-Control'] = IMMUTABLE if versioned else f'public, max-age={RESIZE_MAX_AGE}'
+    response['ETag'] = etag
+    response['X-Cache'] = state
+    return response
+
+
+@require_safe
+def serve_resized(request, width, height, path):
+    """按需缩放图片视图"""
+    width, height = int(width), int(height)
+    fit = request.GET.get('fit', 'contain')
+    if not (width or height) or max(width, height) > RESIZE_MAX_DIMENSION:
+        return HttpResponseBadRequest(f'宽、高至少一个大于0，且不超过 {RESIZE_MAX_DIMENSION}')
+    if fit not in FIT_MODES:
+        return HttpResponseBadRequest(f'fit 必须为 {"/".join(FIT_MODES)}')
+    if f'{width}x{height}' not in RESIZE_ALLOWED_SIZES:
+        return HttpResponseBadRequest(f'不支持该尺寸，可用尺寸: {", ".join(sorted(RESIZE_ALLOWED_SIZES))}')
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in SOURCE_FORMATS:
+        raise Http404('不支持的图片格式')
+    output_format = request.GET.get('fm') or SOURCE_FORMATS[extension]
+    if output_format not in OUTPUT_FORMATS:
+        return HttpResponseBadRequest(f'fm 必须为 {"/".join(OUTPUT_FORMATS)}')
+
+    if any(part.startswith('.') for part in path.replace('\\', '/').split('/')):
+        raise Http404('图片不存在')
+    try:
+        source = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('图片不存在')
+    if os.path.commonpath([source, os.path.abspath(RESIZE_CACHE_DIR)]) == os.path.abspath(RESIZE_CACHE_DIR):
+        raise Http404('图片不存在')
+    try:
+        stat = os.stat(source)
+    except OSError:
+        raise Http404('图片不存在')
+
+    key = _cache_key(path, stat, width, height, fit, output_format)
+    etag = f'"{key}"'
+    versioned = request.GET.get('v') == _source_version(stat)
+    if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+        return _cached_headers(HttpResponseNotModified(), etag, 'HIT', versioned)
+
+    _, content_type, output_extension = OUTPUT_FORMATS[output_format]
+    target = resize_cache.path(key, output_extension)
+    state = 'HIT'
+    for _ in range(2):
+        try:
+            file = open(target, 'rb')
+        except FileNotFoundError:
+            pass
+        else:
+            if state == 'HIT':
+                resize_cache.touch(target)
+            return _cached_headers(FileResponse(file, content_type=content_type), etag, state, versioned)
+
+        # 未命中（或刚被淘汰）：同一键只有一个请求生成，其他请求等待后直接读取
+        with resize_cache.lock(key):
+            if not os.path.exists(target):
+                try:
+                    resize_cache.store(target, lambda temp: render(source, width, height, fit, output_format, temp))
+                except IMAGE_ERRORS:
+                    raise Http404('无法处理的图片')
+                state = 'MISS'
+    raise Http404('图片不存在')
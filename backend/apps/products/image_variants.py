@@ -0,0 +1,236 @@
+"""
+响应式图片版本 - 上传图片后在进程池中生成固定宽度的 WebP（可选 AVIF）版本
+
+各图片字段保存后（事务提交后）把原图提交到进程池，按 IMAGE_VARIANT_WIDTHS 缩放（不放大，
+原图小于最大宽度时额外生成原始宽度的版本），保存为 media/variants/<原图路径>/<宽度>.<格式>。
+同时计算原图的文件大小、主色调和 blurhash（image_metadata.py）。生成结果记录在 ImageAsset 中，
+序列化器通过 ImageVariantsField 输出宽高、占位信息和可直接用于 srcset 的版本表，尚未生成时输出 null，
+前端回退到原图。已有图片用 generate_image_variants 命令补生成（--metadata-only 只计算元数据）。
+原图被替换或删除后（事务提交后）清理不再被引用的版本文件和记录。
+
+子进程以 spawn 方式启动，只执行 render_variants（纯 Pillow），本模块在顶层不导入模型。
+"""
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from PIL import Image, ImageOps, features
+
+from .image_metadata import image_metadata
+
+
+VARIANT_WIDTHS = sorted(getattr(settings, 'IMAGE_VARIANT_WIDTHS', [320, 640, 960, 1280, 1920]))
+# AVIF 需要带 libavif 的 Pillow，不支持的格式自动跳过
+VARIANT_FORMATS = [fmt for fmt in getattr(settings, 'IMAGE_VARIANT_FORMATS', ['webp']) if features.check(fmt)]
+VARIANT_QUALITY = {'webp': 80, 'avif': 60}
+VARIANT_WORKERS = getattr(settings, 'IMAGE_VARIANT_WORKERS', 2)
+VARIANT_DIR = 'variants'
+VARIANT_CACHE_TIMEOUT = 3600
+VARIANT_MISS_CACHE_TIMEOUT = 60    # 尚未生成的结果只短暂缓存
+MANIFEST_FIELDS = ('width', 'height', 'file_size', 'dominant_color', 'blurhash', 'variants')
+
+# 生成版本的图片字段：模型 -> 字段名
+IMAGE_FIELDS = {
+    'products.Category': 'image',
+    'products.SubCategory': 'image',
+    'products.ProductImage': 'image',
+    'products.ProductApplication': 'image',
+    'products.TemplateApplication': 'image',
+    'products.TemplateFactoryImage': 'image',
+    'products.TemplateProcess': 'image',
+    'about.Certificate': 'image',
+    'about.FactoryImage': 'image',
+    'news.Article': 'featured_image',
+}
+
+
+# ---------- 子进程 ----------
+
+def _target_widths(width):
+    """不放大：小于原图的宽度，原图不超过最大宽度时加上原始宽度"""
+    widths = [target for target in VARIANT_WIDTHS if target < width]
+    if width <= VARIANT_WIDTHS[-1]:
+        widths.append(width)
+    return widths
+
+
+def render_variants(source, output_dir, formats):
+    """在子进程中执行：生成各宽度、各格式的版本，返回 (原图宽, 原图高, {格式: {宽度: 文件名}}, 元数据)
+
+    formats 为空时只计算元数据 {'file_size', 'dominant_color', 'blurhash'}。
+    """
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        width, height = image.size
+        metadata = {'file_size': os.path.getsize(source), **image_metadata(image)}
+        if not formats:
+            return width, height, {}, metadata
+        widths = _target_widths(width)
+        if image.mode not in ('RGB', 'RGBA'):
+            has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        os.makedirs(output_dir, exist_ok=True)
+        variants = {fmt: {} for fmt in formats}
+        current = image
+        # 从大到小依次缩放，每次以上一个版本为源，避免重复处理大图
+        for target in sorted(widths, reverse=True):
+            if target != current.width:
+                current = current.resize((target, max(1, round(height * target / width))), Image.LANCZOS)
+            for fmt in formats:
+                filename = f'{target}.{fmt}'
+                temp_path = os.path.join(output_dir, f'.{filename}.tmp')
+                current.save(temp_path, fmt.upper(), quality=VARIANT_QUALITY.get(fmt, 80))
+                os.replace(temp_path, os.path.join(output_dir, filename))
+                variants[fmt][str(target)] = filename
+    return width, height, variants, metadata
+
+
+# ---------- 进程池 ----------
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=VARIANT_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+
+def variant_dir(name):
+    """原图对应的版本目录（相对于 MEDIA_ROOT）"""
+    return f'{VARIANT_DIR}/{name}'
+
+
+def submit_variants(name, executor=None, formats=None):
+    """把原图提交到进程池，返回 Future（结果为 render_variants 的返回值），formats=[] 时只计算元数据"""
+    return (executor or get_executor()).submit(
+        render_variants, default_storage.path(name), default_storage.path(variant_dir(name)),
+        VARIANT_FORMATS if formats is None else formats,
+    )
+
+
+def _cache_key(name):
+    """键中带 image_assets 命名空间版本号：任何进程（包括管理命令）保存结果后，所有进程的缓存随之失效"""
+    from .caching import response_cache
+
+    version = response_cache.namespace_version('image_assets')
+    return f"image_assets:{version}:{hashlib.md5(name.encode('utf-8')).hexdigest()}"
+
+
+def save_variants(name, result, namespaces=()):
+    """记录生成结果，并使依赖该图片的响应缓存失效（只计算了元数据时保留已有的版本）"""
+    from .models import ImageAsset
+    from .caching import response_cache
+
+    width, height, variants, metadata = result
+    directory = variant_dir(name)
+    defaults = {'width': width, 'height': height, **metadata}
+    if variants:
+        defaults['variants'] = {
+            fmt: {target: f'{directory}/{filename}' for target, filename in files.items()}
+            for fmt, files in variants.items()
+        }
+    asset, _ = ImageAsset.objects.update_or_create(name=name, defaults=defaults)
+    response_cache.invalidate('image_assets', *namespaces)
+    cache.set(_cache_key(name), {field: getattr(asset, field) for field in MANIFEST_FIELDS}, VARIANT_CACHE_TIMEOUT)
+
+
+def generate_variants_in_background(name, namespaces=()):
+    """提交到进程池，完成后在回调线程中记录结果（没有可用的版本格式时只计算元数据）"""
+    def done(future):
+        try:
+            save_variants(name, future.result(), namespaces)
+        except Exception as e:
+            print(f"图片版本生成失败 {name}: {e}")
+        finally:
+            close_old_connections()
+
+    try:
+        submit_variants(name).add_done_callback(done)
+    except Exception as e:
+        print(f"图片版本生成失败 {name}: {e}")
+
+
+def delete_variants(name):
+    """原图被替换或删除后清理其版本文件和 ImageAsset 记录（仍被其他图片字段引用时保留）"""
+    from django.apps import apps
+    from .models import ImageAsset
+    from .caching import response_cache
+
+    for label, field in IMAGE_FIELDS.items():
+        if apps.get_model(label)._default_manager.filter(**{field: name}).exists():
+            return
+    directory = variant_dir(name)
+    try:
+        if default_storage.exists(directory):
+            for filename in default_storage.listdir(directory)[1]:
+                default_storage.delete(f'{directory}/{filename}')
+            os.rmdir(default_storage.path(directory))
+    except OSError as e:
+        print(f"图片版本清理失败 {name}: {e}")
+    if ImageAsset.objects.filter(name=name).delete()[0]:
+        response_cache.invalidate('image_assets')
+
+
+# ---------- 读取 ----------
+
+def prefetch_variants(names):
+    """一组原图的版本清单 {原图路径: 清单或None}：先批量读缓存，未命中的用一次 name__in 查询取出"""
+    keys = {name: _cache_key(name) for name in dict.fromkeys(names) if name}
+    cached = cache.get_many(keys.values())
+    manifests = {name: cached[key] for name, key in keys.items() if key in cached}
+    missing = [name for name in keys if name not in manifests]
+    if missing:
+        from .models import ImageAsset
+        found = {row.pop('name'): row for row in ImageAsset.objects.filter(name__in=missing).values('name', *MANIFEST_FIELDS)}
+        for name in missing:
+            manifests[name] = found.get(name, {})
+        cache.set_many({keys[name]: found[name] for name in missing if name in found}, VARIANT_CACHE_TIMEOUT)
+        cache.set_many({keys[name]: {} for name in missing if name not in found}, VARIANT_MISS_CACHE_TIMEOUT)
+    return {name: manifest or None for name, manifest in manifests.items()}
+
+
+def get_variants(name):
+    """原图的版本清单 {'width', 'height', 'file_size', 'dominant_color', 'blurhash', 'variants': {格式: {宽度: 文件名}}}，
+    尚未生成时返回None"""
+    if not name:
+        return None
+    return prefetch_variants([name])[name]
+
+
+def variants_data(name, request=None, manifests=None):
+    """序列化输出：{'width', 'height', 'size', 'dominant_color', 'blurhash',
+    'srcset': {格式: "url 320w, ..."}, 'variants': {格式: {宽度: url}}}
+
+    manifests 为 prefetch_variants 批量取出的清单，其中没有的图片单独读取。
+    """
+    manifest = manifests[name] if manifests is not None and name in manifests else get_variants(name)
+    if not manifest:
+        return None
+    urls = {}
+    for fmt, files in manifest['variants'].items():
+        urls[fmt] = {}
+        for target, filename in sorted(files.items(), key=lambda item: int(item[0])):
+            url = default_storage.url(filename)
+            urls[fmt][target] = request.build_absolute_uri(url) if request else url
+    return {
+        'width': manifest['width'],
+        'height': manifest['height'],
+        'size': manifest['file_size'],
+        'dominant_color': manifest['dominant_color'] or None,
+        'blurhash': manifest['blurhash'] or None,
+        'srcset': {fmt: ', '.join(f'{url} {target}w' for target, url in files.items()) for fmt, files in urls.items()},
+        'variants': urls,
+    }
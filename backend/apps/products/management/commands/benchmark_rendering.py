@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from apps.products.models import Product
+from apps.products.renderers import FastJSONRenderer, fragment_cache, orjson
+from apps.products.serializers import (
+    ProductSerializer, TranslatedProductSerializer, ProductDetailSerializer, TranslatedProductDetailSerializer
+)
+
+
+class Command(BaseCommand):
+    help = '对比默认JSON渲染与快速渲染（orjson + 预编码片段）的序列化耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='每种方式重复次数')
+        parser.add_argument('--page-size', type=int, default=20, help='列表每页产品数')
+        parser.add_argument('--lang', default='zh', help='语言')
+
+    def _measure(self, iterations, render, bypass=False):
+        """返回 (平均耗时毫秒, 响应字节数)，bypass 时停用片段缓存以模拟默认渲染路径"""
+        def run():
+            if bypass:
+                with fragment_cache.bypass():
+                    return render()
+            return render()
+
+        run()  # 预热
+        start = time.perf_counter()
+        for _ in range(iterations):
+            size = len(run())
+        return (time.perf_counter() - start) * 1000 / iterations, size
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        language = options['lang']
+        request = RequestFactory().get('/api/products/', {'lang': language})
+        products = list(
+            Product.objects.filter(is_active=True).select_related('category', 'subcategory', 'template')
+            .prefetch_related('images', 'specification_items', 'feature_items', 'application_items')
+            .order_by('order', '-created_at')[:options['page_size']]
+        )
+        if not products:
+            self.stdout.write(self.style.WARNING('没有激活的产品，无法测试'))
+            return
+
+        translated = language != 'zh'
+        list_serializer = TranslatedProductSerializer if translated else ProductSerializer
+        detail_serializer = TranslatedProductDetailSerializer if translated else ProductDetailSerializer
+        context = {'request': request, 'language': language}
+
+        def render_list(renderer):
+            return renderer.render(list_serializer(products, many=True, context=context).data)
+
+        def render_details(renderer):
+            return b''.join(renderer.render(detail_serializer(product, context=context).data) for product in products)
+
+        default_renderer = JSONRenderer()
+        fast_renderer = FastJSONRenderer()
+        encoder = f'orjson {orjson.__version__}' if orjson else 'json（未安装orjson）'
+        self.stdout.write(f'产品数: {len(products)}，重复: {iterations} 次，语言: {language}，编码器: {encoder}')
+
+        fragment_cache.clear()
+        for name, render in [('列表', render_list), ('详情', render_details)]:
+            default_ms, default_size = self._measure(iterations, lambda: render(default_renderer), bypass=True)
+            fast_ms, fast_size = self._measure(iterations, lambda: render(fast_renderer))
+            self.stdout.write(
+                f'{name}: 默认 {default_ms:.2f} ms ({default_size} 字节) -> 快速 {fast_ms:.2f} ms ({fast_size} 字节)，'
+                f'提速 {default_ms / fast_ms:.1f}x'
+            )
+        self.stdout.write(self.style.SUCCESS('测试完成'))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from apps.products.exports import (
+    EXPORT_FORMATS, EXPORT_CHUNK_SIZE, TRANSLATION_EXPORT_COLUMNS, TRANSLATED_MODELS, iter_translation_rows,
+    export_format_for_path, write_export
+)
+
+
+class Command(BaseCommand):
+    help = '导出某一语言的 原文/译文 对照（CSV/XLSX/NDJSON），未翻译的字段译文为空'
+
+    def add_arguments(self, parser):
+        parser.add_argument('lang', help='语言代码，如 es、fr')
+        parser.add_argument('-o', '--output', default='-', help='输出文件路径（默认输出到标准输出）')
+        parser.add_argument('--output-format', choices=list(EXPORT_FORMATS), help='导出格式（默认按文件扩展名，否则为csv）')
+        parser.add_argument('--model', action='append', choices=list(TRANSLATED_MODELS), help='只导出指定模型（可重复）')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help='每次从数据库读取的行数')
+
+    def handle(self, *args, **options):
+        output_format = options['output_format'] or export_format_for_path(options['output'])
+        start_time = time.time()
+        rows = iter_translation_rows(options['lang'], options['model'], chunk_size=options['chunk_size'])
+        size = write_export(
+            output_format, TRANSLATION_EXPORT_COLUMNS, rows, options['output'], f'translations-{options["lang"]}'
+        )
+        if options['output'] != '-':
+            self.stdout.write(self.style.SUCCESS(
+                f'导出完成：{options["output"]}（{size / 1024:.1f} KB），耗时 {time.time() - start_time:.2f} 秒'
+            ))
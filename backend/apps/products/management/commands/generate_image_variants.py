@@ -0,0 +1,62 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from apps.products.models import ImageAsset
+from apps.products.caching import response_cache
+from apps.products.image_variants import (
+    IMAGE_FIELDS, VARIANT_FORMATS, VARIANT_WORKERS, submit_variants, save_variants
+)
+
+
+class Command(BaseCommand):
+    help = '为已上传的图片生成响应式版本（WebP/AVIF）和元数据（大小、主色调、blurhash），已处理的图片默认跳过'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', choices=list(IMAGE_FIELDS), help='只处理指定模型（可重复）')
+        parser.add_argument('--force', action='store_true', help='重新生成已有版本的图片')
+        parser.add_argument('--metadata-only', action='store_true', help='只计算元数据，保留已有版本（跳过已有元数据的图片）')
+        parser.add_argument('--workers', type=int, default=VARIANT_WORKERS, help='进程数')
+
+    def handle(self, *args, **options):
+        formats = [] if options['metadata_only'] else VARIANT_FORMATS
+        if not formats and not options['metadata_only']:
+            raise CommandError('没有可用的图片格式（检查 IMAGE_VARIANT_FORMATS 和 Pillow 的 WebP/AVIF 支持）')
+
+        names = {}
+        for label in options['model'] or IMAGE_FIELDS:
+            field = IMAGE_FIELDS[label]
+            model = apps.get_model(label)
+            queryset = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            for name in queryset.values_list(field, flat=True).iterator():
+                names.setdefault(name, label)
+        if not options['force']:
+            # 已有版本的图片缺少元数据（在加入元数据之前生成）时也重新处理
+            existing = ImageAsset.objects.filter(name__in=list(names)).exclude(blurhash='')
+            if not options['metadata_only']:
+                existing = existing.exclude(variants={})
+            existing = set(existing.values_list('name', flat=True))
+            names = {name: label for name, label in names.items() if name not in existing}
+        self.stdout.write(f'待处理 {len(names)} 张图片，格式: {", ".join(formats) or "只计算元数据"}')
+
+        start_time = time.time()
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers'], mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = {submit_variants(name, executor, formats): name for name in names}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    save_variants(name, future.result())
+                    done += 1
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f'  {name}: {e}'))
+                if (done + failed) % 100 == 0:
+                    self.stdout.write(f'  已处理 {done + failed}/{len(names)}')
+
+        response_cache.invalidate('products', 'categories', 'templates', 'factory_images')
+        self.stdout.write(self.style.SUCCESS(
+            f'图片版本生成完成：成功 {done} 张，失败 {failed} 张，耗时 {time.time() - start_time:.2f} 秒'
+        ))
@@ -0,0 +1,62 @@
+import os
+import time
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from apps.products.models import ImportJob
+from apps.products.catalog_import import CatalogImporter, CATALOG_IMPORT_CHUNK_SIZE
+from apps.products.signals import wait_for_background_translations
+
+
+class Command(BaseCommand):
+    help = '从XLSX/CSV表格导入产品目录（按 slug 新增或更新产品及其规格/特性/应用），失败后可用 --resume 继续'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', nargs='?', help='XLSX 或 CSV 文件路径')
+        parser.add_argument('--resume', type=int, help='继续执行指定ID的导入任务（从上次中断处开始）')
+        parser.add_argument('--chunk-size', type=int, default=CATALOG_IMPORT_CHUNK_SIZE, help='每个事务写入的行数')
+        parser.add_argument('--no-translate-wait', action='store_true', help='不等待后台翻译完成（之后可用 translate_content 补充翻译）')
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            job = ImportJob.objects.filter(id=options['resume']).first()
+            if job is None:
+                raise CommandError(f'导入任务 {options["resume"]} 不存在')
+            if job.status == 'completed':
+                raise CommandError(f'导入任务 {job.id} 已完成')
+            self.stdout.write(f'继续导入任务 {job.id}：已处理 {job.processed_rows}/{job.total_rows} 行')
+        elif options['file']:
+            path = options['file']
+            if not os.path.exists(path):
+                raise CommandError(f'文件不存在: {path}')
+            if not path.lower().endswith(('.xlsx', '.csv')):
+                raise CommandError('只支持 XLSX 或 CSV 文件')
+            job = ImportJob()
+            with open(path, 'rb') as f:
+                job.file.save(os.path.basename(path), File(f))
+            self.stdout.write(f'创建导入任务 {job.id}')
+        else:
+            raise CommandError('请指定要导入的文件，或使用 --resume 继续已有任务')
+
+        def progress(job):
+            self.stdout.write(
+                f'  已处理 {job.processed_rows}/{job.total_rows} 行（{job.progress}%），'
+                f'新增 {job.created_count}，更新 {job.updated_count}，错误 {job.error_count}'
+            )
+
+        start_time = time.time()
+        try:
+            CatalogImporter(job, chunk_size=options['chunk_size'], progress=progress).run()
+        except Exception as e:
+            raise CommandError(f'{job.message}\n可执行 import_catalog --resume {job.id} 继续导入') from e
+
+        for row_num, error in job.errors[:20]:
+            self.stdout.write(self.style.WARNING(f'  第 {row_num} 行: {error}'))
+        if job.error_count > 20:
+            self.stdout.write(self.style.WARNING(f'  ……共 {job.error_count} 行有误，详见管理后台的导入任务'))
+        self.stdout.write(self.style.SUCCESS(f'导入完成：{job.message}，耗时 {time.time() - start_time:.2f} 秒'))
+
+        if not options['no_translate_wait']:
+            self.stdout.write('等待后台翻译完成……')
+            wait_for_background_translations()
+            self.stdout.write(self.style.SUCCESS('翻译完成'))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from apps.products.caching import response_cache
+from apps.products.models import Product, ProductImage
+
+
+class Command(BaseCommand):
+    help = '根据图片表修复产品的主图路径和图片数量冗余字段'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只检查不写入',
+        )
+
+    def handle(self, *args, **options):
+        # 一次扫描图片表：按产品分组，主图优先，排序第一张作为主图
+        summary = {}
+        images = ProductImage.objects.order_by('product_id', '-is_primary', 'order', 'created_at')
+        for product_id, image in images.values_list('product_id', 'image').iterator(chunk_size=2000):
+            item = summary.setdefault(product_id, [image, 0])
+            item[1] += 1
+
+        changed = []
+        for product in Product.objects.only('id', 'name', 'primary_image', 'image_count').iterator(chunk_size=2000):
+            primary_image, image_count = summary.get(product.id, ('', 0))
+            if product.primary_image != primary_image or product.image_count != image_count:
+                self.stdout.write(
+                    f'  {product.name}: 主图 "{product.primary_image}" -> "{primary_image}"，'
+                    f'数量 {product.image_count} -> {image_count}'
+                )
+                product.primary_image = primary_image
+                product.image_count = image_count
+                changed.append(product)
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'检查完成：{len(changed)} 个产品需要修复（未写入）'))
+            return
+
+        Product.objects.bulk_update(changed, ['primary_image', 'image_count'], batch_size=500)
+        if changed:
+            response_cache.invalidate('products')
+        self.stdout.write(self.style.SUCCESS(f'修复完成：{len(changed)} 个产品'))
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+from apps.products.caching import response_cache
+from apps.products.related import rebuild_related
+
+
+class Command(BaseCommand):
+    help = '全量重算相关产品（增量更新会累积词条权重的偏差，批量导入后建议执行）'
+
+    def handle(self, *args, **options):
+        start_time = time.time()
+        total = rebuild_related()
+        response_cache.invalidate('products')
+        self.stdout.write(
+            self.style.SUCCESS(f'相关产品重算完成：{total} 个产品，耗时 {time.time() - start_time:.2f} 秒')
+        )
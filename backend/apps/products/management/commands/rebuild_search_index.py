@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from apps.products.search import product_search_index
+
+
+class Command(BaseCommand):
+    help = '全量重建产品全文搜索索引（批量翻译完成后建议执行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='每批处理的产品数量（默认：500）',
+        )
+
+    def handle(self, *args, **options):
+        if not product_search_index.is_available():
+            self.stdout.write(self.style.WARNING('搜索索引表不存在（需要SQLite FTS5并执行migrate），已跳过'))
+            return
+
+        start_time = time.time()
+        total = product_search_index.rebuild(chunk_size=options['chunk_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'搜索索引重建完成：{total} 个产品，耗时 {time.time() - start_time:.2f} 秒')
+        )
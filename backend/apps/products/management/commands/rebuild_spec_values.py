@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+from apps.products.caching import response_cache
+from apps.products.spec_ranges import refresh_spec_values
+
+
+class Command(BaseCommand):
+    help = '重新解析所有产品（含模板继承）的规格数值，重建规格范围筛选侧表'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='每批处理的产品数量（默认：500）',
+        )
+
+    def handle(self, *args, **options):
+        start_time = time.time()
+        total = refresh_spec_values(chunk_size=options['chunk_size'])
+        # 通知各worker重建内存中的范围索引
+        response_cache.invalidate('products')
+        self.stdout.write(
+            self.style.SUCCESS(f'规格数值重建完成：{total} 个数值区间，耗时 {time.time() - start_time:.2f} 秒')
+        )
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+
+def create_search_table(apps, schema_editor):
+    """创建FTS5产品搜索表（仅SQLite，未编译FTS5时跳过并回退到模糊查询）"""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS products_search USING fts5("
+            "name, description, features, specs, translations, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    except Exception as e:
+        print(f"FTS5不可用，跳过创建搜索索引: {e}")
+
+
+def fill_search_index(apps, schema_editor):
+    """为已有产品回填索引，否则迁移后所有搜索都没有结果，直到手动执行 rebuild_search_index"""
+    from apps.products.search import product_search_index
+
+    if product_search_index.is_available():
+        product_search_index.rebuild(apps=apps)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS products_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0010_add_template_process_and_product_template_fields"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
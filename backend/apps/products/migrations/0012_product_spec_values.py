@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_spec_values(apps, schema_editor):
+    """为已有产品回填规格数值，否则迁移后规格范围筛选没有结果，直到手动执行 rebuild_spec_values"""
+    from apps.products.spec_ranges import refresh_spec_values
+
+    refresh_spec_values(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_product_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSpecValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('spec_key', models.CharField(help_text='规范化后的规格名称', max_length=200, verbose_name='规格键')),
+                ('spec_name', models.CharField(max_length=200, verbose_name='规格名称')),
+                ('unit', models.CharField(blank=True, max_length=20, verbose_name='单位')),
+                ('low', models.FloatField(blank=True, help_text='为空表示无下限', null=True, verbose_name='下限')),
+                ('high', models.FloatField(blank=True, help_text='为空表示无上限', null=True, verbose_name='上限')),
+                ('source', models.CharField(choices=[('product', '产品规格'), ('template', '模板规格')], default='product', max_length=10, verbose_name='来源')),
+                ('source_template_id', models.PositiveIntegerField(blank=True, db_index=True, null=True, verbose_name='来源模板ID')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spec_values', to='products.product', verbose_name='产品')),
+            ],
+            options={
+                'verbose_name': '产品规格数值',
+                'verbose_name_plural': '产品规格数值',
+                'indexes': [models.Index(fields=['spec_key', 'low'], name='products_specvalue_low_idx'), models.Index(fields=['spec_key', 'high'], name='products_specvalue_high_idx')],
+            },
+        ),
+        migrations.RunPython(fill_spec_values, migrations.RunPython.noop),
+    ]
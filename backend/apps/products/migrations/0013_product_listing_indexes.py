@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_product_spec_values'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'order', '-created_at', 'id'], name='products_active_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'is_active', 'order', '-created_at', 'id'], name='products_category_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['subcategory', 'is_active', 'order', '-created_at', 'id'], name='products_subcat_order_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:49
+
+from django.db import migrations, models
+
+
+def fill_image_summary(apps, schema_editor):
+    """为已有产品回填主图路径和图片数量"""
+    Product = apps.get_model('products', 'Product')
+    ProductImage = apps.get_model('products', 'ProductImage')
+    summary = {}
+    images = ProductImage.objects.order_by('product_id', '-is_primary', 'order', 'created_at')
+    for product_id, image in images.values_list('product_id', 'image').iterator():
+        item = summary.setdefault(product_id, [image, 0])
+        item[1] += 1
+    for product_id, (primary_image, image_count) in summary.items():
+        Product.objects.filter(pk=product_id).update(primary_image=primary_image, image_count=image_count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_product_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='图片数量'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='primary_image',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='主图路径'),
+        ),
+        migrations.RunPython(fill_image_summary, migrations.RunPython.noop),
+    ]
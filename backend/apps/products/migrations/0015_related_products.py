@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 22:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_related_products(apps, schema_editor):
+    """为已有产品回填相关产品，否则迁移后相关产品接口都返回空，直到手动执行 rebuild_related_products"""
+    from apps.products.related import rebuild_related
+
+    rebuild_related(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_product_image_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='相似度')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='排名')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='products.product', verbose_name='产品')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product', verbose_name='相关产品')),
+            ],
+            options={
+                'verbose_name': '相关产品',
+                'verbose_name_plural': '相关产品',
+                'ordering': ['product', 'rank'],
+                'indexes': [models.Index(fields=['product', 'rank'], name='products_related_rank_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='relatedproduct',
+            constraint=models.UniqueConstraint(fields=('product', 'related'), name='products_related_unique'),
+        ),
+        migrations.RunPython(fill_related_products, migrations.RunPython.noop),
+    ]
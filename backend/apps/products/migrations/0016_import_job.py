@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:19
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0015_related_products'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(help_text='XLSX 或 CSV 文件，第一行为列名', upload_to='imports/', validators=[django.core.validators.FileExtensionValidator(['xlsx', 'csv'])], verbose_name='导入文件')),
+                ('status', models.CharField(choices=[('pending', '待导入'), ('running', '导入中'), ('completed', '已完成'), ('failed', '失败')], default='pending', max_length=10, verbose_name='状态')),
+                ('total_rows', models.PositiveIntegerField(default=0, verbose_name='数据行数')),
+                ('processed_rows', models.PositiveIntegerField(default=0, verbose_name='已处理行数')),
+                ('created_count', models.PositiveIntegerField(default=0, verbose_name='新增产品数')),
+                ('updated_count', models.PositiveIntegerField(default=0, verbose_name='更新产品数')),
+                ('error_count', models.PositiveIntegerField(default=0, verbose_name='错误行数')),
+                ('errors', models.JSONField(blank=True, default=list, help_text='[行号, 错误信息]，只保存前面部分', verbose_name='错误行')),
+                ('message', models.TextField(blank=True, verbose_name='消息')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+            ],
+            options={
+                'verbose_name': '产品导入任务',
+                'verbose_name_plural': '产品导入任务',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
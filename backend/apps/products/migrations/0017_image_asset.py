@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0016_import_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='原图路径')),
+                ('width', models.PositiveIntegerField(verbose_name='原图宽度')),
+                ('height', models.PositiveIntegerField(verbose_name='原图高度')),
+                ('variants', models.JSONField(default=dict, help_text='{格式: {宽度: 文件路径}}', verbose_name='版本')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '图片版本',
+                'verbose_name_plural': '图片版本',
+            },
+        ),
+    ]
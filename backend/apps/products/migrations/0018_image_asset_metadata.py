@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0017_image_asset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageasset',
+            name='blurhash',
+            field=models.CharField(blank=True, help_text='加载前显示的模糊占位图', max_length=64, verbose_name='Blurhash'),
+        ),
+        migrations.AddField(
+            model_name='imageasset',
+            name='dominant_color',
+            field=models.CharField(blank=True, help_text='#rrggbb', max_length=7, verbose_name='主色调'),
+        ),
+        migrations.AddField(
+            model_name='imageasset',
+            name='file_size',
+            field=models.PositiveBigIntegerField(default=0, help_text='字节', verbose_name='原图大小'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 23:58
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0018_image_asset_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheNamespace',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='命名空间')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='版本')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '缓存命名空间',
+                'verbose_name_plural': '缓存命名空间',
+            },
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.core.validators import FileExtensionValidator
 from django.utils import timezone
 
 
@@ -88,14 +89,35 @@ class Product(models.Model):
     order = models.IntegerField('排序', default=0)
     created_at = models.DateTimeField('创建时间', auto_now_add=True)
     updated_at = models.DateTimeField('更新时间', auto_now=True)
+    
+    # 图片冗余字段（由 ProductImage 保存/删除时维护，列表无需再查询图片表）
+    primary_image = models.CharField('主图路径', max_length=255, blank=True, editable=False)
+    image_count = models.PositiveIntegerField('图片数量', default=0, editable=False)
 
     class Meta:
         verbose_name = '产品'
         verbose_name_plural = '产品'
         ordering = ['order', '-created_at']
+        indexes = [
+            # 与游标分页的排序 (order, -created_at, id) 一致
+            models.Index(fields=['is_active', 'order', '-created_at', 'id'], name='products_active_order_idx'),
+            models.Index(fields=['category', 'is_active', 'order', '-created_at', 'id'], name='products_category_order_idx'),
+            models.Index(fields=['subcategory', 'is_active', 'order', '-created_at', 'id'], name='products_subcat_order_idx'),
+        ]
 
     def __str__(self):
         return self.name
+    
+    def refresh_image_summary(self):
+        """根据图片表重新计算主图路径和图片数量
+        
+        主图优先，没有主图时取排序第一张（与前端的取图规则一致）。
+        使用 update() 写入，不触发产品的 post_save（避免重复翻译和重建索引）。
+        """
+        images = self.images.order_by('-is_primary', 'order', 'created_at').values_list('image', flat=True)
+        self.image_count = len(images)
+        self.primary_image = images[0] if images else ''
+        Product.objects.filter(pk=self.pk).update(primary_image=self.primary_image, image_count=self.image_count)
 
 
 class ProductImage(models.Model):
@@ -384,4 +406,127 @@ class TemplateProcess(models.Model):
         ordering = ['order', 'created_at']
     
     def __str__(self):
-        return f"{self.template.name} - {self.name}"
\ No newline at end of file
+        return f"{self.template.name} - {self.name}"
+
+
+class ProductSpecValue(models.Model):
+    """产品规格数值（由规格文本解析得到的数值区间，用于按范围筛选）"""
+    SOURCE_CHOICES = [
+        ('product', '产品规格'),
+        ('template', '模板规格'),
+    ]
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='spec_values', verbose_name='产品')
+    spec_key = models.CharField('规格键', max_length=200, help_text='规范化后的规格名称')
+    spec_name = models.CharField('规格名称', max_length=200)
+    unit = models.CharField('单位', max_length=20, blank=True)
+    low = models.FloatField('下限', null=True, blank=True, help_text='为空表示无下限')
+    high = models.FloatField('上限', null=True, blank=True, help_text='为空表示无上限')
+    source = models.CharField('来源', max_length=10, choices=SOURCE_CHOICES, default='product')
+    source_template_id = models.PositiveIntegerField('来源模板ID', null=True, blank=True, db_index=True)
+
+    class Meta:
+        verbose_name = '产品规格数值'
+        verbose_name_plural = '产品规格数值'
+        indexes = [
+            models.Index(fields=['spec_key', 'low'], name='products_specvalue_low_idx'),
+            models.Index(fields=['spec_key', 'high'], name='products_specvalue_high_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} - {self.spec_name}: {self.low}~{self.high} {self.unit}"
+
+
+class RelatedProduct(models.Model):
+    """相关产品（预计算的相似度近邻，由 related.py 维护）"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_links', verbose_name='产品')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', verbose_name='相关产品')
+    score = models.FloatField('相似度')
+    rank = models.PositiveSmallIntegerField('排名')
+
+    class Meta:
+        verbose_name = '相关产品'
+        verbose_name_plural = '相关产品'
+        ordering = ['product', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'related'], name='products_related_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'rank'], name='products_related_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.related_id} ({self.score:.3f})"
+
+
+class ImportJob(models.Model):
+    """产品目录导入任务（由 catalog_import.py 执行，按分块记录进度，失败后可从中断处继续）"""
+    STATUS_CHOICES = [
+        ('pending', '待导入'),
+        ('running', '导入中'),
+        ('completed', '已完成'),
+        ('failed', '失败'),
+    ]
+
+    file = models.FileField('导入文件', upload_to='imports/', help_text='XLSX 或 CSV 文件，第一行为列名',
+                            validators=[FileExtensionValidator(['xlsx', 'csv'])])
+    status = models.CharField('状态', max_length=10, choices=STATUS_CHOICES, default='pending')
+    total_rows = models.PositiveIntegerField('数据行数', default=0)
+    processed_rows = models.PositiveIntegerField('已处理行数', default=0)
+    created_count = models.PositiveIntegerField('新增产品数', default=0)
+    updated_count = models.PositiveIntegerField('更新产品数', default=0)
+    error_count = models.PositiveIntegerField('错误行数', default=0)
+    errors = models.JSONField('错误行', default=list, blank=True, help_text='[行号, 错误信息]，只保存前面部分')
+    message = models.TextField('消息', blank=True)
+    created_at = models.DateTimeField('创建时间', auto_now_add=True)
+    updated_at = models.DateTimeField('更新时间', auto_now=True)
+    finished_at = models.DateTimeField('完成时间', null=True, blank=True)
+
+    class Meta:
+        verbose_name = '产品导入任务'
+        verbose_name_plural = '产品导入任务'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.file.name} ({self.get_status_display()})"
+
+    @property
+    def progress(self):
+        """进度百分比"""
+        if not self.total_rows:
+            return 0
+        return round(self.processed_rows * 100 / self.total_rows, 1)
+
+
+class ImageAsset(models.Model):
+    """上传图片的响应式版本清单和元数据（由 image_variants.py 生成和维护）"""
+    name = models.CharField('原图路径', max_length=255, unique=True)
+    width = models.PositiveIntegerField('原图宽度')
+    height = models.PositiveIntegerField('原图高度')
+    file_size = models.PositiveBigIntegerField('原图大小', default=0, help_text='字节')
+    dominant_color = models.CharField('主色调', max_length=7, blank=True, help_text='#rrggbb')
+    blurhash = models.CharField('Blurhash', max_length=64, blank=True, help_text='加载前显示的模糊占位图')
+    variants = models.JSONField('版本', default=dict, help_text='{格式: {宽度: 文件路径}}')
+    created_at = models.DateTimeField('创建时间', auto_now_add=True)
+    updated_at = models.DateTimeField('更新时间', auto_now=True)
+
+    class Meta:
+        verbose_name = '图片版本'
+        verbose_name_plural = '图片版本'
+
+    def __str__(self):
+        return self.name
+
+
+class CacheNamespace(models.Model):
+    """API响应缓存命名空间的版本号（保存在数据库中，各worker进程和管理命令的缓存失效互相可见）"""
+    name = models.CharField('命名空间', max_length=50, unique=True)
+    version = models.PositiveBigIntegerField('版本', default=0)
+    updated_at = models.DateTimeField('更新时间', default=timezone.now)
+
+    class Meta:
+        verbose_name = '缓存命名空间'
+        verbose_name_plural = '缓存命名空间'
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
@@ -0,0 +1,117 @@
+"""
+导航分类树 - 每个worker进程内预计算的 分类 -> 激活子分类 -> 激活产品数量
+
+分类、子分类、产品数量三次查询构建基础树，各语言的翻译名称和绝对图片地址（与分类序列化器一致）
+按 语言 + 站点地址 生成并缓存，同时计算内容摘要作为ETag。命名空间版本号未变化时直接返回内存中的结果，不访问数据库；
+分类、子分类、产品或翻译变更后（本进程或其他worker）版本号变化，下次请求时重建。
+"""
+import hashlib
+import json
+import threading
+
+from django.db.models import Count
+
+from .caching import response_cache
+from .models import Category, SubCategory, Product
+from .services import translation_service
+
+
+# 分类树依赖的数据命名空间
+TREE_NAMESPACES = ['products', 'categories', 'translations']
+
+# 每个进程最多缓存的 语言 + 站点地址 组合数（Host 头由客户端决定，需要有上限）
+MAX_DOCUMENTS = 64
+
+
+class CategoryTree:
+    """导航分类树服务（每个进程一份）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = None
+        self._categories = []  # 基础树（原文名称、相对图片地址）
+        self._documents = {}   # (语言, 站点地址) -> (ETag, 分类树)
+
+    def _image_url(self, image):
+        return image.url if image else None
+
+    def rebuild(self):
+        """从数据库构建基础树，清空各语言的结果"""
+        versions = response_cache.versions(TREE_NAMESPACES)
+        category_counts = dict(
+            Product.objects.filter(is_active=True).values_list('category_id').annotate(total=Count('id'))
+        )
+        subcategory_counts = dict(
+            Product.objects.filter(is_active=True, subcategory__isnull=False)
+            .values_list('subcategory_id').annotate(total=Count('id'))
+        )
+
+        subcategories = {}
+        for subcategory in SubCategory.objects.filter(is_active=True).order_by('order', 'name'):
+            subcategories.setdefault(subcategory.parent_category_id, []).append({
+                'id': subcategory.id,
+                'name': subcategory.name,
+                'slug': subcategory.slug,
+                'image': self._image_url(subcategory.image),
+                'product_count': subcategory_counts.get(subcategory.id, 0),
+            })
+
+        self._categories = [
+            {
+                'id': category.id,
+                'name': category.name,
+                'slug': category.slug,
+                'image': self._image_url(category.image),
+                'product_count': category_counts.get(category.id, 0),
+                'subcategories': subcategories.get(category.id, []),
+            }
+            for category in Category.objects.filter(is_active=True).order_by('order', 'name')
+        ]
+        self._documents = {}
+        self._versions = versions
+
+    def _translate(self, language, request=None):
+        category_names = subcategory_names = {}
+        if language != 'zh':
+            category_names = translation_service.get_translations('category', language)
+            subcategory_names = translation_service.get_translations('subcategory', language)
+
+        def absolute(url):
+            return request.build_absolute_uri(url) if url and request else url
+
+        return [
+            dict(
+                category,
+                name=category_names.get(f"name_{category['id']}") or category['name'],
+                image=absolute(category['image']),
+                subcategories=[
+                    dict(
+                        subcategory,
+                        name=subcategory_names.get(f"name_{subcategory['id']}") or subcategory['name'],
+                        image=absolute(subcategory['image']),
+                    )
+                    for subcategory in category['subcategories']
+                ],
+            )
+            for category in self._categories
+        ]
+
+    def get(self, language='zh', request=None):
+        """返回 (ETag, 分类树)，传入 request 时图片为绝对地址"""
+        origin = f'{request.scheme}://{request.get_host()}' if request else None
+        with self._lock:
+            if self._versions != response_cache.versions(TREE_NAMESPACES):
+                self.rebuild()
+            document = self._documents.get((language, origin))
+            if document is None:
+                tree = self._translate(language, request)
+                raw = json.dumps(tree, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+                etag = '"%s"' % hashlib.md5(f"{language}:{raw}".encode('utf-8')).hexdigest()
+                if len(self._documents) >= MAX_DOCUMENTS:
+                    self._documents = {}
+                document = self._documents[(language, origin)] = (etag, tree)
+            return document
+
+
+# 全局分类树实例
+category_tree = CategoryTree()
@@ -0,0 +1,93 @@
+"""
+页面聚合 - 首页首屏所需的全部数据一次返回
+
+首页原本需要分别请求工厂图片、推荐产品、分类、前端翻译，导航栏和页脚再请求分类树和友情链接。
+聚合接口把每个区块作为独立的缓存片段（各自声明依赖的命名空间），某类数据变更只会使对应区块重建，
+其他区块继续命中缓存。
+"""
+from django.conf import settings
+
+from .caching import entry_tag, response_cache
+from .models import Category, Product
+from .serializers import (
+    ProductCardSerializer, CategoryWithSubcategoriesSerializer, TranslatedCategoryWithSubcategoriesSerializer,
+    translation_tables,
+)
+from .services import translation_service
+from apps.about.models import FactoryImage, FriendLink
+from apps.about.serializers import FactoryImageSerializer, FriendLinkSerializer
+
+
+# 首页推荐产品数量
+HOME_FEATURED_LIMIT = 8
+
+
+def _factory_images(request, language):
+    images = FactoryImage.objects.filter(is_active=True).order_by('order', 'title')
+    return FactoryImageSerializer(images, many=True, context={'request': request}).data
+
+
+def _featured_products(request, language):
+    products = Product.objects.filter(is_active=True, is_featured=True).select_related('category').only(
+        'id', 'name', 'slug', 'category_id', 'category__name', 'subcategory_id', 'is_featured', 'primary_image'
+    ).order_by('order', '-created_at')[:HOME_FEATURED_LIMIT]
+    context = {
+        'language': language, 'request': request,
+        'translations': translation_tables(language, ['product', 'category']),
+    }
+    return ProductCardSerializer(products, many=True, context=context).data
+
+
+def _categories(request, language):
+    categories = Category.objects.filter(is_active=True).prefetch_related('subcategories').order_by('order', 'name')
+    serializer_class = (
+        TranslatedCategoryWithSubcategoriesSerializer if language != 'zh' else CategoryWithSubcategoriesSerializer
+    )
+    context = {
+        'language': language, 'request': request,
+        'translations': translation_tables(language, ['category', 'subcategory']),
+    }
+    return serializer_class(categories, many=True, context=context).data
+
+
+def _friend_links(request, language):
+    links = FriendLink.objects.filter(is_active=True).order_by('order', 'name')
+    return FriendLinkSerializer(links, many=True, context={'request': request}).data
+
+
+def _translations(request, language):
+    return translation_service.get_all_frontend_content(language)
+
+
+# 区块名 -> (构建函数, 依赖的缓存命名空间)
+HOME_SECTIONS = {
+    'factory_images': (_factory_images, ['factory_images']),
+    'featured_products': (_featured_products, ['products', 'categories', 'translations']),
+    'categories': (_categories, ['categories', 'translations']),
+    'friend_links': (_friend_links, ['friend_links']),
+    'translations': (_translations, ['translations']),
+}
+
+
+def build_page(sections, request, language='zh', page='home'):
+    """逐个区块读取缓存片段（失效的区块单独重建），返回 ({区块名: 数据}, {区块名: 缓存状态}, 内容标识)
+
+    内容标识由各区块缓存条目的标识组成，未启用缓存时为None。
+    """
+    cache_enabled = getattr(settings, 'API_CACHE_ENABLED', True)
+    data = {}
+    states = {}
+    tags = []
+    with response_cache.pinned():
+        for name, (builder, namespaces) in sections.items():
+            if not cache_enabled:
+                data[name], states[name] = builder(request, language), 'MISS'
+                continue
+            endpoint = f'pages.{page}.{name}'
+            key = f"apicache:{endpoint}:{request.scheme}://{request.get_host()}:{language}"
+            entry, states[name] = response_cache.get_entry(
+                key, lambda builder=builder: builder(request, language), endpoint, namespaces
+            )
+            data[name] = entry['value']
+            tags.append(entry_tag(key, entry))
+    return data, states, '|'.join(tags) if cache_enabled else None
@@ -0,0 +1,176 @@
+"""
+键集（游标）分页
+
+按稳定的排序字段组合（最后一个字段必须唯一，如id）翻页：游标中记录当前页边界行的排序字段值，
+下一页用 "排序字段 > 边界值" 的行比较条件直接定位，不使用 OFFSET，也不执行 COUNT(*)，
+因此任意深度的页面和第一页代价相同，配合同序的联合索引即可走索引范围扫描。
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """键集分页基类，子类通过 ordering 指定排序字段（'-' 前缀表示降序）"""
+    ordering = ('-id',)
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = '无效的分页游标'
+
+    # ---------- 游标编解码 ----------
+
+    def _fields(self, model):
+        return [
+            (name.lstrip('-'), name.startswith('-'), model._meta.get_field(name.lstrip('-')))
+            for name in self.ordering
+        ]
+
+    def encode_cursor(self, values, reverse):
+        raw = json.dumps([1 if reverse else 0, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor, fields):
+        """返回 (边界值列表, 是否向前翻页)"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            reverse, values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+            if len(values) != len(fields):
+                raise ValueError(cursor)
+            values = [
+                None if value is None else field.to_python(value)
+                for (_, _, field), value in zip(fields, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        return values, bool(reverse)
+
+    def _row_values(self, obj, fields):
+        return [
+            None if getattr(obj, field.attname) is None else field.value_to_string(obj)
+            for _, _, field in fields
+        ]
+
+    # ---------- 查询条件 ----------
+
+    @staticmethod
+    def _order_expression(name, descending, field):
+        # 可为空的字段固定空值位置：降序时排在最后，升序时排在最前（反向翻页时恰好互换）
+        if not field.null:
+            return f'-{name}' if descending else name
+        return F(name).desc(nulls_last=True) if descending else F(name).asc(nulls_first=True)
+
+    @staticmethod
+    def _after(name, descending, field, value):
+        """排序在边界值之后的条件，没有满足条件的行时返回None"""
+        if descending:
+            if value is None:
+                return None
+            if field.null:
+                return Q(**{f'{name}__lt': value}) | Q(**{f'{name}__isnull': True})
+            return Q(**{f'{name}__lt': value})
+        if value is None:
+            return Q(**{f'{name}__isnull': False})
+        return Q(**{f'{name}__gt': value})
+
+    @staticmethod
+    def _equal(name, value):
+        if value is None:
+            return Q(**{f'{name}__isnull': True})
+        return Q(**{name: value})
+
+    def _keyset_condition(self, fields, values):
+        """(a, b, c) > (va, vb, vc) 展开为 a>va OR (a=va AND b>vb) OR (a=va AND b=vb AND c>vc)"""
+        condition = None
+        prefix = Q()
+        for (name, descending, field), value in zip(fields, values):
+            after = self._after(name, descending, field, value)
+            if after is not None:
+                condition = prefix & after if condition is None else condition | (prefix & after)
+            prefix &= self._equal(name, value)
+        return condition if condition is not None else Q(pk__in=[])
+
+    # ---------- 分页 ----------
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        fields = self._fields(queryset.model)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        values, reverse = (None, False)
+        if cursor:
+            values, reverse = self.decode_cursor(cursor, fields)
+
+        # 反向翻页时所有排序方向取反，取回后再倒序
+        walk = [(name, descending != reverse, field) for name, descending, field in fields]
+        queryset = queryset.order_by(*[self._order_expression(*item) for item in walk])
+        if values is not None:
+            queryset = queryset.filter(self._keyset_condition(walk, values))
+
+        rows = list(queryset[:self.page_size_value + 1])
+        has_more = len(rows) > self.page_size_value
+        rows = rows[:self.page_size_value]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, values is not None
+        self.first_values = self._row_values(rows[0], fields) if rows else values
+        self.last_values = self._row_values(rows[-1], fields) if rows else values
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or self.last_values is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last_values, False))
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first_values is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.first_values, True))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ProductCursorPagination(KeysetPagination):
+    """产品列表：按排序号、创建时间倒序，id 保证唯一"""
+    ordering = ('order', '-created_at', 'id')
+
+
+class ArticleCursorPagination(KeysetPagination):
+    """文章列表：按发布时间、创建时间倒序，id 保证唯一"""
+    ordering = ('-published_at', '-created_at', 'id')
@@ -0,0 +1,281 @@
+"""
+相关产品 - 预计算的相似度近邻
+
+每个产品表示为一组带权词条：子分类、分类、有效模板、牌号/状态/表面处理/颜色属性词条，
+以及有效规格（产品规格或继承的模板规格）的 "名称=值" 词条。词条权重 = 类别权重 × IDF，
+两个产品的相似度为加权Jaccard：共同词条权重 / 两者词条权重之并。
+
+每个产品保存前 RELATED_LIMIT 个近邻到 RelatedProduct 表，接口只需一次按索引读取。
+产品变更时只重算该产品的近邻，并把它合并进与它有共同词条的产品的近邻列表；
+模板变更会影响大量产品的词条，直接全量重建。
+
+词条和倒排表在每个进程内缓存（_CorpusCache），产品变更时只重新读取变更的产品；
+任何进程写入近邻后递增 related 命名空间版本号，其他进程据此在下次使用前重新加载。
+"""
+import heapq
+import math
+import threading
+
+from django.apps import apps as global_apps
+from django.db import transaction
+
+from .caching import response_cache
+from .facets import FACET_ATTRIBUTES, product_attribute_tokens
+from .models import RelatedProduct
+from .spec_ranges import effective_specs, load_template_specs, normalize_spec_name
+from .template_serializers import build_template_resolver
+
+
+# 每个产品保存的近邻数量（接口的 limit 上限）
+RELATED_LIMIT = 12
+
+# 近邻表的命名空间：任何进程写入近邻后递增，各进程缓存的词条据此判断是否需要重新加载
+RELATED_NAMESPACES = ['related']
+
+# 词条类别权重
+TOKEN_WEIGHTS = {
+    'subcategory': 3.0,
+    'category': 2.0,
+    'template': 2.0,
+    'spec': 1.5,
+    'attribute': 1.0,
+}
+
+
+def product_tokens(product, resolve_template, template_specs):
+    """计算产品的词条集合（词条为 (类别, 值) 元组）"""
+    tokens = set()
+    if product.subcategory_id:
+        tokens.add(('subcategory', product.subcategory_id))
+    tokens.add(('category', product.category_id))
+    template = resolve_template(product)
+    if template:
+        tokens.add(('template', template.id))
+    attributes = product_attribute_tokens(product, resolve_template)
+    for attribute in FACET_ATTRIBUTES:
+        tokens.update(('attribute', f'{attribute}:{key}') for key in attributes[attribute])
+    for name, value in effective_specs(product, resolve_template, template_specs)[1]:
+        spec_key = normalize_spec_name(name)[0]
+        value = ' '.join((value or '').casefold().split())
+        if spec_key and value:
+            tokens.add(('spec', f'{spec_key}={value}'))
+    return tokens
+
+
+def _product_queryset(apps=global_apps):
+    return apps.get_model('products', 'Product').objects.filter(is_active=True).only(
+        'id', 'category_id', 'subcategory_id', 'template_id', 'use_template', *FACET_ATTRIBUTES
+    ).prefetch_related('specification_items')
+
+
+class _Corpus:
+    """所有激活产品的词条、倒排表和词条权重"""
+
+    def __init__(self, apps=global_apps):
+        self.apps = apps
+        self.tokens = {}    # 产品ID -> 词条集合
+        self.postings = {}  # 词条 -> 产品ID集合
+        self.weights = {}
+        self.norms = {}
+        self._add(_product_queryset(apps).iterator(chunk_size=2000))
+        self._reweigh(self.postings)
+
+    def _add(self, products):
+        resolve_template = build_template_resolver(self.apps)
+        template_specs = load_template_specs(self.apps)
+        added = set()
+        for product in products:
+            tokens = product_tokens(product, resolve_template, template_specs)
+            self.tokens[product.id] = tokens
+            for token in tokens:
+                self.postings.setdefault(token, set()).add(product.id)
+            added |= tokens
+        return added
+
+    def _reweigh(self, tokens):
+        """重算这些词条的权重，以及含有这些词条的产品的范数"""
+        total = len(self.tokens)
+        product_ids = set()
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids:
+                self.weights[token] = TOKEN_WEIGHTS[token[0]] * math.log(1 + total / len(ids))
+                product_ids |= ids
+            else:
+                self.weights.pop(token, None)
+        for product_id in product_ids:
+            self.norms[product_id] = sum(self.weights[token] for token in self.tokens[product_id])
+
+    def update(self, product_ids):
+        """重新读取变更的产品（已删除或停用的产品移出语料）
+
+        激活产品总数不变时只有变更产品的词条文档频率变化，只重算这些词条的权重；
+        总数变化时所有词条的IDF都会变化，全部重算（不需要访问数据库）。
+        """
+        total = len(self.tokens)
+        touched = set()
+        for product_id in product_ids:
+            self.norms.pop(product_id, None)
+            for token in self.tokens.pop(product_id, ()):
+                ids = self.postings[token]
+                ids.discard(product_id)
+                if not ids:
+                    del self.postings[token]
+                touched.add(token)
+        touched |= self._add(_product_queryset(self.apps).filter(id__in=list(product_ids)))
+        self._reweigh(self.postings if len(self.tokens) != total else touched)
+
+    def scores(self, product_id):
+        """与其他所有产品的相似度 {产品ID: 分数}（只包含有共同词条的产品）"""
+        tokens = self.tokens.get(product_id)
+        if not tokens:
+            return {}
+        shared = {}
+        for token in tokens:
+            weight = self.weights[token]
+            for other_id in self.postings[token]:
+                if other_id != product_id:
+                    shared[other_id] = shared.get(other_id, 0.0) + weight
+        norm = self.norms[product_id]
+        return {
+            other_id: value / (norm + self.norms[other_id] - value)
+            for other_id, value in shared.items()
+        }
+
+    def neighbours(self, product_id, limit=RELATED_LIMIT):
+        """前 limit 个近邻 [(负分数, 产品ID)]，分数相同按ID排序保证结果稳定"""
+        scores = self.scores(product_id)
+        return heapq.nsmallest(limit, ((-score, other_id) for other_id, score in scores.items()))
+
+
+class _CorpusCache:
+    """本进程缓存的语料，其他进程写入近邻后（related 版本号变化）重新加载"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._corpus = None
+        self._versions = None
+
+    def get(self, reload=False):
+        """返回最新的语料，调用方需持有 lock"""
+        versions = response_cache.versions(RELATED_NAMESPACES)
+        if reload or self._corpus is None or self._versions != versions:
+            self._corpus, self._versions = _Corpus(), versions
+        return self._corpus
+
+    def discard(self):
+        self._corpus = None
+
+    def written(self):
+        """本进程写入近邻后调用：递增版本号，期间没有其他进程写入时本进程的语料仍然有效"""
+        response_cache.invalidate(*RELATED_NAMESPACES)
+        self._versions = response_cache.synced_versions(self._versions, RELATED_NAMESPACES, RELATED_NAMESPACES)
+
+
+_corpus_cache = _CorpusCache()
+
+
+def _write_lists(lists, apps=global_apps):
+    """覆盖写入一批产品的近邻列表 {产品ID: [(负分数, 近邻ID)]}"""
+    related_model = apps.get_model('products', 'RelatedProduct')
+    with transaction.atomic():
+        related_model.objects.filter(product_id__in=list(lists)).delete()
+        related_model.objects.bulk_create([
+            related_model(product_id=product_id, related_id=other_id, score=round(-negative, 6), rank=rank)
+            for product_id, items in lists.items()
+            for rank, (negative, other_id) in enumerate(items, start=1)
+        ], batch_size=1000)
+
+
+def _replace_all(corpus, apps=global_apps):
+    lists = {product_id: corpus.neighbours(product_id) for product_id in corpus.tokens}
+    with transaction.atomic():
+        apps.get_model('products', 'RelatedProduct').objects.all().delete()
+        _write_lists(lists, apps)
+    return len(lists)
+
+
+def rebuild_related(apps=global_apps):
+    """全量重算所有产品的近邻，返回写入的产品数
+
+    迁移中传入历史模型注册表 apps 回填已有产品：此时不使用本进程的语料缓存，也不递增版本号
+    （版本号表可能还不存在）。
+    """
+    if apps is not global_apps:
+        return _replace_all(_Corpus(apps), apps)
+    with _corpus_cache.lock:
+        count = _replace_all(_corpus_cache.get(reload=True))  # 模板变更等影响所有产品的词条
+        _corpus_cache.written()
+    return count
+
+
+def update_related(product_ids, referrer_ids=()):
+    """增量更新：重算变更产品自身的近邻，并把变更合并进受影响产品的近邻列表
+
+    已删除或停用的产品会从其他产品的近邻列表中移除。产品删除时级联删除已经清掉了
+    指向它的近邻记录，调用方需在删除前查出 referrer_ids（把它列为近邻的产品）传入。
+    """
+    with _corpus_cache.lock:
+        corpus = _corpus_cache.get()
+        try:
+            corpus.update(product_ids)
+            count = _update_lists(corpus, product_ids, referrer_ids)
+        except Exception:
+            _corpus_cache.discard()  # 语料可能只更新了一部分
+            raise
+        _corpus_cache.written()
+    return count
+
+
+def _update_lists(corpus, product_ids, referrer_ids):
+    changed = [pk for pk in product_ids if pk in corpus.tokens]
+    removed = {pk for pk in product_ids if pk not in corpus.tokens}
+
+    lists = {pk: corpus.neighbours(pk) for pk in changed}
+
+    # 受影响的产品：与变更产品有共同词条的产品，以及当前近邻中包含变更产品的产品
+    new_scores = {pk: corpus.scores(pk) for pk in changed}
+    referrers = set(referrer_ids)
+    affected = set(referrers)
+    for scores in new_scores.values():
+        affected.update(scores)
+    affected.update(
+        RelatedProduct.objects.filter(related_id__in=list(product_ids)).values_list('product_id', flat=True)
+    )
+    affected -= set(product_ids)
+
+    current = {}
+    for product_id, other_id, score in RelatedProduct.objects.filter(
+        product_id__in=affected
+    ).values_list('product_id', 'related_id', 'score'):
+        current.setdefault(product_id, {})[other_id] = score
+
+    for product_id in affected:
+        if product_id not in corpus.tokens:
+            continue
+        before = current.get(product_id, {})
+        items = dict(before)
+        # 列表原本已满时，若有近邻被移除或分数下降，列表之外的产品可能进入前N，需要重算；
+        # 近邻被删除的产品（记录已级联删除）同样重算
+        shrunk = False
+        for other_id in removed:
+            shrunk |= items.pop(other_id, None) is not None
+        for other_id in changed:
+            score = new_scores[other_id].get(product_id, 0.0)
+            if score > 0:
+                shrunk |= other_id in items and score < items[other_id]
+                items[other_id] = score
+            else:
+                shrunk |= items.pop(other_id, None) is not None
+        if product_id in referrers or (shrunk and len(before) >= RELATED_LIMIT):
+            ranked = corpus.neighbours(product_id)
+        else:
+            ranked = heapq.nsmallest(RELATED_LIMIT, ((-score, other_id) for other_id, score in items.items()))
+        if ranked != sorted((-score, other_id) for other_id, score in before.items()):
+            lists[product_id] = ranked
+
+    for product_id in removed:
+        lists[product_id] = []
+    if lists:
+        _write_lists(lists)
+    return len(lists)
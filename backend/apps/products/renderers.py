@@ -0,0 +1,157 @@
+"""
+快速JSON渲染 - 可选使用 orjson，并把预编码的片段直接拼接进响应
+
+列表中每个产品都嵌套同样的分类/子分类对象，详情中模板合并的区块也对同一模板的所有产品相同。
+这些稳定的子对象序列化并编码一次后缓存为字节片段（Fragment），渲染时原样拼接，不再重复编码。
+片段缓存按数据命名空间版本号失效，与响应缓存共用同一套版本号；缓存的响应在 response_cache.pinned()
+中构建，一个响应只读取一次版本号。
+
+与 DRF JSONRenderer 的差异：
+- 未安装 orjson 时使用标准库 json，输出与 DRF JSONRenderer 逐字节一致（紧凑、不转义非ASCII字符）。
+- 使用 orjson 时数据相同，但浮点数写法可能不同（1e-7 / 1e-07），NaN 和 Infinity 输出为 null
+  （DRF JSONRenderer 会报错）。片段由同一个编码器生成，拼接后的输出与不使用片段时逐字节一致。
+- 序列化结果（response.data）中的嵌套对象是 Fragment 而不是字典。其他渲染器（可浏览API、带缩进的请求）
+  通过 tolist() 解码后重新编码；直接读取 response.data 的代码需要先调用 tolist()，
+  或在 fragment_cache.bypass() 中序列化。
+"""
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+from .caching import response_cache
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 为可选依赖
+    orjson = None
+
+
+# 每个进程缓存的片段数量上限，超过后淘汰最早写入的片段
+FRAGMENT_CACHE_SIZE = 5000
+
+_drf_encoder = encoders.JSONEncoder()
+
+
+class Fragment:
+    """预编码的JSON片段
+
+    渲染器遇到 Fragment 时直接拼接其字节；其他渲染器（或需要读取内容的代码）可通过 tolist()
+    取回解码后的数据，DRF 的 JSONEncoder 会自动调用该方法。
+    """
+    __slots__ = ('data', 'length')
+
+    def __init__(self, data, length=None):
+        self.data = data
+        self.length = length
+
+    def __len__(self):
+        return self.length or 0
+
+    def __bool__(self):
+        return self.length is None or self.length > 0
+
+    def tolist(self):
+        return json.loads(self.data)
+
+    def __getstate__(self):
+        return (self.data, self.length)
+
+    def __setstate__(self, state):
+        self.data, self.length = state
+
+
+def _default(obj):
+    """orjson 不支持的类型交给 DRF 编码器处理（惰性翻译字符串、Decimal 等）"""
+    return _drf_encoder.default(obj)
+
+
+def dumps(data, default=_default):
+    """编码为紧凑的UTF-8字节"""
+    if orjson is not None:
+        return orjson.dumps(data, default=default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        data, default=default, ensure_ascii=False, allow_nan=False, separators=(',', ':')
+    ).encode('utf-8')
+
+
+def encode(data):
+    """编码数据，其中的 Fragment 原样拼接"""
+    fragments = []
+    nonce = uuid.uuid4().hex
+
+    def default(obj):
+        if isinstance(obj, Fragment):
+            fragments.append(obj.data)
+            return f'__fragment_{nonce}_{len(fragments) - 1}__'
+        return _default(obj)
+
+    output = dumps(data, default=default)
+    for index, fragment in enumerate(fragments):
+        output = output.replace(f'"__fragment_{nonce}_{index}__"'.encode('ascii'), fragment, 1)
+    return output
+
+
+class FragmentCache:
+    """片段缓存服务（每个进程一份）"""
+
+    def __init__(self, max_size=FRAGMENT_CACHE_SIZE):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # 键 -> (版本号, Fragment)
+        self._local = threading.local()
+        self.max_size = max_size
+
+    @contextmanager
+    def bypass(self):
+        """在当前线程内停用片段缓存，get() 直接返回 build() 的原始数据（用于对比测试和调试）"""
+        self._local.bypass = True
+        try:
+            yield
+        finally:
+            self._local.bypass = False
+
+    def get(self, key, namespaces, build):
+        """读取片段，数据版本变化或不存在时调用 build() 生成数据并编码"""
+        if getattr(self._local, 'bypass', False):
+            return build()
+        versions = response_cache.versions(namespaces)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] == versions:
+            return entry[1]
+
+        data = build()
+        fragment = Fragment(encode(data), len(data) if isinstance(data, (list, tuple)) else None)
+        with self._lock:
+            self._entries[key] = (versions, fragment)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return fragment
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# 全局片段缓存实例
+fragment_cache = FragmentCache()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """快速JSON渲染器：orjson（可选）编码并拼接预编码片段
+
+    请求带缩进参数（Accept: application/json; indent=4）时使用 DRF 默认实现。
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        return encode(data)
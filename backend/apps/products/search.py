@@ -0,0 +1,215 @@
+"""
+产品全文搜索索引 - 基于SQLite FTS5
+
+索引覆盖产品名称、描述、特性、技术规格（含模板继承的规格）以及所有已存储的翻译。
+中文按二元组（bigram）切分后写入索引，查询时做同样的切分，从而支持中文子串搜索。
+"""
+import logging
+
+from django.apps import apps as global_apps
+from django.db import connection, OperationalError, ProgrammingError
+
+from apps.common.text import tokenize_text, build_match_query
+from .services import translation_service
+
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = 'products_search'
+TRANSLATED_FIELDS = ('name', 'description', 'features', 'applications')
+
+# 已存储翻译的语言（与 auto_translate_on_save 保持一致）
+TRANSLATED_LANGUAGES = ['zh', 'es', 'pt', 'fr', 'de', 'it', 'ru', 'hi']
+
+# bm25列权重：name, description, features, specs, translations
+COLUMN_WEIGHTS = (10.0, 3.0, 2.0, 2.0, 1.0)
+
+class ProductSearchIndex:
+    """产品搜索索引服务"""
+
+    def __init__(self):
+        self._available = None
+
+    def is_available(self):
+        """索引表是否存在（非SQLite数据库或SQLite未编译FTS5时不可用）
+
+        只缓存“可用”的结果：迁移 0011 执行前检查过的进程，迁移后无需重启即可使用索引。
+        """
+        if self._available:
+            return True
+        if connection.vendor != 'sqlite':
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [SEARCH_TABLE])
+            self._available = cursor.fetchone() is not None
+        return self._available
+
+    # ---------- 文档构建 ----------
+
+    def _build_document(self, product, translations_by_lang, resolve_template, template_specs):
+        """生成产品的索引文档"""
+        from .spec_ranges import effective_specs
+
+        features = [product.features or '']
+        features.extend(f"{item.name} {item.description}" for item in product.feature_items.all())
+
+        specs = [f"{name} {value}" for name, value in effective_specs(product, resolve_template, template_specs)[1]]
+
+        translated = []
+        for translations in translations_by_lang.values():
+            for field in TRANSLATED_FIELDS:
+                value = translations.get(f"{field}_{product.id}")
+                if value:
+                    translated.append(value)
+
+        return (
+            tokenize_text(product.name),
+            tokenize_text(f"{product.description or ''} {product.applications or ''}"),
+            tokenize_text(' '.join(features)),
+            tokenize_text(' '.join(specs)),
+            tokenize_text(' '.join(translated)),
+        )
+
+    def _load_translations(self):
+        return {lang: translation_service.load_translations('product', lang) for lang in TRANSLATED_LANGUAGES}
+
+    def _translations_for(self, products):
+        """只取这些产品的译文（保存单个产品时不必处理整个翻译文件）"""
+        translations_by_lang = {lang: {} for lang in TRANSLATED_LANGUAGES}
+        for product in products:
+            for lang, translations in translation_service.get_object_translations(
+                'product', product.id, TRANSLATED_FIELDS, TRANSLATED_LANGUAGES
+            ).items():
+                translations_by_lang[lang].update(translations)
+        return translations_by_lang
+
+    # ---------- 索引维护 ----------
+
+    def index_products(self, products, translations_by_lang=None, apps=global_apps):
+        """写入（或更新）一批产品的索引，未激活的产品从索引中移除"""
+        if not self.is_available():
+            return 0
+        from .spec_ranges import load_template_specs
+        from .template_serializers import build_template_resolver
+
+        products = list(products)
+        if translations_by_lang is None:
+            translations_by_lang = self._translations_for(products)
+        # 模板及其规格一次加载，避免逐个产品查询
+        resolve_template = build_template_resolver(apps)
+        template_specs = load_template_specs(apps)
+
+        rows = []
+        removed = []
+        for product in products:
+            if product.is_active:
+                rows.append((product.id,) + self._build_document(
+                    product, translations_by_lang, resolve_template, template_specs
+                ))
+            else:
+                removed.append(product.id)
+
+        with connection.cursor() as cursor:
+            ids = [row[0] for row in rows] + removed
+            if ids:
+                cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [(pk,) for pk in ids])
+            if rows:
+                cursor.executemany(
+                    f"INSERT INTO {SEARCH_TABLE} (rowid, name, description, features, specs, translations) "
+                    f"VALUES (%s, %s, %s, %s, %s, %s)",
+                    rows
+                )
+        return len(rows)
+
+    def index_product(self, product):
+        """更新单个产品的索引"""
+        return self.index_products([product])
+
+    def index_product_ids(self, product_ids):
+        """按ID更新产品索引（已删除的ID会被移除）"""
+        product_ids = list(product_ids)
+        products = list(self._queryset().filter(id__in=product_ids))
+        found = {product.id for product in products}
+        self.remove_products([pk for pk in product_ids if pk not in found])
+        return self.index_products(products)
+
+    def remove_products(self, product_ids):
+        """从索引中移除产品"""
+        if not self.is_available() or not product_ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [(pk,) for pk in product_ids])
+
+    def index_template_products(self, template):
+        """模板变更时重建受影响产品的索引"""
+        if not self.is_available():
+            return 0
+        from .template_serializers import template_products_condition
+
+        return self.index_products(self._queryset().filter(template_products_condition(template)))
+
+    def rebuild(self, chunk_size=500, apps=global_apps):
+        """全量重建索引（迁移中传入历史模型注册表 apps 回填已有产品）"""
+        if not self.is_available():
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+
+        translations_by_lang = self._load_translations()
+        total = 0
+        queryset = self._queryset(apps).filter(is_active=True).order_by('id')
+        last_id = 0
+        while True:
+            chunk = list(queryset.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            total += self.index_products(chunk, translations_by_lang, apps)
+            last_id = chunk[-1].id
+        return total
+
+    def _queryset(self, apps=global_apps):
+        product_model = apps.get_model('products', 'Product')
+        return product_model.objects.select_related('category', 'subcategory', 'template').prefetch_related(
+            'specification_items', 'feature_items'
+        )
+
+    # ---------- 查询 ----------
+
+    def search(self, query, offset=0, limit=20, within=None):
+        """按相关度排序搜索，返回 (总数, 产品ID列表)
+
+        within 为产品查询集时只在其中的产品内搜索（分类、属性等过滤条件作为子查询并入全文查询，
+        总数和分页与返回的结果一致）。索引不可用或查询出错时返回None，由调用方回退到数据库模糊查询。
+        """
+        if not self.is_available():
+            return None
+        match = build_match_query(query)
+        if not match:
+            return 0, []
+
+        where, params = f"{SEARCH_TABLE} MATCH %s", [match]
+        if within is not None:
+            subquery, subquery_params = within.order_by().values('id').query.sql_with_params()
+            where += f" AND rowid IN ({subquery})"
+            params.extend(subquery_params)
+
+        weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT count(*) FROM {SEARCH_TABLE} WHERE {where}", params)
+                total = cursor.fetchone()[0]
+                cursor.execute(
+                    f"SELECT rowid FROM {SEARCH_TABLE} WHERE {where} "
+                    f"ORDER BY bm25({SEARCH_TABLE}, {weights}), rowid LIMIT %s OFFSET %s",
+                    params + [limit, offset]
+                )
+                ids = [row[0] for row in cursor.fetchall()]
+        except (OperationalError, ProgrammingError):
+            logger.exception('全文搜索查询失败: %s', match)
+            self._available = None  # 索引表被删除等情况：下次重新检查
+            return None
+        return total, ids
+
+
+# 全局产品搜索索引实例
+product_search_index = ProductSearchIndex()
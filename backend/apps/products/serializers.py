@@ -1,3 +1,4 @@
+from django.db import models
 from rest_framework import serializers
 from .models import (
     Category, SubCategory, Product, ProductImage, ProductSpecification, ProductFeature, ProductApplication,
@@ -5,100 +6,168 @@ from .models import (
 )
 # ProductTemplate 已导入，无需在__init__中再次导入
 from .services import translation_service
+from .renderers import fragment_cache
+from .image_variants import prefetch_variants, variants_data
+
+
+def translated_text(context, model_name, obj_id, field_name):
+    """读取翻译文本：上下文带有批量加载的翻译表时直接查表，否则读取翻译文件"""
+    translations = context.get('translations')
+    if translations is not None and model_name in translations:
+        return translations[model_name].get(f"{field_name}_{obj_id}")
+    return translation_service.get_translated_text(model_name, obj_id, field_name, context.get('language', 'zh'))
+
+
+def translation_tables(language, model_names):
+    """批量序列化时放入上下文的翻译表 {模型: {"字段_ID": 译文}}，中文不需要翻译时返回None"""
+    if language == 'zh':
+        return None
+    return {model_name: translation_service.get_translations(model_name, language) for model_name in model_names}
+
+
+class ImageVariantsField(serializers.Field):
+    """图片的宽高、大小、主色调、blurhash 和响应式版本（可直接用于 srcset），source 为图片字段或图片路径，尚未生成时为null
+
+    列表序列化（many=True）时，第一次取值即用一次查询取出整个列表的版本清单。
+    """
+    
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+        self._prefetched = (None, None)  # (列表, 清单)
+    
+    def _list_manifests(self):
+        list_serializer = getattr(self.parent, 'parent', None)
+        if not isinstance(list_serializer, serializers.ListSerializer):
+            return None
+        items = list_serializer.instance
+        if items is None or isinstance(items, models.Manager):
+            return None
+        if self._prefetched[0] is not items:
+            names = []
+            for item in items:
+                value = self.get_attribute(item)
+                names.append(getattr(value, 'name', value))
+            self._prefetched = (items, prefetch_variants(names))
+        return self._prefetched[1]
+    
+    def to_representation(self, value):
+        return variants_data(getattr(value, 'name', value), self.context.get('request'), self._list_manifests())
 
 
 class CategorySerializer(serializers.ModelSerializer):
     """产品分类序列化器"""
+    image_variants = ImageVariantsField(source='image')
     
     class Meta:
         model = Category
-        fields = ['id', 'name', 'description', 'image', 'slug', 'order', 'is_active', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'description', 'image', 'image_variants', 'slug', 'order', 'is_active', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at', 'template_name']
 
 
 class TranslatedCategorySerializer(serializers.ModelSerializer):
     """翻译后的分类序列化器"""
+    image_variants = ImageVariantsField(source='image')
     translated_name = serializers.SerializerMethodField()
     translated_description = serializers.SerializerMethodField()
     
     class Meta:
         model = Category
-        fields = ['id', 'translated_name', 'translated_description', 'image', 'slug', 'order', 'is_active', 'created_at', 'updated_at']
+        fields = ['id', 'translated_name', 'translated_description', 'image', 'image_variants', 'slug', 'order', 'is_active', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at', 'template_name']
     
     def get_translated_name(self, obj):
-        language = self.context.get('language', 'zh')
-        return translation_service.get_translated_text('category', obj.id, 'name', language) or obj.name
+        return translated_text(self.context, 'category', obj.id, 'name') or obj.name
     
     def get_translated_description(self, obj):
-        language = self.context.get('language', 'zh')
-        return translation_service.get_translated_text('category', obj.id, 'description', language) or obj.description
+        return translated_text(self.context, 'category', obj.id, 'description') or obj.description
 
 
 class SubCategorySerializer(serializers.ModelSerializer):
     """产品子分类序列化器"""
+    image_variants = ImageVariantsField(source='image')
     
     class Meta:
         model = SubCategory
-        fields = ['id', 'parent_category', 'name', 'description', 'image', 'slug', 'order', 'is_active', 'created_at', 'updated_at']
+        fields = ['id', 'parent_category', 'name', 'description', 'image', 'image_variants', 'slug', 'order', 'is_active', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at', 'template_name']
 
 
 class TranslatedSubCategorySerializer(serializers.ModelSerializer):
     """翻译后的子分类序列化器"""
+    image_variants = ImageVariantsField(source='image')
     translated_name = serializers.SerializerMethodField()
     translated_description = serializers.SerializerMethodField()
     
     class Meta:
         model = SubCategory
-        fields = ['id', 'parent_category', 'translated_name', 'translated_description', 'image', 'slug', 'order', 'is_active', 'created_at', 'updated_at']
+        fields = ['id', 'parent_category', 'translated_name', 'translated_description', 'image', 'image_variants', 'slug', 'order', 'is_active', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at', 'template_name']
     
     def get_translated_name(self, obj):
-        language = self.context.get('language', 'zh')
-        return translation_service.get_translated_text('subcategory', obj.id, 'name', language) or obj.name
+        return translated_text(self.context, 'subcategory', obj.id, 'name') or obj.name
     
     def get_translated_description(self, obj):
-        language = self.context.get('language', 'zh')
-        return translation_service.get_translated_text('subcategory', obj.id, 'description', language) or obj.description
+        return translated_text(self.context, 'subcategory', obj.id, 'description') or obj.description
 
 
 class CategoryWithSubcategoriesSerializer(serializers.ModelSerializer):
     """带子分类的分类序列化器"""
+    image_variants = ImageVariantsField(source='image')
     subcategories = SubCategorySerializer(many=True, read_only=True)
     
     class Meta:
         model = Category
-        fields = ['id', 'name', 'description', 'image', 'slug', 'order', 'is_active', 'subcategories', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'description', 'image', 'image_variants', 'slug', 'order', 'is_active', 'subcategories', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at', 'template_name']
 
 
 class TranslatedCategoryWithSubcategoriesSerializer(serializers.ModelSerializer):
     """翻译后的带子分类的分类序列化器"""
+    image_variants = ImageVariantsField(source='image')
     translated_name = serializers.SerializerMethodField()
     translated_description = serializers.SerializerMethodField()
     subcategories = TranslatedSubCategorySerializer(many=True, read_only=True)
     
     class Meta:
         model = Category
-        fields = ['id', 'translated_name', 'translated_description', 'image', 'slug', 'order', 'is_active', 'subcategories', 'created_at', 'updated_at']
+        fields = ['id', 'translated_name', 'translated_description', 'image', 'image_variants', 'slug', 'order', 'is_active', 'subcategories', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at', 'template_name']
     
     def get_translated_name(self, obj):
-        language = self.context.get('language', 'zh')
-        return translation_service.get_translated_text('category', obj.id, 'name', language) or obj.name
+        return translated_text(self.context, 'category', obj.id, 'name') or obj.name
     
     def get_translated_description(self, obj):
+        return translated_text(self.context, 'category', obj.id, 'description') or obj.description
+
+
+class FragmentField(serializers.Field):
+    """嵌套对象的预编码片段：同一对象在同一语言下只序列化、编码一次，渲染时直接拼接"""
+    
+    def __init__(self, serializer_class, namespaces, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+        self.serializer_class = serializer_class
+        self.namespaces = namespaces
+    
+    def to_representation(self, value):
+        request = self.context.get('request')
         language = self.context.get('language', 'zh')
-        return translation_service.get_translated_text('category', obj.id, 'description', language) or obj.description
+        origin = (request.scheme, request.get_host()) if request else None  # 片段中的图片地址是绝对地址
+        key = (self.serializer_class.__name__, value.pk, language, origin)
+        context = {
+            name: self.context[name] for name in ('request', 'language', 'translations') if name in self.context
+        }
+        return fragment_cache.get(key, self.namespaces, lambda: self.serializer_class(value, context=context).data)
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
     """产品图片序列化器"""
+    image_variants = ImageVariantsField(source='image')
     
     class Meta:
         model = ProductImage
-        fields = ['id', 'product', 'image', 'caption', 'is_primary', 'order', 'created_at']
+        fields = ['id', 'product', 'image', 'image_variants', 'caption', 'is_primary', 'order', 'created_at']
         read_only_fields = ['id', 'created_at']
 
 
@@ -123,20 +192,70 @@ class ProductFeatureSerializer(serializers.ModelSerializer):
 
 class ProductApplicationSerializer(serializers.ModelSerializer):
     """产品应用领域序列化器"""
+    image_variants = ImageVariantsField(source='image')
     
     class Meta:
         model = ProductApplication
-        fields = ['id', 'name', 'description', 'image', 'order', 'created_at']
+        fields = ['id', 'name', 'description', 'image', 'image_variants', 'order', 'created_at']
         read_only_fields = ['id', 'created_at']
 
 
-class ProductSerializer(serializers.ModelSerializer):
+def primary_image_url(product, request=None):
+    """产品主图URL（来自冗余字段 primary_image，不查询图片表）"""
+    if not product.primary_image:
+        return None
+    url = ProductImage._meta.get_field('image').storage.url(product.primary_image)
+    return request.build_absolute_uri(url) if request else url
+
+
+class SparseFieldsMixin:
+    """稀疏字段集 - context['fields'] 为需要输出的字段集合，为空时输出全部字段"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get('fields')
+        if requested:
+            for name in set(self.fields) - set(requested):
+                self.fields.pop(name)
+
+
+class ProductCardSerializer(serializers.ModelSerializer):
+    """产品卡片序列化器 - 列表卡片只需要名称、分类名称和一张图片（name 已按语言翻译）"""
+    name = serializers.SerializerMethodField()
+    category_name = serializers.SerializerMethodField()
+    image = serializers.SerializerMethodField()
+    image_variants = ImageVariantsField(source='primary_image')
+    
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'slug', 'category_id', 'category_name', 'subcategory_id', 'is_featured', 'image', 'image_variants']
+        read_only_fields = fields
+    
+    def get_name(self, obj):
+        language = self.context.get('language', 'zh')
+        if language == 'zh':
+            return obj.name
+        return translated_text(self.context, 'product', obj.id, 'name') or obj.name
+    
+    def get_category_name(self, obj):
+        language = self.context.get('language', 'zh')
+        if language == 'zh':
+            return obj.category.name
+        return translated_text(self.context, 'category', obj.category_id, 'name') or obj.category.name
+    
+    def get_image(self, obj):
+        return primary_image_url(obj, self.context.get('request'))
+
+
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """产品序列化器"""
-    category = CategorySerializer(read_only=True)
+    category = FragmentField(CategorySerializer, ['categories'])
     category_id = serializers.IntegerField(write_only=True)
-    subcategory = SubCategorySerializer(read_only=True)
+    subcategory = FragmentField(SubCategorySerializer, ['categories'])
     subcategory_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
     images = ProductImageSerializer(many=True, read_only=True)
+    primary_image = serializers.SerializerMethodField()
+    primary_image_variants = ImageVariantsField(source='primary_image')
     specification_items = ProductSpecificationSerializer(many=True, read_only=True)
     feature_items = ProductFeatureSerializer(many=True, read_only=True)
     application_items = ProductApplicationSerializer(many=True, read_only=True)
@@ -157,23 +276,28 @@ class ProductSerializer(serializers.ModelSerializer):
             'id', 'category', 'category_id', 'subcategory', 'subcategory_id', 'template', 'template_name', 'use_template',
             'name', 'description', 'features', 
             'applications', 'specifications', 'range_param', 'type_param', 'surface_treatment', 'colors', 'grade', 'temper',
-            'slug', 'is_featured', 'is_active', 'order', 'created_at', 'updated_at', 'images',
+            'slug', 'is_featured', 'is_active', 'order', 'created_at', 'updated_at', 'images', 'primary_image', 'primary_image_variants', 'image_count',
             'specification_items', 'feature_items', 'application_items'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'template_name']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'template_name', 'image_count']
+    
+    def get_primary_image(self, obj):
+        return primary_image_url(obj, self.context.get('request'))
 
 
-class TranslatedProductSerializer(serializers.ModelSerializer):
+class TranslatedProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """翻译后的产品序列化器"""
-    category = TranslatedCategorySerializer(read_only=True)
+    category = FragmentField(TranslatedCategorySerializer, ['categories', 'translations'])
     category_id = serializers.IntegerField(write_only=True)
-    subcategory = TranslatedSubCategorySerializer(read_only=True)
+    subcategory = FragmentField(TranslatedSubCategorySerializer, ['categories', 'translations'])
     subcategory_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
     translated_name = serializers.SerializerMethodField()
     translated_description = serializers.SerializerMethodField()
     translated_features = serializers.SerializerMethodField()
     translated_applications = serializers.SerializerMethodField()
     images = ProductImageSerializer(many=True, read_only=True)
+    primary_image = serializers.SerializerMethodField()
+    primary_image_variants = ImageVariantsField(source='primary_image')
     specification_items = ProductSpecificationSerializer(many=True, read_only=True)
     feature_items = ProductFeatureSerializer(many=True, read_only=True)
     application_items = ProductApplicationSerializer(many=True, read_only=True)
@@ -183,33 +307,32 @@ class TranslatedProductSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'category', 'category_id', 'subcategory', 'subcategory_id', 'translated_name', 'translated_description',
             'translated_features', 'translated_applications', 'specifications', 'range_param', 'type_param', 'surface_treatment', 'colors', 'grade', 'temper',
-            'slug', 'is_featured', 'is_active', 'order', 'created_at', 'updated_at', 'images',
+            'slug', 'is_featured', 'is_active', 'order', 'created_at', 'updated_at', 'images', 'primary_image', 'primary_image_variants', 'image_count',
             'specification_items', 'feature_items', 'application_items'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'template_name']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'template_name', 'image_count']
+    
+    def get_primary_image(self, obj):
+        return primary_image_url(obj, self.context.get('request'))
     
     def get_translated_name(self, obj):
-        language = self.context.get('language', 'zh')
-        return translation_service.get_translated_text('product', obj.id, 'name', language) or obj.name
+        return translated_text(self.context, 'product', obj.id, 'name') or obj.name
     
     def get_translated_description(self, obj):
-        language = self.context.get('language', 'zh')
-        return translation_service.get_translated_text('product', obj.id, 'description', language) or obj.description
+        return translated_text(self.context, 'product', obj.id, 'description') or obj.description
     
     def get_translated_features(self, obj):
-        language = self.context.get('language', 'zh')
-        return translation_service.get_translated_text('product', obj.id, 'features', language) or obj.features
+        return translated_text(self.context, 'product', obj.id, 'features') or obj.features
     
     def get_translated_applications(self, obj):
-        language = self.context.get('language', 'zh')
-        return translation_service.get_translated_text('product', obj.id, 'applications', language) or obj.applications
+        return translated_text(self.context, 'product', obj.id, 'applications') or obj.applications
 
 
 class ProductDetailSerializer(serializers.ModelSerializer):
     """产品详情序列化器 - 支持模板合并"""
-    category = CategorySerializer(read_only=True)
+    category = FragmentField(CategorySerializer, ['categories'])
     category_id = serializers.IntegerField(write_only=True)
-    subcategory = SubCategorySerializer(read_only=True)
+    subcategory = FragmentField(SubCategorySerializer, ['categories'])
     subcategory_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
     images = ProductImageSerializer(many=True, read_only=True)
     specification_items = ProductSpecificationSerializer(many=True, read_only=True)
@@ -233,23 +356,25 @@ class ProductDetailSerializer(serializers.ModelSerializer):
         # 先获取基本数据
         data = super().to_representation(instance)
         
-        # 获取匹配的模板
-        template = get_product_template(instance)
+        # 获取匹配的模板（批量序列化时使用上下文中的共享解析器）
+        resolve_template = self.context.get('resolve_template', get_product_template)
+        template = resolve_template(instance)
+        fallback_images = self.context.get('fallback_factory_images')
         
         # 合并模板数据
         if template:
-            data = merge_template_data(data, template)
+            data = merge_template_data(data, template, fallback_images)
         
-        data = ensure_factory_images(data, template)
+        data = ensure_factory_images(data, template, fallback_images)
         
         return data
 
 
 class TranslatedProductDetailSerializer(serializers.ModelSerializer):
     """翻译后的产品详情序列化器 - 支持模板合并"""
-    category = TranslatedCategorySerializer(read_only=True)
+    category = FragmentField(TranslatedCategorySerializer, ['categories', 'translations'])
     category_id = serializers.IntegerField(write_only=True)
-    subcategory = TranslatedSubCategorySerializer(read_only=True)
+    subcategory = FragmentField(TranslatedSubCategorySerializer, ['categories', 'translations'])
     subcategory_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
     translated_name = serializers.SerializerMethodField()
     translated_description = serializers.SerializerMethodField()
@@ -271,20 +396,16 @@ class TranslatedProductDetailSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at', 'template_name']
     
     def get_translated_name(self, obj):
-        language = self.context.get('language', 'zh')
-        return translation_service.get_translated_text('product', obj.id, 'name', language) or obj.name
+        return translated_text(self.context, 'product', obj.id, 'name') or obj.name
     
     def get_translated_description(self, obj):
-        language = self.context.get('language', 'zh')
-        return translation_service.get_translated_text('product', obj.id, 'description', language) or obj.description
+        return translated_text(self.context, 'product', obj.id, 'description') or obj.description
     
     def get_translated_features(self, obj):
-        language = self.context.get('language', 'zh')
-        return translation_service.get_translated_text('product', obj.id, 'features', language) or obj.features
+        return translated_text(self.context, 'product', obj.id, 'features') or obj.features
     
     def get_translated_applications(self, obj):
-        language = self.context.get('language', 'zh')
-        return translation_service.get_translated_text('product', obj.id, 'applications', language) or obj.applications
+        return translated_text(self.context, 'product', obj.id, 'applications') or obj.applications
     
     def to_representation(self, instance):
         """重写序列化方法，合并模板数据"""
@@ -303,13 +424,40 @@ class TranslatedProductDetailSerializer(serializers.ModelSerializer):
         if 'translated_name' in data:
             data['name'] = data.pop('translated_name')
         
-        # 获取匹配的模板
-        template = get_product_template(instance)
+        # 获取匹配的模板（批量序列化时使用上下文中的共享解析器）
+        resolve_template = self.context.get('resolve_template', get_product_template)
+        template = resolve_template(instance)
+        fallback_images = self.context.get('fallback_factory_images')
         
         # 合并模板数据
         if template:
-            data = merge_template_data(data, template)
+            data = merge_template_data(data, template, fallback_images)
         
-        data = ensure_factory_images(data, template)
+        data = ensure_factory_images(data, template, fallback_images)
         
-        return data
\ No newline at end of file
+        return data
+
+
+def build_detail_context(products, language):
+    """批量序列化产品详情的共享上下文
+
+    每个不同的模板只解析一次（模板区块和全局工厂图片来自片段缓存，见 template_serializers），
+    非中文时每类翻译文件只读取一次。products 需已 select_related 分类、子分类和模板。
+    """
+    from .template_serializers import build_template_resolver, global_factory_images
+    
+    resolver = build_template_resolver()
+    templates = {}
+    for product in products:
+        template = resolver(product)
+        if template:
+            templates[product.id] = template
+    
+    context = {
+        'language': language,
+        'resolve_template': lambda product: templates.get(product.id),
+        'fallback_factory_images': global_factory_images(),
+    }
+    if language != 'zh':
+        context['translations'] = translation_tables(language, ['product', 'category', 'subcategory'])
+    return context
@@ -3,10 +3,31 @@ import json
 import hashlib
 import time
 import os
+import threading
+from contextlib import contextmanager
 from django.conf import settings
 from django.core.cache import cache
 from pathlib import Path
 from deep_translator import GoogleTranslator
+from .caching import response_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows 上只在进程内加锁
+    fcntl = None
+
+
+# 模型 -> 需要翻译的字段，翻译文件中的键为 "字段_ID"
+TRANSLATABLE_FIELDS = {
+    'product': ['name', 'description', 'features', 'applications'],
+    'category': ['name', 'description'],
+    'subcategory': ['name', 'description'],
+    'article': ['title', 'content', 'excerpt'],
+    'contact_info': ['name', 'value'],
+    'company_info': ['value'],
+    'advantage': ['title', 'description'],
+    'certificate': ['name', 'description'],
+}
 
 
 class TranslationService:
@@ -15,6 +36,9 @@ class TranslationService:
     def __init__(self):
         self.cache_timeout = getattr(settings, 'TRANSLATION_CACHE_TIMEOUT', 3600)  # 1小时缓存
         self.translations_dir = getattr(settings, 'TRANSLATIONS_DIR', Path(settings.BASE_DIR) / 'translations')
+        self._file_cache = {}  # 翻译文件路径 -> ((修改时间, 大小), 内容)
+        self._file_lock = threading.Lock()
+        self._write_lock = threading.Lock()  # 翻译文件的读-改-写互斥（进程间另加文件锁）
         
         # 确保翻译文件目录存在
         os.makedirs(self.translations_dir, exist_ok=True)
@@ -55,15 +79,107 @@ class TranslationService:
             print(f"[DEBUG] 翻译文件不存在: {file_path}")
         return {}
     
+    def load_translations(self, model_name, language):
+        """读取翻译文件，按文件的修改时间和大小缓存在本进程中，文件未变化时不再读取
+
+        返回的字典由各调用方共享，只能读取不能修改。
+        """
+        file_path = self._get_translation_file_path(model_name, language)
+        try:
+            stat = file_path.stat()
+        except FileNotFoundError:
+            return {}
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._file_lock:
+            cached = self._file_cache.get(file_path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = json.load(f)
+        except Exception as e:
+            print(f"加载翻译文件失败: {e}")
+            return {}
+        with self._file_lock:
+            self._file_cache[file_path] = (signature, content)
+        return content
+    
+    def translation_signature(self, model_name, languages):
+        """一组翻译文件的 (修改时间, 大小)，用于判断进程内基于译文构建的索引是否需要重建"""
+        signature = []
+        for language in languages:
+            try:
+                stat = self._get_translation_file_path(model_name, language).stat()
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+    
+    def get_object_translations(self, model_name, obj_id, fields, languages):
+        """一个对象在各语言中的译文 {语言: {"字段_ID": 译文}}，只取该对象的键"""
+        result = {}
+        for language in languages:
+            translations = self.load_translations(model_name, language)
+            keys = (f"{field}_{obj_id}" for field in fields)
+            result[language] = {key: translations[key] for key in keys if translations.get(key)}
+        return result
+    
+    def _fields_to_translate(self, obj, model_name):
+        """对象需要翻译的原文 {"字段_ID": 原文}"""
+        return {f"{field}_{obj.id}": getattr(obj, field) for field in TRANSLATABLE_FIELDS.get(model_name, [])}
+    
+    @contextmanager
+    def _translation_file_lock(self, model_name, language):
+        """翻译文件的写入互斥：进程内线程锁 + 进程间文件锁（支持 fcntl 时）"""
+        with self._write_lock:
+            if fcntl is None:
+                yield
+                return
+            lock_dir = Path(self.translations_dir) / '.locks'
+            os.makedirs(lock_dir, exist_ok=True)
+            with open(lock_dir / f"{model_name}_{language}.lock", 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _update_translations(self, model_name, language, updates):
+        """把新译文合并进翻译文件并返回合并后的全部译文
+
+        翻译（调用API）在锁外进行，加锁后重新读取文件再合并写入，
+        同时进行的其他翻译（后台线程、其他进程）写入的键不会被覆盖丢失。
+        """
+        with self._translation_file_lock(model_name, language):
+            file_path = self._get_translation_file_path(model_name, language)
+            translations = {}
+            if file_path.exists():
+                try:
+                    with open(file_path, 'r', encoding='utf-8') as f:
+                        translations = json.load(f)
+                except Exception as e:
+                    print(f"加载翻译文件失败: {e}")
+                    return translations  # 不覆盖无法解析的文件
+            if updates:
+                translations.update(updates)
+                self._save_translations_to_file(model_name, language, translations)
+            return translations
+    
     def _save_translations_to_file(self, model_name, language, translations):
-        """保存翻译到文件"""
+        """保存翻译到文件（先写临时文件再替换，读取方不会读到写了一半的文件）"""
         file_path = self._get_translation_file_path(model_name, language)
+        temp_path = file_path.with_name(f"{file_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
+            with open(temp_path, 'w', encoding='utf-8') as f:
                 json.dump(translations, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, file_path)
+            # 翻译文件变更后，依赖翻译的响应缓存失效
+            response_cache.invalidate('translations')
             return True
         except Exception as e:
             print(f"保存翻译文件失败: {e}")
+            if temp_path.exists():
+                temp_path.unlink()
             return False
     
     def translate_text(self, text, target_lang='zh', source_lang='en'):
@@ -99,112 +215,58 @@ class TranslationService:
         if target_lang in ['en', 'en-US', 'en-GB']:
             return {}  # 英语不需要翻译
         
-        # 加载现有翻译
-        translations = self._load_translations_from_file(model_name, target_lang)
+        # 现有翻译，已翻译的键不再请求API
+        translations = self.load_translations(model_name, target_lang)
         
         # 收集需要翻译的文本
         texts_to_translate = {}
         for obj in objects:
-            # 根据模型类型收集需要翻译的字段
-            if model_name == 'product':
-                texts_to_translate[f"name_{obj.id}"] = obj.name
-                texts_to_translate[f"description_{obj.id}"] = obj.description
-                texts_to_translate[f"features_{obj.id}"] = obj.features
-                texts_to_translate[f"applications_{obj.id}"] = obj.applications
-            elif model_name == 'category':
-                texts_to_translate[f"name_{obj.id}"] = obj.name
-                texts_to_translate[f"description_{obj.id}"] = obj.description
-            elif model_name == 'subcategory':
-                texts_to_translate[f"name_{obj.id}"] = obj.name
-                texts_to_translate[f"description_{obj.id}"] = obj.description
-            elif model_name == 'article':
-                texts_to_translate[f"title_{obj.id}"] = obj.title
-                texts_to_translate[f"content_{obj.id}"] = obj.content
-                texts_to_translate[f"excerpt_{obj.id}"] = obj.excerpt
-            elif model_name == 'contact_info':
-                texts_to_translate[f"name_{obj.id}"] = obj.name
-                texts_to_translate[f"value_{obj.id}"] = obj.value
-            elif model_name == 'company_info':
-                texts_to_translate[f"value_{obj.id}"] = obj.value
-            elif model_name == 'advantage':
-                texts_to_translate[f"title_{obj.id}"] = obj.title
-                texts_to_translate[f"description_{obj.id}"] = obj.description
-            elif model_name == 'certificate':
-                texts_to_translate[f"name_{obj.id}"] = obj.name
-                texts_to_translate[f"description_{obj.id}"] = obj.description
+            texts_to_translate.update(self._fields_to_translate(obj, model_name))
         
         # 批量翻译
-        translated_count = 0
+        updates = {}
         for key, text in texts_to_translate.items():
             if force or key not in translations:
-                translated_text = self.translate_text(text, target_lang)
-                translations[key] = translated_text
-                translated_count += 1
+                updates[key] = self.translate_text(text, target_lang)
                 # 添加延迟避免API限制
                 time.sleep(0.2)
         
-        # 保存到文件
-        if translated_count > 0:
-            self._save_translations_to_file(model_name, target_lang, translations)
+        # 合并保存到文件
+        if updates:
+            return self._update_translations(model_name, target_lang, updates)
         
-        return translations
+        return dict(translations)
     
     def translate_single_object(self, model_name, obj, target_lang='zh'):
         """翻译单个对象"""
         if target_lang in ['en', 'en-US', 'en-GB']:
             return {}  # 英语不需要翻译
         
-        # 加载现有翻译
-        translations = self._load_translations_from_file(model_name, target_lang)
-        
-        # 收集需要翻译的文本
-        texts_to_translate = {}
-        if model_name == 'product':
-            texts_to_translate[f"name_{obj.id}"] = obj.name
-            texts_to_translate[f"description_{obj.id}"] = obj.description
-            texts_to_translate[f"features_{obj.id}"] = obj.features
-            texts_to_translate[f"applications_{obj.id}"] = obj.applications
-        elif model_name == 'category':
-            texts_to_translate[f"name_{obj.id}"] = obj.name
-            texts_to_translate[f"description_{obj.id}"] = obj.description
-        elif model_name == 'subcategory':
-            texts_to_translate[f"name_{obj.id}"] = obj.name
-            texts_to_translate[f"description_{obj.id}"] = obj.description
-        elif model_name == 'article':
-            texts_to_translate[f"title_{obj.id}"] = obj.title
-            texts_to_translate[f"content_{obj.id}"] = obj.content
-            texts_to_translate[f"excerpt_{obj.id}"] = obj.excerpt
-        elif model_name == 'contact_info':
-            texts_to_translate[f"name_{obj.id}"] = obj.name
-            texts_to_translate[f"value_{obj.id}"] = obj.value
-        elif model_name == 'company_info':
-            texts_to_translate[f"value_{obj.id}"] = obj.value
-        elif model_name == 'advantage':
-            texts_to_translate[f"title_{obj.id}"] = obj.title
-            texts_to_translate[f"description_{obj.id}"] = obj.description
-        elif model_name == 'certificate':
-            texts_to_translate[f"name_{obj.id}"] = obj.name
-            texts_to_translate[f"description_{obj.id}"] = obj.description
-        
         # 翻译
-        for key, text in texts_to_translate.items():
-            translated_text = self.translate_text(text, target_lang)
-            translations[key] = translated_text
+        updates = {}
+        for key, text in self._fields_to_translate(obj, model_name).items():
+            updates[key] = self.translate_text(text, target_lang)
             time.sleep(0.2)  # 延迟避免API限制
         
-        # 保存到文件
-        self._save_translations_to_file(model_name, target_lang, translations)
-        return translations
+        # 合并保存到文件
+        return self._update_translations(model_name, target_lang, updates)
     
     def get_translated_text(self, model_name, obj_id, field_name, target_lang='zh'):
         """从文件获取翻译文本"""
         if target_lang in ['en', 'en-US', 'en-GB']:
             return None  # 英语返回None，使用原文
         
-        translations = self._load_translations_from_file(model_name, target_lang)
+        translations = self.load_translations(model_name, target_lang)
         key = f"{field_name}_{obj_id}"
         return translations.get(key)
     
+    def get_translations(self, model_name, target_lang='zh'):
+        """一次读取某类对象的全部翻译 {"字段_ID": 译文}，供批量序列化查表使用"""
+        if target_lang in ['en', 'en-US', 'en-GB']:
+            return {}  # 英语使用原文
+        
+        return self.load_translations(model_name, target_lang)
+    
     def translate_product(self, product, target_lang='zh'):
         """翻译产品信息"""
         if target_lang == 'en':
@@ -294,6 +356,24 @@ class TranslationService:
             except Exception as e:
                 print(f"自动翻译失败: {model_name} ID {instance.id} -> {lang}, 错误: {e}")
     
+    def auto_translate_batch(self, objects, model_name):
+        """批量保存后自动翻译：每种语言只读写一次翻译文件，已缓存的文本不再等待API限速"""
+        supported_languages = ['zh', 'es', 'pt', 'fr', 'de', 'it', 'ru', 'hi']
+        
+        for lang in supported_languages:
+            try:
+                updates = {}
+                for obj in objects:
+                    for key, text in self._fields_to_translate(obj, model_name).items():
+                        cached = bool(text) and self._get_from_cache(text, lang)
+                        updates[key] = self.translate_text(text, lang)
+                        if text and not cached:
+                            time.sleep(0.2)  # 延迟避免API限制
+                self._update_translations(model_name, lang, updates)
+                print(f"批量自动翻译完成: {model_name} {len(objects)} 个 -> {lang}")
+            except Exception as e:
+                print(f"批量自动翻译失败: {model_name} -> {lang}, 错误: {e}")
+    
     def get_translation_status(self, model_name, obj_id, target_lang='zh'):
         """获取翻译状态"""
         if target_lang in ['en', 'en-US', 'en-GB']:
@@ -302,23 +382,7 @@ class TranslationService:
         translations = self._load_translations_from_file(model_name, target_lang)
         
         # 检查所有字段是否已翻译
-        fields_to_check = []
-        if model_name == 'product':
-            fields_to_check = ['name', 'description', 'features', 'applications']
-        elif model_name == 'category':
-            fields_to_check = ['name', 'description']
-        elif model_name == 'subcategory':
-            fields_to_check = ['name', 'description']
-        elif model_name == 'article':
-            fields_to_check = ['title', 'content', 'excerpt']
-        elif model_name == 'contact_info':
-            fields_to_check = ['name', 'value']
-        elif model_name == 'company_info':
-            fields_to_check = ['value']
-        elif model_name == 'advantage':
-            fields_to_check = ['title', 'description']
-        elif model_name == 'certificate':
-            fields_to_check = ['name', 'description']
+        fields_to_check = TRANSLATABLE_FIELDS.get(model_name, [])
         
         translated_fields = []
         missing_fields = []
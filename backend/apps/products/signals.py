@@ -1,12 +1,32 @@
-from django.db.models.signals import post_save
+import threading
+
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
 from django.dispatch import receiver
-from .models import Product, Category
+from .models import (
+    Product, Category, SubCategory, ProductImage, ProductSpecification, ProductFeature, ProductApplication,
+    ProductTemplate, TemplateSpecification, TemplateFeature, TemplateApplication, TemplateFactoryImage, TemplateProcess,
+    RelatedProduct
+)
+from apps.about.models import FactoryImage, FriendLink
 from .services import translation_service
+from .caching import response_cache
+from .search import product_search_index
+from .suggest import suggest_index
+from .facets import facet_index
+from .spec_ranges import refresh_spec_values, refresh_template_spec_values
+from .related import update_related, rebuild_related
+from . import events
+from .events import products_changed, templates_changed
+from .image_variants import IMAGE_FIELDS, get_variants, generate_variants_in_background, delete_variants
 
 
 @receiver(post_save, sender=Product)
 def auto_translate_product(sender, instance, created, **kwargs):
-    """产品保存时自动翻译"""
+    """产品保存时自动翻译（批量写入时由 products_changed 统一处理，下同）"""
+    if events.record([instance.id], created=created):
+        return
     if created or instance.is_active:  # 新创建或激活的产品
         try:
             translation_service.auto_translate_on_save(instance, 'product')
@@ -21,4 +41,320 @@ def auto_translate_category(sender, instance, created, **kwargs):
         try:
             translation_service.auto_translate_on_save(instance, 'category')
         except Exception as e:
-            print(f"分类自动翻译失败 ID {instance.id}: {e}") 
\ No newline at end of file
+            print(f"分类自动翻译失败 ID {instance.id}: {e}")
+
+
+# 产品及其规格、特性、图片、应用逐条保存时（如后台产品页的内联），同一事务中的变更合并到事务提交后处理一次：
+# 先更新规格数值、搜索索引等派生数据，再使产品缓存失效（侧表需先于缓存失效写入，其他worker看到新版本号时
+# 重建的范围索引才包含本次变更），最后增量更新本进程的分面和联想索引。不在事务中时立即处理。
+_pending = threading.local()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductSpecification)
+@receiver(post_delete, sender=ProductSpecification)
+@receiver(post_save, sender=ProductFeature)
+@receiver(post_delete, sender=ProductFeature)
+def update_product_data_on_commit(sender, instance, **kwargs):
+    """产品或产品规格/特性变更后，在事务提交后更新所属产品的派生数据（在自动翻译之后执行，以便收录最新翻译）"""
+    product_id = instance.id if sender is Product else instance.product_id
+    deleted = sender is Product and kwargs.get('signal') is post_delete
+    referrer_ids = getattr(instance, '_related_referrers', ())
+    if events.record([product_id], deleted=deleted, referrer_ids=referrer_ids):
+        return
+    schedule_product_changes([product_id], deleted=deleted, referrer_ids=referrer_ids)
+
+
+def schedule_product_changes(product_ids=(), deleted=False, referrer_ids=()):
+    """记录产品变更，事务提交后统一处理；product_ids 为空时只在提交后使产品缓存失效"""
+    connection = transaction.get_connection()
+    scheduled = getattr(_pending, 'changes', None) is not None \
+        and any(func is process_product_changes for _, func, _ in connection.run_on_commit)
+    if not scheduled:
+        _pending.changes = events.ProductBatch()  # 之前安排的处理已执行，或随事务回滚被丢弃
+    _pending.changes.record(product_ids, deleted=deleted, referrer_ids=referrer_ids)
+    if not scheduled:
+        transaction.on_commit(process_product_changes)
+
+
+def process_product_changes():
+    changes, _pending.changes = _pending.changes, None
+    product_ids = sorted(changes.product_ids)
+    update_product_data(product_ids, sorted(changes.referrer_ids - changes.deleted_ids))
+
+    # 本进程的分面和联想索引在缓存失效之后增量更新，以便记录最新的命名空间版本
+    products = Product.objects.in_bulk(product_ids) if product_ids else {}
+    for product_id in product_ids:
+        deleted = product_id not in products
+        product = Product(id=product_id) if deleted else products[product_id]
+        try:
+            facet_index.update_product(product, deleted=deleted)
+            suggest_index.update_object('product', product, deleted=deleted)
+        except Exception as e:
+            print(f"本进程产品索引更新失败 ID {product_id}: {e}")
+
+
+def update_product_data(product_ids, referrer_ids=()):
+    """更新产品的派生数据（规格数值、相关产品、搜索索引，已删除的产品从中移除），再使产品缓存失效
+
+    referrer_ids 为把已删除产品列为相关产品的产品（删除前由 remember_related_referrers 记录）。
+    """
+    updates = [
+        ('产品规格数值', lambda: refresh_spec_values(product_ids)),
+        ('相关产品', lambda: (
+            rebuild_related() if len(product_ids) > RELATED_REBUILD_THRESHOLD
+            else update_related(product_ids, referrer_ids=referrer_ids)
+        )),
+        ('产品搜索索引', lambda: product_search_index.index_product_ids(product_ids)),
+    ]
+    for name, update in updates if product_ids else ():
+        try:
+            update()
+        except Exception as e:
+            print(f"{name}更新失败 ({len(product_ids)} 个产品): {e}")
+    response_cache.invalidate('products')
+
+
+@receiver(post_save, sender=ProductTemplate)
+def update_template_search_index(sender, instance, **kwargs):
+    """模板变更后更新使用该模板的产品的搜索索引（批量写入时由 templates_changed 统一处理，下同）"""
+    if events.record_templates([instance.id]):
+        return
+    try:
+        product_search_index.index_template_products(instance)
+    except Exception as e:
+        print(f"模板产品搜索索引更新失败 ID {instance.id}: {e}")
+
+
+@receiver(post_save, sender=TemplateSpecification)
+@receiver(post_delete, sender=TemplateSpecification)
+def update_template_spec_search_index(sender, instance, **kwargs):
+    """模板规格变更后更新继承这些规格的产品的搜索索引"""
+    if events.record_templates([instance.template_id]):
+        return
+    try:
+        template = ProductTemplate.objects.filter(id=instance.template_id).first()
+        if template:
+            product_search_index.index_template_products(template)
+    except Exception as e:
+        print(f"模板产品搜索索引更新失败 ID {instance.template_id}: {e}")
+
+
+@receiver(post_save, sender=ProductTemplate)
+@receiver(post_delete, sender=ProductTemplate)
+@receiver(post_save, sender=TemplateSpecification)
+@receiver(post_delete, sender=TemplateSpecification)
+def update_template_spec_values(sender, instance, **kwargs):
+    """模板或模板规格变更后重新解析继承该模板的产品的规格数值"""
+    template_id = instance.id if sender is ProductTemplate else instance.template_id
+    if events.record_templates([template_id]):
+        return
+    try:
+        refresh_template_spec_values(template_id)
+    except Exception as e:
+        print(f"模板规格数值更新失败 ID {template_id}: {e}")
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def update_product_image_summary(sender, instance, **kwargs):
+    """产品图片变更后更新产品的主图和图片数量冗余字段"""
+    product = Product.objects.filter(id=instance.product_id).first()
+    if product is None:
+        return  # 产品已被删除（级联删除图片）
+    try:
+        product.refresh_image_summary()
+    except Exception as e:
+        print(f"产品图片汇总更新失败 ID {instance.product_id}: {e}")
+
+
+@receiver(pre_delete, sender=Product)
+def remember_related_referrers(sender, instance, **kwargs):
+    """产品删除前记录把它列为相关产品的产品（删除后这些记录会被级联删除）"""
+    instance._related_referrers = list(
+        RelatedProduct.objects.filter(related_id=instance.id).values_list('product_id', flat=True)
+    )
+    events.record([instance.id], deleted=True, referrer_ids=instance._related_referrers)
+
+
+@receiver(post_save, sender=ProductTemplate)
+@receiver(post_delete, sender=ProductTemplate)
+@receiver(post_save, sender=TemplateSpecification)
+@receiver(post_delete, sender=TemplateSpecification)
+def rebuild_related_products(sender, instance, **kwargs):
+    """模板或模板规格变更影响大量产品的相似度，事务提交后全量重算一次相关产品
+
+    后台保存模板及其规格内联在同一事务中，只在提交后重算一次；批次中由 templates_changed 统一处理。
+    """
+    if events.record_templates([instance.id if sender is ProductTemplate else instance.template_id]):
+        return
+    connection = transaction.get_connection()
+    if any(func is rebuild_related_after_commit for _, func, _ in connection.run_on_commit):
+        return  # 本事务中已安排
+    transaction.on_commit(rebuild_related_after_commit)
+
+
+def rebuild_related_after_commit():
+    try:
+        rebuild_related()
+    except Exception as e:
+        print(f"相关产品重建失败: {e}")
+
+
+# 模型 -> 依赖它的响应缓存命名空间（产品及其关联对象的变更在事务提交后统一失效，见 schedule_product_changes）
+PRODUCT_MODELS = [Product, ProductImage, ProductSpecification, ProductFeature, ProductApplication]
+CACHE_NAMESPACES = {
+    Product: ['products'],
+    ProductImage: ['products'],
+    ProductSpecification: ['products'],
+    ProductFeature: ['products'],
+    ProductApplication: ['products'],
+    Category: ['categories'],
+    SubCategory: ['categories'],
+    ProductTemplate: ['templates'],
+    TemplateSpecification: ['templates'],
+    TemplateFeature: ['templates'],
+    TemplateApplication: ['templates'],
+    TemplateFactoryImage: ['templates'],
+    TemplateProcess: ['templates'],
+    FactoryImage: ['factory_images'],
+    FriendLink: ['friend_links'],
+}
+
+
+def invalidate_response_cache(sender, **kwargs):
+    """数据变更时使相关响应缓存失效（旧副本仍可在重建期间提供）"""
+    if sender in PRODUCT_MODELS:
+        schedule_product_changes()
+        return
+    response_cache.invalidate(*CACHE_NAMESPACES[sender])
+
+
+for _model in CACHE_NAMESPACES:
+    post_save.connect(invalidate_response_cache, sender=_model, dispatch_uid=f'apicache_save_{_model.__name__}')
+    post_delete.connect(invalidate_response_cache, sender=_model, dispatch_uid=f'apicache_delete_{_model.__name__}')
+
+
+def schedule_image_variants(sender, instance, raw=False, **kwargs):
+    """图片保存后（事务提交后）在进程池中生成响应式版本，已生成过的图片跳过"""
+    if raw:
+        return
+    image = getattr(instance, IMAGE_FIELDS[sender._meta.label])
+    if not image or get_variants(image.name) is not None:
+        return
+    name, namespaces = image.name, CACHE_NAMESPACES.get(sender, [])
+    transaction.on_commit(lambda: generate_variants_in_background(name, namespaces))
+
+
+def remember_replaced_image(sender, instance, raw=False, **kwargs):
+    """记录被替换的原图路径，保存后清理其版本"""
+    if raw or instance.pk is None:
+        return
+    field = IMAGE_FIELDS[sender._meta.label]
+    previous = sender._default_manager.filter(pk=instance.pk).values_list(field, flat=True).first()
+    if previous and previous != getattr(instance, field).name:
+        instance._replaced_image = previous
+
+
+def cleanup_image_variants(sender, instance, **kwargs):
+    """原图被替换或删除后（事务提交后）清理不再被引用的版本文件和 ImageAsset 记录"""
+    if kwargs.get('signal') is post_delete:
+        name = getattr(instance, IMAGE_FIELDS[sender._meta.label]).name
+    else:
+        name = instance.__dict__.pop('_replaced_image', None)
+    if not name:
+        return
+
+    def cleanup():
+        try:
+            delete_variants(name)
+        except Exception as e:
+            print(f"图片版本清理失败 {name}: {e}")
+
+    transaction.on_commit(cleanup)
+
+
+for _label in IMAGE_FIELDS:
+    post_save.connect(schedule_image_variants, sender=_label, dispatch_uid=f'image_variants_{_label}')
+    pre_save.connect(remember_replaced_image, sender=_label, dispatch_uid=f'image_variants_replaced_{_label}')
+    post_save.connect(cleanup_image_variants, sender=_label, dispatch_uid=f'image_variants_cleanup_save_{_label}')
+    post_delete.connect(cleanup_image_variants, sender=_label, dispatch_uid=f'image_variants_cleanup_delete_{_label}')
+
+
+# 输入联想索引的增量更新需在缓存失效之后执行，以便记录最新的命名空间版本（产品见 process_product_changes）
+SUGGEST_KINDS = {Category: 'category', SubCategory: 'subcategory'}
+
+
+def update_suggest_index(sender, instance, **kwargs):
+    """分类/子分类变更后增量更新本进程的输入联想索引"""
+    try:
+        suggest_index.update_object(SUGGEST_KINDS[sender], instance, deleted=kwargs.get('signal') is post_delete)
+    except Exception as e:
+        print(f"输入联想索引更新失败 {sender.__name__} ID {instance.id}: {e}")
+
+
+for _model in SUGGEST_KINDS:
+    post_save.connect(update_suggest_index, sender=_model, dispatch_uid=f'suggest_save_{_model.__name__}')
+    post_delete.connect(update_suggest_index, sender=_model, dispatch_uid=f'suggest_delete_{_model.__name__}')
+
+
+# 一次变更的产品数超过该值时，全量重算相关产品比逐个增量合并更快
+RELATED_REBUILD_THRESHOLD = 1000
+
+
+# 正在运行的后台翻译线程（管理命令退出前需等待，否则守护线程会随进程结束）
+_translation_threads = []
+
+
+def wait_for_background_translations():
+    """等待所有后台翻译线程结束"""
+    while _translation_threads:
+        _translation_threads.pop().join()
+
+
+def translate_products_in_background(product_ids):
+    """后台线程中批量翻译产品，完成后更新搜索索引以收录译文"""
+    try:
+        products = list(Product.objects.filter(id__in=product_ids))
+        translation_service.auto_translate_batch(products, 'product')
+        product_search_index.index_product_ids(product_ids)
+    except Exception as e:
+        print(f"产品批量翻译失败: {e}")
+    finally:
+        close_old_connections()
+
+
+@receiver(products_changed)
+def handle_products_changed(sender, product_ids, created_ids, deleted_ids, referrer_ids, **kwargs):
+    """批量写入结束后统一更新派生数据，再使产品缓存失效（侧表需先于缓存失效写入）"""
+    update_product_data(product_ids, referrer_ids)
+
+    # 与逐个保存时一致：新创建或激活的产品需要翻译，翻译耗时较长，放到后台线程
+    created = set(created_ids)
+    translate_ids = list(
+        Product.objects.filter(id__in=product_ids).filter(Q(is_active=True) | Q(id__in=created))
+        .values_list('id', flat=True)
+    )
+    if translate_ids:
+        thread = threading.Thread(target=translate_products_in_background, args=(translate_ids,), daemon=True)
+        thread.start()
+        _translation_threads[:] = [t for t in _translation_threads if t.is_alive()] + [thread]
+
+
+@receiver(templates_changed)
+def handle_templates_changed(sender, template_ids, **kwargs):
+    """批量写入结束后统一更新受模板影响的产品，再使模板缓存失效"""
+    for template_id in template_ids:
+        try:
+            refresh_template_spec_values(template_id)
+            template = ProductTemplate.objects.filter(id=template_id).first()
+            if template:
+                product_search_index.index_template_products(template)
+        except Exception as e:
+            print(f"模板产品批量更新失败 ID {template_id}: {e}")
+    try:
+        rebuild_related()
+    except Exception as e:
+        print(f"相关产品重建失败: {e}")
+    response_cache.invalidate('templates')
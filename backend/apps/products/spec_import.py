@@ -0,0 +1,157 @@
+"""
+模板规格Excel导入 - 只读模式流式解析，批量写入
+
+表格第一行为标题行，从第二行开始 A列 = 规格名称、B列 = 规格值。工作簿以只读模式逐行读取，
+不把整个文件加载为单元格对象；解析时校验每一行，任一行有误时不写入（预览中列出错误）。
+
+导入方式：
+- append：全部追加到现有规格末尾（原有行为）
+- merge：按名称合并，同名规格更新值，新名称追加到末尾
+- replace：按名称替换，同名规格更新值和顺序，表格中没有的规格删除，结果与表格完全一致
+
+写入在一个事务中按分块 bulk_create / bulk_update；写入在 events.batch() 中进行，
+模板相关的索引、规格数值和相关产品在导入结束后只更新一次。
+"""
+import openpyxl
+from django.db import transaction
+
+from . import events
+from .models import TemplateSpecification
+
+
+IMPORT_MODES = {
+    'append': '追加到末尾',
+    'merge': '按名称合并（同名更新，新名称追加）',
+    'replace': '按名称替换（与表格完全一致）',
+}
+SPEC_IMPORT_CHUNK_SIZE = 1000   # 每次 bulk_create / bulk_update 写入的行数
+SPEC_IMPORT_MAX_ROWS = 50000    # 单个表格的数据行上限
+PREVIEW_LIMIT = 50              # 预览中每类变更最多列出的行数
+
+NAME_MAX_LENGTH = TemplateSpecification._meta.get_field('name').max_length
+
+
+def _cell_text(value):
+    return str(value).strip() if value is not None else ''
+
+
+def read_spec_rows(file):
+    """流式读取Excel，逐行产出 (行号, 规格名称, 规格值)，跳过标题行和空行"""
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        sheet.reset_dimensions()  # 部分工具生成的文件记录的表格范围不准确，按实际行读取
+        for row_num, row in enumerate(sheet.iter_rows(min_row=2, max_col=2, values_only=True), start=2):
+            name = _cell_text(row[0]) if len(row) > 0 else ''
+            value = _cell_text(row[1]) if len(row) > 1 else ''
+            if name or value:
+                yield row_num, name, value
+    finally:
+        workbook.close()
+
+
+class SpecImportPlan:
+    """导入计划：与模板现有规格对比得到的新增/更新/删除，以及校验错误"""
+
+    def __init__(self, template, mode):
+        self.template = template
+        self.mode = mode
+        self.total = 0
+        self.errors = []      # [(行号, 错误信息)]
+        self.creates = []     # 待创建的 TemplateSpecification
+        self.updates = []     # 待更新的 TemplateSpecification
+        self.delete_ids = []
+        self.unchanged = 0
+        # 预览用的示例行：[(名称, 原值, 新值)]
+        self.samples = {'created': [], 'updated': [], 'deleted': []}
+
+    @property
+    def has_changes(self):
+        return bool(self.creates or self.updates or self.delete_ids)
+
+    def _sample(self, kind, name, old_value, new_value):
+        if len(self.samples[kind]) < PREVIEW_LIMIT:
+            self.samples[kind].append((name, old_value, new_value))
+
+    def summary(self):
+        return (
+            f'新增 {len(self.creates)} 条，更新 {len(self.updates)} 条，'
+            f'删除 {len(self.delete_ids)} 条，未变化 {self.unchanged} 条'
+        )
+
+
+def plan_spec_import(template, rows, mode='append'):
+    """对比表格行与模板现有规格，生成导入计划（不写入数据库）"""
+    if mode not in IMPORT_MODES:
+        raise ValueError(f'不支持的导入方式: {mode}')
+    plan = SpecImportPlan(template, mode)
+
+    existing = list(template.specification_items.order_by('order', 'created_at'))
+    by_name = {}
+    for spec in existing:
+        by_name.setdefault(spec.name, spec)
+    next_order = max((spec.order for spec in existing), default=-1) + 1
+
+    seen = {}  # 名称 -> 首次出现的行号
+    for row_num, name, value in rows:
+        plan.total += 1
+        if plan.total > SPEC_IMPORT_MAX_ROWS:
+            plan.errors.append((row_num, f'数据行超过上限 {SPEC_IMPORT_MAX_ROWS}，请拆分表格'))
+            break
+        if not name or not value:
+            plan.errors.append((row_num, '规格名称和规格值都不能为空'))
+            continue
+        if len(name) > NAME_MAX_LENGTH:
+            plan.errors.append((row_num, f'规格名称超过 {NAME_MAX_LENGTH} 个字符'))
+            continue
+        if mode != 'append':
+            if name in seen:
+                plan.errors.append((row_num, f'规格名称"{name}"与第 {seen[name]} 行重复'))
+                continue
+            seen[name] = row_num
+
+        current = by_name.get(name) if mode != 'append' else None
+        if current is None:
+            order = plan.total - 1 if mode == 'replace' else next_order
+            next_order += 1
+            plan.creates.append(TemplateSpecification(template=template, name=name, value=value, order=order))
+            plan._sample('created', name, '', value)
+            continue
+
+        order = plan.total - 1 if mode == 'replace' else current.order
+        if current.value == value and current.order == order:
+            plan.unchanged += 1
+            continue
+        if current.value != value:
+            plan._sample('updated', name, current.value, value)
+        current.value = value
+        current.order = order
+        plan.updates.append(current)
+
+    if mode == 'replace' and not plan.errors:
+        for spec in existing:
+            if seen.get(spec.name) is None or by_name[spec.name] is not spec:
+                plan.delete_ids.append(spec.id)
+                plan._sample('deleted', spec.name, spec.value, '')
+    return plan
+
+
+def _chunks(objects, size):
+    for start in range(0, len(objects), size):
+        yield objects[start:start + size]
+
+
+def apply_spec_import(plan, chunk_size=SPEC_IMPORT_CHUNK_SIZE):
+    """执行导入计划（计划中有错误时不写入），返回写入的行数"""
+    if plan.errors or not plan.has_changes:
+        return 0
+    with events.batch():
+        with transaction.atomic():
+            for ids in _chunks(plan.delete_ids, chunk_size):
+                TemplateSpecification.objects.filter(id__in=ids).delete()
+            for chunk in _chunks(plan.updates, chunk_size):
+                TemplateSpecification.objects.bulk_update(chunk, ['value', 'order'])
+            for chunk in _chunks(plan.creates, chunk_size):
+                TemplateSpecification.objects.bulk_create(chunk)
+        events.record_templates([plan.template.id])
+    return len(plan.creates) + len(plan.updates) + len(plan.delete_ids)
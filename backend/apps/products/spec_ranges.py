@@ -0,0 +1,399 @@
+"""
+产品规格数值范围索引
+
+规格值是自由文本（"1.2-2.0mm"、"≥160 MPa"、"6m"），这里将其解析为 (下限, 上限, 单位) 数值区间，
+写入 ProductSpecValue 侧表；长度统一换算为毫米、强度统一为MPa，便于跨写法比较。
+每个worker进程内按规格键维护按下限、上限分别排序的区间数组，范围筛选用二分查找定位候选，
+不需要对规格文本做 LIKE 查询。
+
+产品没有自己的规格时继承模板规格（与详情页合并逻辑一致），侧表中记录来源模板，
+模板或模板规格变更时据此刷新受影响的产品。
+"""
+import bisect
+import re
+import threading
+
+from django.apps import apps as global_apps
+from django.db import transaction
+
+from .caching import response_cache
+from .models import Product, ProductSpecValue, ProductTemplate
+from .template_serializers import build_template_resolver, template_products_condition
+
+
+# 索引依赖的数据命名空间，侧表在缓存失效之前写入，版本号变化后全量重建即可拿到最新数据
+SPEC_RANGE_NAMESPACES = ['products', 'templates']
+
+# 单位别名 -> (规范单位, 换算系数)
+UNIT_ALIASES = {
+    'mm': ('mm', 1.0),
+    '毫米': ('mm', 1.0),
+    'cm': ('mm', 10.0),
+    '厘米': ('mm', 10.0),
+    'm': ('mm', 1000.0),
+    '米': ('mm', 1000.0),
+    'μm': ('mm', 0.001),
+    'µm': ('mm', 0.001),
+    'um': ('mm', 0.001),
+    '微米': ('mm', 0.001),
+    'mpa': ('MPa', 1.0),
+    'n/mm2': ('MPa', 1.0),
+    'n/mm²': ('MPa', 1.0),
+    'gpa': ('MPa', 1000.0),
+    'kg/m': ('kg/m', 1.0),
+    'g/m': ('kg/m', 0.001),
+    'kg': ('kg', 1.0),
+    't': ('kg', 1000.0),
+    '吨': ('kg', 1000.0),
+    '%': ('%', 1.0),
+    '℃': ('°C', 1.0),
+    '°c': ('°C', 1.0),
+    'hb': ('HB', 1.0),
+    'hv': ('HV', 1.0),
+    'hw': ('HW', 1.0),
+}
+
+# 数值可带正负号（"-5~40℃"）和千位分隔符（"1,200 mm"）；千位分隔符只在每组恰好三位时识别
+NUMBER = r'[-+−]?(?:\d{1,3}(?:,\d{3})+(?!\d)|\d+)(?:\.\d+)?'
+# 较长的单位放在前面，单独的 m/t 后面不能紧跟字母（避免匹配 min、max、T5 等）
+UNIT = r'(?:n/mm2|n/mm²|kg/m|g/m|mpa|gpa|mm|cm|μm|µm|um|kg|hb|hv|hw|毫米|厘米|微米|米|吨|℃|°c|%|m(?![a-z])|t(?![a-z0-9]))'
+
+# 牌号-状态代号（6063-T5、5052 H32）是型号而不是数值，整体跳过；
+# 数字前不能紧跟字母，状态代号（T5）中的数字同样不是数值
+GRADE_TEMPER = r'\d{4}\s*-?\s*[fohtw]\d'
+
+VALUE_RE = re.compile(
+    rf'''
+    (?P<cmp>≥|>=|≧|>|≤|<=|≦|<|不小于|不低于|大于等于|不大于|不超过|小于等于|min(?:imum)?\.?|max(?:imum)?\.?)?\s*
+    (?<![a-z0-9.])(?!{GRADE_TEMPER})(?P<low>{NUMBER})\s*(?P<unit1>{UNIT})?
+    (?:
+        \s*(?:-|~|～|–|—|\bto\b|至|到)\s*(?P<high>{NUMBER})\s*(?P<unit2>{UNIT})?
+      | \s*±\s*(?P<tolerance>{NUMBER})\s*(?P<unit3>{UNIT})?
+    )?
+    (?:\s*(?P<suffix>min|max)\b)?
+    ''',
+    re.IGNORECASE | re.VERBOSE
+)
+
+LOWER_BOUND_WORDS = {'≥', '>=', '≧', '>', '不小于', '不低于', '大于等于', 'min', 'min.', 'minimum', 'minimum.'}
+
+# 数值列表的分隔符（"10, 20, 30 mm" 中末尾的单位适用于列表中的每个数值）
+LIST_SEPARATOR_RE = re.compile(r'\s*(?:[,，、/;；]|\band\b|\bor\b|和|或)\s*', re.IGNORECASE)
+
+# 规格名称末尾括号中的单位，如 "Wall Thickness (mm)"
+NAME_UNIT_RE = re.compile(r'\s*[(（]\s*([^()（）]*?)\s*[)）]\s*$')
+
+
+def _to_float(number):
+    return float(number.replace(',', '').replace('−', '-'))
+
+
+def normalize_unit(unit):
+    """返回 (规范单位, 换算系数)，未知单位原样保留"""
+    if not unit:
+        return '', 1.0
+    key = unit.strip().lower()
+    return UNIT_ALIASES.get(key, (key, 1.0))
+
+
+def normalize_spec_name(name):
+    """规范化规格名称，返回 (规格键, 名称中声明的单位)"""
+    name = (name or '').strip().rstrip(':：').strip()
+    unit = ''
+    match = NAME_UNIT_RE.search(name)
+    if match and re.fullmatch(UNIT, match.group(1), re.IGNORECASE):
+        unit = match.group(1)
+        name = name[:match.start()]
+    return ' '.join(name.casefold().split()), unit
+
+
+def _match_range(match, default_unit):
+    """单个匹配的 (下限, 上限, 规范单位)，匹配中没有单位时使用 default_unit"""
+    low = _to_float(match.group('low'))
+    # 区间两端可以各自带单位（如 "800mm-6m"），只写一个单位时两端共用
+    unit, factor = normalize_unit(
+        match.group('unit2') or match.group('unit3') or match.group('unit1') or default_unit
+    )
+    low_unit, low_factor = normalize_unit(match.group('unit1') or match.group('unit2') or default_unit)
+    if low_unit != unit:
+        low_factor = factor
+
+    if match.group('high') is not None:
+        high = _to_float(match.group('high')) * factor
+        low *= low_factor
+        if low > high:
+            low, high = high, low
+    elif match.group('tolerance') is not None:
+        tolerance = _to_float(match.group('tolerance')) * factor
+        low, high = low * factor - tolerance, low * factor + tolerance
+    else:
+        low = high = low * factor
+        bound = (match.group('cmp') or match.group('suffix') or '').lower()
+        if bound:
+            if bound in LOWER_BOUND_WORDS:
+                high = None
+            else:
+                low = None
+    return (
+        None if low is None else round(low, 6),
+        None if high is None else round(high, 6),
+        unit,
+    )
+
+
+def parse_spec_value(text, default_unit=''):
+    """从规格文本中提取数值区间，返回 [(下限, 上限, 规范单位)]，下限/上限为None表示无界
+
+    "1.2-2.0mm" -> [(1.2, 2.0, 'mm')]；"≥160 MPa" -> [(160, None, 'MPa')]；"6m" -> [(6000, 6000, 'mm')]；
+    "-5~40℃" -> [(-5, 40, '°C')]；"1,200 mm" -> [(1200, 1200, 'mm')]；"10, 20, 30 mm" 中每个数值都以 mm 为单位
+    """
+    text = text or ''
+    results = []
+    unitless = []  # 当前列表中还没有单位的数值在 results 中的位置和匹配
+    previous_end = None
+    for match in VALUE_RE.finditer(text):
+        if unitless and not LIST_SEPARATOR_RE.fullmatch(text[previous_end:match.start()]):
+            unitless = []
+        unit = match.group('unit2') or match.group('unit3') or match.group('unit1')
+        if unit:
+            for position, previous in unitless:
+                results[position] = _match_range(previous, unit)
+            unitless = []
+        else:
+            unitless.append((len(results), match))
+        results.append(_match_range(match, default_unit))
+        previous_end = match.end()
+    return results
+
+
+# ---------- 侧表维护 ----------
+
+def load_template_specs(apps=global_apps):
+    """一次查询加载所有激活模板的规格，返回 {模板ID: [(名称, 值)]}"""
+    template_specs = {}
+    specifications = apps.get_model('products', 'TemplateSpecification').objects.filter(template__is_active=True)
+    for item in specifications.order_by('order', 'created_at'):
+        template_specs.setdefault(item.template_id, []).append((item.name, item.value))
+    return template_specs
+
+
+def effective_specs(product, resolve_template, template_specs):
+    """产品自身规格优先，没有时使用模板规格（与详情页合并逻辑一致）
+
+    product 需已预取 specification_items，返回 (来源模板ID或None, [(名称, 值)])。
+    """
+    specs = [(item.name, item.value) for item in product.specification_items.all()]
+    if not specs:
+        template = resolve_template(product)
+        if template:
+            return template.id, template_specs.get(template.id, [])
+    return None, specs
+
+
+def _effective_spec_rows(product, resolve_template, template_specs, spec_value_model=ProductSpecValue):
+    """解析产品的有效规格，返回待写入的侧表对象"""
+    template_id, specs = effective_specs(product, resolve_template, template_specs)
+    source = 'template' if template_id else 'product'
+
+    rows = []
+    for name, value in specs:
+        spec_key, name_unit = normalize_spec_name(name)
+        if not spec_key:
+            continue
+        for low, high, unit in parse_spec_value(value, default_unit=name_unit):
+            rows.append(spec_value_model(
+                product_id=product.id, spec_key=spec_key[:200], spec_name=name[:200], unit=unit[:20],
+                low=low, high=high, source=source, source_template_id=template_id
+            ))
+    return rows
+
+
+def refresh_spec_values(product_ids=None, chunk_size=500, apps=global_apps):
+    """重新解析产品规格并写入侧表，product_ids 为None时全量重建，返回写入的区间数
+
+    迁移中传入历史模型注册表 apps 回填已有产品。
+    """
+    resolve_template = build_template_resolver(apps)
+    template_specs = load_template_specs(apps)
+    spec_value_model = apps.get_model('products', 'ProductSpecValue')
+
+    queryset = apps.get_model('products', 'Product').objects.only(
+        'id', 'template_id', 'use_template', 'category_id', 'subcategory_id'
+    ).prefetch_related('specification_items').order_by('id')
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        queryset = queryset.filter(id__in=product_ids)
+
+    total = 0
+    with transaction.atomic():
+        if product_ids is None:
+            spec_value_model.objects.all().delete()
+        else:
+            spec_value_model.objects.filter(product_id__in=product_ids).delete()
+        last_id = 0
+        while True:
+            chunk = list(queryset.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            rows = []
+            for product in chunk:
+                rows.extend(_effective_spec_rows(product, resolve_template, template_specs, spec_value_model))
+            spec_value_model.objects.bulk_create(rows, batch_size=chunk_size)
+            total += len(rows)
+            last_id = chunk[-1].id
+    return total
+
+
+def refresh_template_spec_values(template_id):
+    """模板或模板规格变更后刷新受影响的产品（包括之前继承该模板、现在可能不再继承的产品）"""
+    product_ids = set(
+        ProductSpecValue.objects.filter(source_template_id=template_id).values_list('product_id', flat=True)
+    )
+    template = ProductTemplate.objects.filter(id=template_id).first()
+    if template:
+        product_ids.update(
+            Product.objects.filter(template_products_condition(template)).values_list('id', flat=True)
+        )
+    if product_ids:
+        refresh_spec_values(product_ids)
+
+
+# ---------- 内存范围索引 ----------
+
+class _SpecRanges:
+    """单个规格键下的所有区间，分别按下限、上限排序"""
+
+    def __init__(self, rows):
+        # rows: [(下限, 上限, 单位, 产品ID)]
+        by_low = sorted(rows, key=lambda row: float('-inf') if row[0] is None else row[0])
+        by_high = sorted(rows, key=lambda row: float('inf') if row[1] is None else row[1])
+        self.lows = [float('-inf') if row[0] is None else row[0] for row in by_low]
+        self.highs = [float('inf') if row[1] is None else row[1] for row in by_high]
+        self.by_low = by_low
+        self.by_high = by_high
+
+    def overlapping(self, minimum=None, maximum=None, unit=None):
+        """与 [minimum, maximum] 有交集的产品ID集合"""
+        minimum = float('-inf') if minimum is None else minimum
+        maximum = float('inf') if maximum is None else maximum
+        # 满足 下限 <= maximum 的是 by_low 的前缀，满足 上限 >= minimum 的是 by_high 的后缀，
+        # 取较短的一侧逐个检查另一个条件
+        low_end = bisect.bisect_right(self.lows, maximum)
+        high_start = bisect.bisect_left(self.highs, minimum)
+        if low_end <= len(self.highs) - high_start:
+            candidates = self.by_low[:low_end]
+        else:
+            candidates = self.by_high[high_start:]
+
+        result = set()
+        for low, high, row_unit, product_id in candidates:
+            if unit is not None and row_unit != unit:
+                continue
+            if (low is None or low <= maximum) and (high is None or high >= minimum):
+                result.add(product_id)
+        return result
+
+    def summary(self):
+        units = {}
+        for low, high, unit, product_id in self.by_low:
+            item = units.setdefault(unit, {'unit': unit, 'min': None, 'max': None, 'products': set()})
+            for value in (low, high):
+                if value is None:
+                    continue
+                if item['min'] is None or value < item['min']:
+                    item['min'] = value
+                if item['max'] is None or value > item['max']:
+                    item['max'] = value
+            item['products'].add(product_id)
+        return list(units.values())
+
+
+class SpecRangeIndex:
+    """规格数值范围索引服务（每个进程一份）"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._versions = None
+        self._ranges = {}  # 规格键 -> _SpecRanges
+        self._names = {}   # 规格键 -> 显示名称
+
+    def rebuild(self):
+        """从侧表全量构建索引（先读取版本号：构建期间发生的变更在下次查询时再触发重建）"""
+        with self._lock:
+            versions = response_cache.versions(SPEC_RANGE_NAMESPACES)
+            rows_by_key = {}
+            names = {}
+            queryset = ProductSpecValue.objects.filter(product__is_active=True).values_list(
+                'spec_key', 'spec_name', 'low', 'high', 'unit', 'product_id'
+            )
+            for spec_key, spec_name, low, high, unit, product_id in queryset.iterator(chunk_size=5000):
+                rows_by_key.setdefault(spec_key, []).append((low, high, unit, product_id))
+                names.setdefault(spec_key, spec_name)
+            self._ranges = {key: _SpecRanges(rows) for key, rows in rows_by_key.items()}
+            self._names = names
+            self._versions = versions
+
+    def _ensure_current(self):
+        if self._versions != response_cache.versions(SPEC_RANGE_NAMESPACES):
+            self.rebuild()
+
+    @staticmethod
+    def parse_ranges(query_params):
+        """解析 spec_range=名称:最小值:最大值[:单位] 参数（可重复，多个条件之间为"且"）
+
+        最小值或最大值留空表示不限，例如 spec_range=wall thickness:1.4:2.0:mm、spec_range=tensile strength:160:。
+        参数格式错误时抛出 ValueError。
+        """
+        ranges = []
+        for raw in query_params.getlist('spec_range'):
+            parts = raw.rsplit(':', 3) if raw.count(':') >= 3 else raw.rsplit(':', 2)
+            if len(parts) < 3:
+                raise ValueError(raw)
+            name, minimum, maximum = parts[0], parts[1].strip(), parts[2].strip()
+            spec_key, name_unit = normalize_spec_name(name)
+            unit_text = parts[3].strip() if len(parts) > 3 else name_unit
+            if not spec_key or (not minimum and not maximum):
+                raise ValueError(raw)
+            unit, factor = normalize_unit(unit_text) if unit_text else (None, 1.0)
+            ranges.append((
+                spec_key,
+                float(minimum) * factor if minimum else None,
+                float(maximum) * factor if maximum else None,
+                unit,
+            ))
+        return ranges
+
+    def filter_ids(self, ranges):
+        """返回满足所有范围条件的产品ID列表"""
+        self._ensure_current()
+        with self._lock:
+            result = None
+            for spec_key, minimum, maximum, unit in ranges:
+                spec_ranges = self._ranges.get(spec_key)
+                matched = spec_ranges.overlapping(minimum, maximum, unit) if spec_ranges else set()
+                result = matched if result is None else result & matched
+                if not result:
+                    break
+            return sorted(result or ())
+
+    def summary(self):
+        """各规格键的数值范围概览（用于前端生成滑块），按覆盖产品数排序"""
+        self._ensure_current()
+        with self._lock:
+            items = []
+            for spec_key, spec_ranges in self._ranges.items():
+                for unit_summary in spec_ranges.summary():
+                    items.append({
+                        'key': spec_key,
+                        'name': self._names[spec_key],
+                        'unit': unit_summary['unit'],
+                        'min': unit_summary['min'],
+                        'max': unit_summary['max'],
+                        'count': len(unit_summary['products']),
+                    })
+            items.sort(key=lambda item: (-item['count'], item['key']))
+            return items
+
+
+# 全局规格范围索引实例（每个worker进程一份）
+spec_range_index = SpecRangeIndex()
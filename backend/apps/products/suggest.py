@@ -0,0 +1,320 @@
+"""
+搜索框输入联想 - 每个worker进程内的前缀索引
+
+索引为按字典序排列的 (词条, 条目) 数组，前缀查询用二分查找定位，不访问数据库。
+词条包括产品、分类、子分类的名称及其各语言翻译；名称中每个单词（中文为每个字）的
+起始位置都会生成一个词条，因此输入名称中间的词也能联想到。
+前缀结果不足时，在首字相同的词条中按有界编辑距离做容错匹配。
+
+查询路径不访问数据库：其他进程的变更最多每 CHECK_INTERVAL 秒检查一次（读取本进程缓存的命名空间版本号），
+本进程的变更由信号增量写入。
+"""
+import bisect
+import threading
+import time
+import unicodedata
+
+from apps.common.text import CJK_RE
+from .caching import response_cache
+from .models import Category, SubCategory, Product
+from .search import TRANSLATED_LANGUAGES
+from .services import translation_service
+
+
+# 索引依赖的数据命名空间，其他worker修改数据后通过版本号变化触发全量重建；
+# 译文按翻译文件的修改时间和大小判断是否变化（文件被改写的次数与版本号递增次数不一一对应），
+# 只在 translations 命名空间版本号变化后才检查文件
+SUGGEST_NAMESPACES = ['products', 'categories']
+TRANSLATION_NAMESPACES = ['translations']
+SUGGEST_KINDS = ['category', 'subcategory', 'product']
+
+# 联想支持的语言：zh/en 使用原文，其余使用已存储的翻译
+SUGGEST_LANGUAGES = ['zh', 'en'] + [lang for lang in TRANSLATED_LANGUAGES if lang != 'zh']
+
+# 类型排序权重：分类优先于子分类，子分类优先于产品
+KIND_PRIORITY = {'category': 0, 'subcategory': 1, 'product': 2}
+
+# 容错匹配时单个首字区间内最多比较的词条数
+MAX_FUZZY_SCAN = 2000
+
+# 检查其他进程变更的最短间隔（秒）
+CHECK_INTERVAL = 5
+
+
+def normalize(text):
+    """统一大小写、全半角并去除变音符号"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.casefold().split())
+
+
+def _term_starts(text):
+    """返回名称中可作为前缀起点的子串：每个单词的起始位置，中文为每个字"""
+    starts = {text}
+    for i, ch in enumerate(text):
+        if i == 0:
+            continue
+        if text[i - 1] == ' ' and ch != ' ':
+            starts.add(text[i:])
+        elif CJK_RE.match(ch):
+            starts.add(text[i:])
+    return starts
+
+
+def common_prefix_length(a, b):
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return length
+
+
+def prefix_edit_distance(query, term, max_distance):
+    """query 与 term 的某个前缀之间的最小编辑距离（含相邻字符交换），超过上限返回 max_distance + 1"""
+    term = term[:len(query) + max_distance]
+    previous_previous = None
+    previous = list(range(len(term) + 1))
+    for i in range(1, len(query) + 1):
+        current = [i] + [0] * len(term)
+        for j in range(1, len(term) + 1):
+            cost = 0 if query[i - 1] == term[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous_previous is not None and j > 1 \
+                    and query[i - 1] == term[j - 2] and query[i - 2] == term[j - 1]:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return min(previous)
+
+
+class _LanguageIndex:
+    """单个语言的前缀索引"""
+
+    def __init__(self):
+        self.terms = []    # 已排序的词条
+        self.refs = []     # 与词条对应的条目键
+        self.entries = {}  # 条目键 -> 条目
+        self.key_terms = {}  # 条目键 -> 该条目的词条集合，增量更新时据此定位
+        self._pending = None
+
+    @staticmethod
+    def _expand(texts):
+        terms = set()
+        for text in texts:
+            normalized = normalize(text)
+            if normalized:
+                terms.update(_term_starts(normalized))
+        return terms
+
+    def begin_bulk(self):
+        """开始批量写入：先收集，finish_bulk 时一次排序"""
+        self._pending = []
+
+    def finish_bulk(self):
+        pairs = sorted(self._pending)
+        self.terms = [term for term, _ in pairs]
+        self.refs = [key for _, key in pairs]
+        self._pending = None
+
+    def _position(self, term, key):
+        """(词条, 条目键) 在有序数组中的位置：先二分定位词条，再在相同词条中二分定位条目键"""
+        start = bisect.bisect_left(self.terms, term)
+        end = bisect.bisect_right(self.terms, term, start)
+        return bisect.bisect_left(self.refs, key, start, end)
+
+    def add(self, key, entry, texts):
+        """写入条目；已有该条目时只增删变化的词条（名称未变时不移动数组）"""
+        terms = self._expand(texts)
+        self.entries[key] = entry
+        if self._pending is not None:
+            self._pending.extend((term, key) for term in terms)
+            self.key_terms[key] = terms
+            return
+        previous = self.key_terms.get(key, set())
+        for term in previous - terms:
+            position = self._position(term, key)
+            del self.terms[position]
+            del self.refs[position]
+        for term in terms - previous:
+            position = self._position(term, key)
+            self.terms.insert(position, term)
+            self.refs.insert(position, key)
+        self.key_terms[key] = terms
+
+    def remove(self, key):
+        self.entries.pop(key, None)
+        for term in self.key_terms.pop(key, ()):
+            position = self._position(term, key)
+            del self.terms[position]
+            del self.refs[position]
+
+    def prefix_matches(self, prefix, limit):
+        keys = []
+        position = bisect.bisect_left(self.terms, prefix)
+        while position < len(self.terms) and self.terms[position].startswith(prefix):
+            key = self.refs[position]
+            if key not in keys:
+                keys.append(key)
+                if len(keys) >= limit:
+                    break
+            position += 1
+        return keys
+
+    def _nearest(self, query, start, end):
+        """首字区间内按与 query 的公共前缀长度由长到短产出词条位置
+
+        有序数组中公共前缀越长的词条离 query 的插入位置越近，从插入位置向两侧归并即可，
+        不需要计算整个区间。
+        """
+        above = bisect.bisect_left(self.terms, query, start, end)
+        below = above - 1
+        while below >= start or above < end:
+            if above >= end or (below >= start and common_prefix_length(query, self.terms[below])
+                                >= common_prefix_length(query, self.terms[above])):
+                yield below
+                below -= 1
+            else:
+                yield above
+                above += 1
+
+    def fuzzy_matches(self, query, max_distance, limit, exclude):
+        """在首字相同的词条中做有界编辑距离匹配
+
+        最多比较 MAX_FUZZY_SCAN 个与 query 公共前缀最长的词条（而不是按字母序取区间开头，
+        否则目录变大后结果会偏向字母序靠前的词条）。
+        """
+        start = bisect.bisect_left(self.terms, query[0])
+        end = bisect.bisect_left(self.terms, query[0] + '\U0010ffff')
+        scored = {}
+        for scanned, position in enumerate(self._nearest(query, start, end)):
+            if scanned >= MAX_FUZZY_SCAN:
+                break
+            key = self.refs[position]
+            if key in exclude:
+                continue
+            distance = prefix_edit_distance(query, self.terms[position], max_distance)
+            if distance <= max_distance and distance < scored.get(key, max_distance + 1):
+                scored[key] = distance
+        return sorted(scored, key=lambda key: scored[key])[:limit]
+
+
+class SuggestIndex:
+    """输入联想索引服务（每个进程一份）"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._indexes = {}
+        self._versions = None
+        self._translations_version = None
+        self._translation_signature = None
+        self._checked_at = 0.0
+
+    # ---------- 构建 ----------
+
+    @staticmethod
+    def _translations(model_name):
+        """整个翻译文件（按文件修改时间缓存在本进程中）"""
+        return {lang: translation_service.load_translations(model_name, lang) for lang in TRANSLATED_LANGUAGES}
+
+    @staticmethod
+    def _current_translation_signature():
+        return tuple(translation_service.translation_signature(kind, TRANSLATED_LANGUAGES) for kind in SUGGEST_KINDS)
+
+    def _add_object(self, kind, obj, translations, slug=None):
+        """将一个对象按语言写入各语言索引（zh/en 显示原文，其他语言显示翻译）"""
+        key = (kind, obj.id)
+        zh_name = translations.get('zh', {}).get(f"name_{obj.id}")
+        for lang in SUGGEST_LANGUAGES:
+            translated = translations.get(lang, {}).get(f"name_{obj.id}")
+            display = obj.name if lang in ('zh', 'en') else (translated or obj.name)
+            entry = {'type': kind, 'id': obj.id, 'text': display}
+            if slug is not None:
+                entry['slug'] = slug
+            texts = {obj.name, display}
+            if lang == 'zh' and zh_name:
+                texts.add(zh_name)
+            self._indexes.setdefault(lang, _LanguageIndex()).add(key, entry, texts)
+
+    def rebuild(self):
+        """从数据库全量构建索引（先读取版本号：构建期间发生的变更在下次查询时再触发重建）"""
+        with self._lock:
+            versions = response_cache.versions(SUGGEST_NAMESPACES)
+            translations_version = response_cache.versions(TRANSLATION_NAMESPACES)
+            translation_signature = self._current_translation_signature()
+            self._indexes = {lang: _LanguageIndex() for lang in SUGGEST_LANGUAGES}
+            for index in self._indexes.values():
+                index.begin_bulk()
+            translations = {
+                'category': self._translations('category'),
+                'subcategory': self._translations('subcategory'),
+                'product': self._translations('product'),
+            }
+            for category in Category.objects.filter(is_active=True).only('id', 'name'):
+                self._add_object('category', category, translations['category'])
+            for subcategory in SubCategory.objects.filter(is_active=True).only('id', 'name'):
+                self._add_object('subcategory', subcategory, translations['subcategory'])
+            for product in Product.objects.filter(is_active=True).only('id', 'name', 'slug').iterator(chunk_size=2000):
+                self._add_object('product', product, translations['product'], slug=product.slug)
+            for index in self._indexes.values():
+                index.finish_bulk()
+            self._versions = versions
+            self._translations_version = translations_version
+            self._translation_signature = translation_signature
+            self._checked_at = time.monotonic()
+
+    def update_object(self, kind, obj, deleted=False):
+        """增量更新单个对象（信号调用，在缓存失效之后），未激活或已删除的对象从索引中移除"""
+        with self._lock:
+            if self._versions is None:
+                return  # 尚未构建，首次请求时全量构建
+            if obj.is_active and not deleted:
+                slug = obj.slug if kind == 'product' else None
+                translations = translation_service.get_object_translations(kind, obj.id, ['name'], TRANSLATED_LANGUAGES)
+                self._add_object(kind, obj, translations, slug=slug)
+            else:
+                for index in self._indexes.values():
+                    index.remove((kind, obj.id))
+            # 期间只有本次变更时记录最新版本号，避免本进程的保存触发全量重建
+            changed = ['products'] if kind == 'product' else ['categories']
+            self._versions = response_cache.synced_versions(self._versions, SUGGEST_NAMESPACES, changed)
+
+    def _ensure_current(self):
+        """其他进程的变更最多每 CHECK_INTERVAL 秒检查一次；翻译文件只在 translations 版本号变化后才检查"""
+        if self._versions is not None and time.monotonic() - self._checked_at < CHECK_INTERVAL:
+            return
+        if self._versions != response_cache.versions(SUGGEST_NAMESPACES):
+            self.rebuild()
+            return
+        translations_version = response_cache.versions(TRANSLATION_NAMESPACES)
+        if translations_version != self._translations_version:
+            if self._translation_signature != self._current_translation_signature():
+                self.rebuild()
+                return
+            self._translations_version = translations_version
+        self._checked_at = time.monotonic()
+
+    # ---------- 查询 ----------
+
+    def suggest(self, query, language='zh', limit=8):
+        """返回联想结果列表"""
+        normalized = normalize(query)
+        if not normalized:
+            return []
+        self._ensure_current()
+        with self._lock:
+            index = self._indexes.get(language) or self._indexes.get('zh')
+            if index is None:
+                return []
+            keys = index.prefix_matches(normalized, limit * 4)
+            keys.sort(key=lambda key: (KIND_PRIORITY[key[0]], len(index.entries[key]['text'])))
+            keys = keys[:limit]
+            if len(keys) < limit and len(normalized) >= 3:
+                max_distance = 1 if len(normalized) < 6 else 2
+                keys += index.fuzzy_matches(normalized, max_distance, limit - len(keys), set(keys))
+            return [dict(index.entries[key]) for key in keys]
+
+
+# 全局输入联想索引实例（每个worker进程一份）
+suggest_index = SuggestIndex()
@@ -2,11 +2,16 @@
 模板序列化器和工具函数
 """
 from rest_framework import serializers
+from django.apps import apps as global_apps
+from django.db.models import Q
 from .models import (
     ProductTemplate, TemplateSpecification, TemplateFeature,
     TemplateApplication, TemplateFactoryImage, TemplateProcess, Product
 )
 from apps.about.models import FactoryImage
+from .renderers import fragment_cache
+from .serializers import ImageVariantsField
+from .image_variants import prefetch_variants, variants_data
 
 
 class TemplateSpecificationSerializer(serializers.ModelSerializer):
@@ -27,25 +32,31 @@ class TemplateFeatureSerializer(serializers.ModelSerializer):
 
 class TemplateApplicationSerializer(serializers.ModelSerializer):
     """模板应用领域序列化器"""
+    image_variants = ImageVariantsField(source='image')
+    
     class Meta:
         model = TemplateApplication
-        fields = ['id', 'name', 'description', 'image', 'order']
+        fields = ['id', 'name', 'description', 'image', 'image_variants', 'order']
         read_only_fields = ['id']
 
 
 class TemplateFactoryImageSerializer(serializers.ModelSerializer):
     """模板工厂图片序列化器"""
+    image_variants = ImageVariantsField(source='image')
+    
     class Meta:
         model = TemplateFactoryImage
-        fields = ['id', 'title', 'description', 'image', 'category', 'order']
+        fields = ['id', 'title', 'description', 'image', 'image_variants', 'category', 'order']
         read_only_fields = ['id']
 
 
 class TemplateProcessSerializer(serializers.ModelSerializer):
     """模板工艺处理序列化器"""
+    image_variants = ImageVariantsField(source='image')
+    
     class Meta:
         model = TemplateProcess
-        fields = ['id', 'name', 'description', 'image', 'order']
+        fields = ['id', 'name', 'description', 'image', 'image_variants', 'order']
         read_only_fields = ['id']
 
 
@@ -107,7 +118,91 @@ def get_product_template(product):
     return None
 
 
-def merge_template_data(product_data, template):
+def build_template_resolver(apps=global_apps):
+    """批量解析产品模板 - 一次查询加载所有激活模板，返回 resolve(product) -> 模板或None
+
+    匹配规则与 get_product_template 相同，适用于需要为大量产品解析模板的场景。
+    product 只需提供 template_id、use_template、subcategory_id、category_id 属性。
+    apps 为迁移中的历史模型注册表时按历史模型查询（用于迁移中回填数据）。
+    """
+    templates = {}
+    subcategory_templates = {}
+    category_templates = {}
+    active_templates = apps.get_model('products', 'ProductTemplate').objects.filter(is_active=True)
+    for template in active_templates.order_by('-order', '-id'):
+        # 倒序遍历，使同一分类下 order 最小的模板最后写入
+        templates[template.id] = template
+        if template.subcategory_id and not template.category_id:
+            subcategory_templates[template.subcategory_id] = template
+        if template.category_id and not template.subcategory_id:
+            category_templates[template.category_id] = template
+
+    def resolve(product):
+        if product.template_id and product.template_id in templates:
+            return templates[product.template_id]
+        if not product.use_template:
+            return None
+        if product.subcategory_id and product.subcategory_id in subcategory_templates:
+            return subcategory_templates[product.subcategory_id]
+        if product.category_id:
+            return category_templates.get(product.category_id)
+        return None
+
+    return resolve
+
+
+def template_products_condition(template):
+    """可能继承该模板的产品的查询条件（直接关联，或未指定模板时按子分类/分类匹配）"""
+    condition = Q(template=template)
+    if template.subcategory_id:
+        condition |= Q(subcategory_id=template.subcategory_id, template__isnull=True)
+    if template.category_id:
+        condition |= Q(category_id=template.category_id, template__isnull=True)
+    return condition
+
+
+def _ordered(items):
+    """按 order 排序的关联对象：已预取时在内存中排序，不再查询数据库"""
+    queryset = items.all()
+    if queryset._result_cache is not None:
+        return sorted(queryset, key=lambda item: item.order)
+    return queryset.order_by('order')
+
+
+def _with_variants(items):
+    """[(对象, 图片版本)]，整组图片的版本清单用一次查询取出"""
+    items = list(items)
+    manifests = prefetch_variants(item.image.name for item in items if item.image)
+    return [(item, variants_data(item.image.name, manifests=manifests) if item.image else None) for item in items]
+
+
+def fallback_factory_images():
+    """全局工厂图片（about FactoryImage），模板没有工厂图片时使用"""
+    return [
+        {
+            'id': img.id,
+            'title': img.title,
+            'description': img.description or '',
+            'image': img.image.url if img.image else None,
+            'image_variants': image_variants,
+            'category': '',
+            'order': img.order
+        }
+        for img, image_variants in _with_variants(FactoryImage.objects.filter(is_active=True).order_by('order', 'title'))
+    ]
+
+
+def global_factory_images():
+    """全局工厂图片的预编码片段，工厂图片变更时失效"""
+    return fragment_cache.get(('factory_images',), ['factory_images'], fallback_factory_images)
+
+
+def _template_block(template, name, build):
+    """模板区块（规格/特性/应用/工艺/工厂图片）按模板预编码缓存，模板变更前不再查询和编码"""
+    return fragment_cache.get(('template', template.id, name), ['templates'], build)
+
+
+def merge_template_data(product_data, template, fallback_images=None):
     """合并模板数据到产品数据（字典格式）"""
     if not template:
         return product_data
@@ -139,38 +234,39 @@ def merge_template_data(product_data, template):
     # 结构化数据：如果产品没有或为空，使用模板的
     # 注意：这里需要检查产品是否已经有这些数据（可能是空数组）
     if not product_data.get('specification_items') or len(product_data.get('specification_items', [])) == 0:
-        product_data['specification_items'] = [
+        product_data['specification_items'] = _template_block(template, 'specification_items', lambda: [
             {
                 'id': item.id,
                 'name': item.name,
                 'value': item.value,
                 'order': item.order
             }
-            for item in template.specification_items.all().order_by('order')
-        ]
+            for item in _ordered(template.specification_items)
+        ])
     
     if not product_data.get('feature_items') or len(product_data.get('feature_items', [])) == 0:
-        product_data['feature_items'] = [
+        product_data['feature_items'] = _template_block(template, 'feature_items', lambda: [
             {
                 'id': item.id,
                 'name': item.name,
                 'description': item.description,
                 'order': item.order
             }
-            for item in template.feature_items.all().order_by('order')
-        ]
+            for item in _ordered(template.feature_items)
+        ])
     
     if not product_data.get('application_items') or len(product_data.get('application_items', [])) == 0:
-        product_data['application_items'] = [
+        product_data['application_items'] = _template_block(template, 'application_items', lambda: [
             {
                 'id': item.id,
                 'name': item.name,
                 'description': item.description,
                 'image': item.image.url if item.image else None,
+                'image_variants': image_variants,
                 'order': item.order
             }
-            for item in template.application_items.all().order_by('order')
-        ]
+            for item, image_variants in _with_variants(_ordered(template.application_items))
+        ])
     
     # 扩展字段
     if not product_data.get('packaging_details'):
@@ -190,58 +286,51 @@ def merge_template_data(product_data, template):
     if not product_data.get('lead_time'):
         product_data['lead_time'] = template.lead_time or ''
     
-    product_data = ensure_factory_images(product_data, template)
+    product_data = ensure_factory_images(product_data, template, fallback_images)
     
     # ⭐新增：合并工艺处理数据
     if not product_data.get('process_items') or len(product_data.get('process_items', [])) == 0:
-        product_data['process_items'] = [
+        product_data['process_items'] = _template_block(template, 'process_items', lambda: [
             {
                 'id': item.id,
                 'name': item.name,
                 'description': item.description,
                 'image': item.image.url if item.image else None,
+                'image_variants': image_variants,
                 'order': item.order
             }
-            for item in template.process_items.all().order_by('order')
-        ]
+            for item, image_variants in _with_variants(_ordered(template.process_items))
+        ])
     
     return product_data
 
 
-def ensure_factory_images(product_data, template=None):
-    """确保产品数据中包含工厂图片，优先模板，其次全局 about FactoryImage"""
+def ensure_factory_images(product_data, template=None, fallback_images=None):
+    """确保产品数据中包含工厂图片，优先模板，其次全局 about FactoryImage（批量序列化时可传入已加载的 fallback_images）"""
     if product_data.get('factory_images') and len(product_data.get('factory_images', [])) > 0:
         return product_data
     
     template_images = []
     if template:
-        template_images = [
+        template_images = _template_block(template, 'factory_images', lambda: [
             {
                 'id': img.id,
                 'title': img.title,
                 'description': img.description or '',
                 'image': img.image.url if img.image else None,
+                'image_variants': image_variants,
                 'category': getattr(img, 'category', '') or '',
                 'order': img.order
             }
-            for img in template.factory_images.all().order_by('order')
-        ]
+            for img, image_variants in _with_variants(_ordered(template.factory_images))
+        ])
     
     if template_images:
         product_data['factory_images'] = template_images
         return product_data
     
-    fallback_images = [
-        {
-            'id': img.id,
-            'title': img.title,
-            'description': img.description or '',
-            'image': img.image.url if img.image else None,
-            'category': '',
-            'order': img.order
-        }
-        for img in FactoryImage.objects.filter(is_active=True).order_by('order', 'title')
-    ]
+    if fallback_images is None:
+        fallback_images = global_factory_images()
     
     if fallback_images:
         product_data['factory_images'] = fallback_images
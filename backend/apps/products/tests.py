@@ -1,3 +1,674 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .caching import response_cache
+from .catalog_import import CatalogImporter
+from . import image_resize
+from .search import product_search_index
+from .facets import facet_index, normalize_tokens
+from .models import (
+    Category, ImportJob, Product, ProductFeature, ProductSpecification, ProductTemplate, TemplateSpecification
+)
+from .navigation import category_tree
+from .services import translation_service
+from .spec_ranges import normalize_spec_name, parse_spec_value
+from . import suggest
+from .suggest import suggest_index
+
+
+class ParseSpecValueTests(SimpleTestCase):
+    """规格文本 -> 数值区间"""
+
+    def test_range(self):
+        self.assertEqual(parse_spec_value('1.2-2.0mm'), [(1.2, 2.0, 'mm')])
+        self.assertEqual(parse_spec_value('1.2 ~ 2.0 mm'), [(1.2, 2.0, 'mm')])
+        self.assertEqual(parse_spec_value('20至30毫米'), [(20, 30, 'mm')])
+
+    def test_range_with_units_on_both_ends(self):
+        self.assertEqual(parse_spec_value('800mm-6m'), [(800, 6000, 'mm')])
+
+    def test_single_value_is_converted(self):
+        self.assertEqual(parse_spec_value('6m'), [(6000, 6000, 'mm')])
+        self.assertEqual(parse_spec_value('0.5 GPa'), [(500, 500, 'MPa')])
+
+    def test_bounds(self):
+        self.assertEqual(parse_spec_value('≥160 MPa'), [(160, None, 'MPa')])
+        self.assertEqual(parse_spec_value('160 MPa min'), [(160, None, 'MPa')])
+        self.assertEqual(parse_spec_value('≤ 15 HW'), [(None, 15, 'HW')])
+
+    def test_tolerance(self):
+        self.assertEqual(parse_spec_value('2.0±0.1mm'), [(1.9, 2.1, 'mm')])
+
+    def test_negative_values(self):
+        self.assertEqual(parse_spec_value('-5~40℃'), [(-5, 40, '°C')])
+        self.assertEqual(parse_spec_value('-40 ~ -10 ℃'), [(-40, -10, '°C')])
+        self.assertEqual(parse_spec_value('−20°C'), [(-20, -20, '°C')])
+
+    def test_thousands_separators(self):
+        self.assertEqual(parse_spec_value('1,200 mm'), [(1200, 1200, 'mm')])
+        self.assertEqual(parse_spec_value('1,200-6,000mm'), [(1200, 6000, 'mm')])
+
+    def test_trailing_unit_applies_to_whole_list(self):
+        self.assertEqual(parse_spec_value('10,20,30 mm'), [(10, 10, 'mm'), (20, 20, 'mm'), (30, 30, 'mm')])
+        self.assertEqual(parse_spec_value('1 / 2 cm'), [(10, 10, 'mm'), (20, 20, 'mm')])
+        self.assertEqual(parse_spec_value('2 pcs, 6m'), [(2, 2, ''), (6000, 6000, 'mm')])
+
+    def test_grade_and_temper_are_not_values(self):
+        self.assertEqual(parse_spec_value('6063-T5'), [])
+        self.assertEqual(parse_spec_value('5052 H32'), [])
+        self.assertEqual(parse_spec_value('T5'), [])
+        self.assertEqual(parse_spec_value('6063-T5, 1.2mm'), [(1.2, 1.2, 'mm')])
+
+    def test_default_unit(self):
+        self.assertEqual(parse_spec_value('1.5', default_unit='cm'), [(15, 15, 'mm')])
+
+    def test_empty(self):
+        self.assertEqual(parse_spec_value(''), [])
+        self.assertEqual(parse_spec_value(None), [])
+
+
+class NormalizeSpecNameTests(SimpleTestCase):
+
+    def test_unit_in_name(self):
+        self.assertEqual(normalize_spec_name('Wall Thickness (mm)'), ('wall thickness', 'mm'))
+        self.assertEqual(normalize_spec_name('长度（米）：'), ('长度', '米'))
+
+    def test_plain_name(self):
+        self.assertEqual(normalize_spec_name('  Tensile   Strength: '), ('tensile strength', ''))
+
+
+class CatalogTestCase(TestCase):
+    """使用数据库的测试：翻译文件写入临时目录、不调用翻译接口，进程内的缓存和索引在每个测试前清空"""
+
+    def setUp(self):
+        translations_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, translations_dir, ignore_errors=True)
+        for patcher in [
+            mock.patch.object(translation_service, 'translations_dir', translations_dir),
+            mock.patch.object(translation_service, 'auto_translate_on_save'),
+            mock.patch('apps.products.signals.translate_products_in_background'),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        cache.clear()
+        response_cache._forget_versions()
+        for index in (facet_index, suggest_index, category_tree):
+            index._versions = None
+
+    def create_category(self, name, **fields):
+        return Category.objects.create(name=name, slug=fields.pop('slug', name.lower()), **fields)
+
+    def create_product(self, category, name, **fields):
+        """创建产品（事务提交后的派生数据更新立即执行）"""
+        fields.setdefault('description', 'Aluminium extrusion')
+        fields.setdefault('slug', name.lower().replace(' ', '-'))
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(category=category, name=name, **fields)
+
+
+@override_settings(API_CACHE_ENABLED=True)
+class ResponseCacheTests(CatalogTestCase):
+    """单飞响应缓存"""
+
+    def test_builds_once_then_hits(self):
+        builder = mock.Mock(return_value={'value': 1})
+        self.assertEqual(response_cache.get_or_build('test:key', builder, namespaces=['products']), ({'value': 1}, 'MISS'))
+        self.assertEqual(response_cache.get_or_build('test:key', builder, namespaces=['products']), ({'value': 1}, 'HIT'))
+        builder.assert_called_once()
+
+    def test_invalidation_rebuilds(self):
+        response_cache.get_or_build('test:key', lambda: 'old', namespaces=['products'])
+        response_cache.invalidate('products')
+        self.assertEqual(response_cache.get_or_build('test:key', lambda: 'new', namespaces=['products']), ('new', 'MISS'))
+        # 其他命名空间的失效不影响
+        response_cache.invalidate('news')
+        self.assertEqual(response_cache.get_or_build('test:key', lambda: 'newer', namespaces=['products']), ('new', 'HIT'))
+
+    def test_stale_copy_served_while_another_request_rebuilds(self):
+        response_cache.get_or_build('test:key', lambda: 'old', namespaces=['products'])
+        response_cache.invalidate('products')
+        cache.add('test:key:lock', 1)  # 其他请求正在重建
+        builder = mock.Mock(return_value='new')
+        self.assertEqual(response_cache.get_or_build('test:key', builder, namespaces=['products']), ('old', 'STALE'))
+        builder.assert_not_called()
+
+    def test_view_responses_are_cached_until_data_changes(self):
+        self.create_category('Doors')
+        self.assertEqual(self.client.get('/api/categories/')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/categories/')['X-Cache'], 'HIT')
+        self.create_category('Windows')
+        response = self.client.get('/api/categories/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['count'], 2)
+
+    def test_error_responses_are_not_cached(self):
+        self.assertEqual(self.client.get('/api/products/search/').status_code, 400)
+        self.assertFalse(self.client.get('/api/products/search/').has_header('X-Cache'))
+
+    def test_http_and_https_do_not_share_entries(self):
+        self.create_category('Doors')
+        self.client.get('/api/categories/')
+        self.assertEqual(self.client.get('/api/categories/', secure=True)['X-Cache'], 'MISS')
+
+
+@override_settings(API_CACHE_ENABLED=False)
+class ProductSearchTests(CatalogTestCase):
+    """全文搜索索引"""
+
+    def setUp(self):
+        super().setUp()
+        self.doors = self.create_category('Doors')
+        self.windows = self.create_category('Windows')
+        self.casement = self.create_product(self.doors, 'Casement door profile', features='thermal break')
+        self.sliding = self.create_product(self.windows, 'Sliding window profile', description='thermal break frame')
+        self.chinese = self.create_product(self.windows, '铝合金门窗型材', slug='chinese')
+
+    def search(self, query, **params):
+        response = self.client.get('/api/products/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_index_is_available(self):
+        self.assertTrue(product_search_index.is_available())
+
+    def test_name_matches_rank_first(self):
+        data = self.search('casement')
+        self.assertEqual([item['id'] for item in data['results']], [self.casement.id])
+        data = self.search('profile thermal')
+        self.assertEqual({item['id'] for item in data['results']}, {self.casement.id, self.sliding.id})
+
+    def test_chinese_substring(self):
+        self.assertEqual([item['id'] for item in self.search('门窗')['results']], [self.chinese.id])
+
+    def test_filters_apply_to_results_and_count(self):
+        data = self.search('profile', category=self.windows.id)
+        self.assertEqual(data['count'], 1)
+        self.assertEqual([item['id'] for item in data['results']], [self.sliding.id])
+
+    def test_pagination_uses_total_count(self):
+        data = self.search('profile', page_size=1)
+        self.assertEqual(data['count'], 2)
+        self.assertIsNotNone(data['next'])
+        self.assertEqual(len(self.search('profile', page_size=1, page=2)['results']), 1)
+
+    def test_index_follows_changes(self):
+        self.casement.name = 'Folding door profile'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.casement.save()
+        self.assertEqual(self.search('casement')['count'], 0)
+        self.assertEqual(self.search('folding')['count'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sliding.delete()
+        self.assertEqual(self.search('sliding')['count'], 0)
+
+    def test_inactive_products_are_excluded(self):
+        Product.objects.filter(id=self.sliding.id).update(is_active=False)
+        self.assertEqual([item['id'] for item in self.search('profile')['results']], [self.casement.id])
+
+
+class SuggestTests(CatalogTestCase):
+    """输入联想"""
+
+    def setUp(self):
+        super().setUp()
+        self.windows = self.create_category('Windows')
+        self.sliding = self.create_product(self.windows, 'Sliding window profile')
+        self.chinese = self.create_product(self.windows, '铝合金门窗型材', slug='chinese')
+
+    def suggest(self, query, **params):
+        response = self.client.get('/api/products/suggest/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [(item['type'], item['id']) for item in response.json()['results']]
+
+    def test_prefix_of_any_word(self):
+        self.assertEqual(self.suggest('slid'), [('product', self.sliding.id)])
+        self.assertEqual(self.suggest('win'), [('category', self.windows.id), ('product', self.sliding.id)])
+        self.assertEqual(self.suggest('门窗'), [('product', self.chinese.id)])
+
+    def test_typo_tolerance(self):
+        self.assertEqual(self.suggest('slidng'), [('product', self.sliding.id)])
+
+    def test_fuzzy_candidates_closest_to_the_query_are_scanned_first(self):
+        for name in ['Sabre', 'Sack', 'Saddle', 'Safe']:
+            self.create_product(self.windows, name)
+        with mock.patch.object(suggest, 'MAX_FUZZY_SCAN', 2):
+            self.assertEqual(self.suggest('slidng'), [('product', self.sliding.id)])
+
+    def test_lookups_do_not_query_the_database(self):
+        self.suggest('slid')
+        with self.assertNumQueries(0), mock.patch.object(translation_service, 'translation_signature') as signature:
+            self.suggest('slid')
+            self.suggest('门')
+        signature.assert_not_called()
+
+    def test_local_changes_are_applied_incrementally(self):
+        self.suggest('slid')
+        with mock.patch.object(suggest_index, 'rebuild') as rebuild:
+            self.create_product(self.windows, 'Casement window')
+            self.sliding.name = 'Folding window profile'
+            with self.captureOnCommitCallbacks(execute=True):
+                self.sliding.save()
+            self.assertEqual(self.suggest('case'), [('product', Product.objects.get(slug='casement-window').id)])
+            self.assertEqual(self.suggest('fold'), [('product', self.sliding.id)])
+            self.assertEqual(self.suggest('slid'), [])
+        rebuild.assert_not_called()
+
+
+class NormalizeTokensTests(SimpleTestCase):
+
+    def test_split_and_normalize(self):
+        self.assertEqual(normalize_tokens('6063 Series'), {'6063': '6063'})
+        self.assertEqual(
+            normalize_tokens('Silver, white or customized'),
+            {'silver': 'Silver', 'white': 'White', 'customized': 'Customized'},
+        )
+        self.assertEqual(normalize_tokens('T5/T6、t5'), {'t5': 'T5', 't6': 'T6'})
+        self.assertEqual(normalize_tokens(''), {})
+
+
+@override_settings(API_CACHE_ENABLED=False)
+class FacetTests(CatalogTestCase):
+    """属性分面与筛选"""
+
+    def setUp(self):
+        super().setUp()
+        doors = self.create_category('Doors')
+        windows = self.create_category('Windows')
+        ProductTemplate.objects.create(name='Window template', category=windows, grade='6060', temper='T5')
+        self.a = self.create_product(doors, 'Door A', grade='6063', temper='T5', colors='Silver, White')
+        self.b = self.create_product(doors, 'Door B', grade='6063', temper='T6', colors='Black')
+        self.c = self.create_product(doors, 'Door C', grade='6061 Series', temper='T6', colors='Silver')
+        self.d = self.create_product(windows, 'Window D', grade='', temper='', colors='White')  # 牌号、状态来自分类模板
+
+    def facets(self, **params):
+        response = self.client.get('/api/products/facets/', params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        counts = {
+            attribute: {item['value']: item['count'] for item in items}
+            for attribute, items in data['facets'].items()
+        }
+        return data['ids'], counts
+
+    def test_counts_without_filters(self):
+        ids, counts = self.facets()
+        self.assertEqual(ids, sorted([self.a.id, self.b.id, self.c.id, self.d.id]))
+        self.assertEqual(counts['grade'], {'6063': 2, '6061': 1, '6060': 1})
+        self.assertEqual(counts['colors'], {'silver': 2, 'white': 2, 'black': 1})
+
+    def test_selected_attribute_keeps_counts_of_its_other_values(self):
+        ids, counts = self.facets(grade='6063', temper='t6')
+        self.assertEqual(ids, [self.b.id])
+        # 牌号的计数只受状态筛选影响，状态的计数只受牌号筛选影响
+        self.assertEqual(counts['grade'], {'6063': 1, '6061': 1})
+        self.assertEqual(counts['temper'], {'t5': 1, 't6': 1})
+
+    def test_values_of_one_attribute_are_alternatives(self):
+        ids, _ = self.facets(colors='black,white')
+        self.assertEqual(ids, sorted([self.a.id, self.b.id, self.d.id]))
+
+    def test_product_list_uses_the_same_filters(self):
+        response = self.client.get('/api/products/', {'grade': '6060', 'view': 'card'})
+        self.assertEqual([item['id'] for item in response.json()['results']], [self.d.id])
+
+    def test_index_follows_changes(self):
+        self.facets()
+        self.b.grade = '6082'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.b.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.c.delete()
+        ids, counts = self.facets(grade='6063')
+        self.assertEqual(ids, [self.a.id])
+        self.assertEqual(counts['grade'], {'6063': 1, '6082': 1, '6060': 1})
+
+
+@override_settings(API_CACHE_ENABLED=False)
+class KeysetPaginationTests(CatalogTestCase):
+    """产品列表的键集分页"""
+
+    def setUp(self):
+        super().setUp()
+        category = self.create_category('Doors')
+        # 排序号相同的产品按创建时间倒序、id 升序排列
+        self.products = [
+            self.create_product(category, f'Door {index}', order=1 if index < 4 else 0)
+            for index in range(6)
+        ]
+        self.expected = [
+            product.id for product in sorted(
+                self.products, key=lambda product: (product.order, -product.created_at.timestamp(), product.id)
+            )
+        ]
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def walk(self, data, link):
+        ids = []
+        while True:
+            ids.extend(item['id'] for item in data['results'])
+            if not data[link]:
+                return ids
+            data = self.get(data[link])
+
+    def test_next_links_visit_every_product_once(self):
+        data = self.get('/api/products/', page_size=4, view='card')
+        self.assertNotIn('count', data)
+        self.assertIsNone(data['previous'])
+        self.assertEqual(len(data['results']), 4)
+        self.assertEqual(self.walk(data, 'next'), self.expected)
+
+    def test_previous_links_walk_back(self):
+        data = self.get('/api/products/', page_size=2, view='card')
+        while data['next']:
+            data = self.get(data['next'])
+        ids = self.walk(data, 'previous')
+        pages = [self.expected[index:index + 2] for index in range(0, len(self.expected), 2)]
+        self.assertEqual(ids, [product_id for page in reversed(pages) for product_id in page])
+
+    def test_rows_inserted_before_the_cursor_do_not_shift_later_pages(self):
+        first = self.get('/api/products/', page_size=3, view='card')
+        self.create_product(self.products[0].category, 'Door new', order=0)
+        second = self.get(first['next'])
+        self.assertEqual([item['id'] for item in second['results']], self.expected[3:])
+
+    def test_invalid_cursor_is_not_found(self):
+        for cursor in ('not-a-cursor', 'WzAsWzFdXQ'):
+            response = self.client.get('/api/products/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404)
+
+
+@override_settings(API_CACHE_ENABLED=False)
+class BulkWriteTests(CatalogTestCase):
+    """批量创建/更新产品"""
+
+    def setUp(self):
+        super().setUp()
+        self.category = self.create_category('Doors')
+        self.existing = self.create_product(self.category, 'Door A', grade='6063')
+        self.other = self.create_product(self.category, 'Door B')
+        self.client.force_login(get_user_model().objects.create_user('editor', password='secret'))
+
+    def post(self, items):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/products/bulk/', {'items': items}, content_type='application/json')
+
+    def test_anonymous_users_cannot_write(self):
+        self.client.logout()
+        response = self.post([{'category_id': self.category.id, 'name': 'Door C', 'description': 'x', 'slug': 'door-c'}])
+        self.assertIn(response.status_code, (401, 403))
+        self.assertFalse(Product.objects.filter(slug='door-c').exists())
+
+    def test_creates_and_updates_by_id_or_slug(self):
+        response = self.post([
+            {'category_id': self.category.id, 'name': 'Casement window', 'description': 'x', 'slug': 'casement'},
+            {'id': self.existing.id, 'name': 'Door A2'},
+            {'slug': self.other.slug, 'grade': '6061'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        created = Product.objects.get(slug='casement')
+        self.assertEqual(data['created'], [created.id])
+        self.assertEqual(data['updated'], [self.existing.id, self.other.id])
+
+        self.existing.refresh_from_db()
+        self.other.refresh_from_db()
+        # 更新只修改条目中提供的字段
+        self.assertEqual((self.existing.name, self.existing.grade), ('Door A2', '6063'))
+        self.assertEqual((self.other.name, self.other.grade), ('Door B', '6061'))
+        # 写入结束后统一更新索引
+        self.assertEqual(product_search_index.search('casement'), (1, [created.id]))
+        self.assertEqual(facet_index.filter_ids({'grade': ['6061']}), [self.other.id])
+
+    def test_any_invalid_item_rejects_the_whole_request(self):
+        response = self.post([
+            {'category_id': self.category.id, 'name': 'Door C', 'description': 'x', 'slug': 'door-c'},
+            {'id': self.existing.id, 'slug': self.other.slug},
+            {'category_id': 999, 'name': 'Door D', 'description': 'x', 'slug': 'door-d'},
+            {'name': 'Door E'},
+            {'category_id': self.category.id, 'name': 'Door F', 'description': 'x', 'slug': 'door-c'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['items']
+        self.assertEqual(errors[0], {})
+        self.assertIn('slug', errors[1])
+        self.assertIn('category_id', errors[2])
+        self.assertEqual(set(errors[3]), {'category_id', 'description', 'slug'})
+        self.assertIn('slug', errors[4])
+        self.assertEqual(Product.objects.count(), 2)
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.slug, 'door-a')
+
+
+class CatalogImportTests(CatalogTestCase):
+    """产品目录导入：逐块提交进度，失败后从中断处继续"""
+
+    CSV = (
+        'slug,name,description,category,grade,feature_items\n'
+        'door-a,Door A2,,,6061,\n'                                  # 更新已有产品，空单元格不修改
+        'door-b,Door B,Sliding door,doors,,\n'
+        'door-c,Door C,Casement door,doors,,Thermal break: 1.4 W/m²K\n'
+        'Bad Slug,Door D,Folding door,doors,,\n'                     # slug 无效
+        'door-e,Door E,,doors,,\n'                                    # 新产品缺少描述
+        'door-f,Door F,Pivot door,doors,,Hidden hinge: yes\n'
+    )
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.category = self.create_category('Doors')
+        self.existing = self.create_product(self.category, 'Door A', description='Swing door', grade='6063')
+        self.job = ImportJob.objects.create(file=ContentFile(self.CSV.encode('utf-8'), name='catalog.csv'))
+
+    def run_import(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return CatalogImporter(self.job, chunk_size=2).run()
+
+    def test_import_creates_updates_and_records_errors(self):
+        job = self.run_import()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual((job.total_rows, job.processed_rows), (6, 6))
+        self.assertEqual((job.created_count, job.updated_count, job.error_count), (3, 1, 2))
+        self.assertEqual([row for row, _ in job.errors], [5, 6])
+
+        self.existing.refresh_from_db()
+        self.assertEqual(
+            (self.existing.name, self.existing.description, self.existing.grade), ('Door A2', 'Swing door', '6061')
+        )
+        door_c = Product.objects.get(slug='door-c')
+        self.assertEqual(
+            list(door_c.feature_items.values_list('name', 'description')), [('Thermal break', '1.4 W/m²K')]
+        )
+        # 导入结束后统一更新索引
+        self.assertEqual(product_search_index.search('pivot'), (1, [Product.objects.get(slug='door-f').id]))
+
+    def test_failed_import_resumes_after_the_last_committed_chunk(self):
+        original = ProductFeature.objects.bulk_create
+        calls = []
+
+        def fail_on_second_chunk(objs, *args, **kwargs):
+            calls.append(objs)
+            if len(calls) == 1:
+                raise RuntimeError('disk full')
+            return original(objs, *args, **kwargs)
+
+        # 第二块（第 3、4 行）写入特性时失败，整个分块回滚
+        with mock.patch.object(ProductFeature.objects, 'bulk_create', side_effect=fail_on_second_chunk):
+            with self.assertRaises(RuntimeError):
+                self.run_import()
+            self.job.refresh_from_db()
+            self.assertEqual(self.job.status, 'failed')
+            self.assertEqual((self.job.processed_rows, self.job.created_count, self.job.updated_count), (2, 1, 1))
+            self.assertFalse(Product.objects.filter(slug='door-c').exists())
+
+            job = self.run_import()
+
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual((job.processed_rows, job.created_count, job.updated_count, job.error_count), (6, 3, 1, 2))
+        self.assertEqual(
+            sorted(Product.objects.values_list('slug', flat=True)), ['door-a', 'door-b', 'door-c', 'door-f']
+        )
+        self.assertEqual(ProductFeature.objects.count(), 2)
+
+
+class ExportTests(CatalogTestCase):
+    """产品流式导出"""
+
+    def setUp(self):
+        super().setUp()
+        doors = self.create_category('Doors')
+        windows = self.create_category('Windows')
+        template = ProductTemplate.objects.create(name='Window template', category=windows)
+        TemplateSpecification.objects.create(template=template, name='Thickness', value='1.4 mm')
+        self.door = self.create_product(doors, 'Door A')
+        ProductSpecification.objects.create(product=self.door, name='Width', value='60 mm', order=0)
+        ProductFeature.objects.create(product=self.door, name='Thermal break', description='yes', order=0)
+        self.window = self.create_product(windows, 'Window B')
+        self.hidden = self.create_product(doors, 'Door C', is_active=False)
+        self.client.force_login(get_user_model().objects.create_user('admin', password='secret', is_staff=True))
+
+    def export(self, **params):
+        response = self.client.get('/api/products/export/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_requires_staff(self):
+        self.client.force_login(get_user_model().objects.create_user('editor', password='secret'))
+        self.assertEqual(self.client.get('/api/products/export/').status_code, 403)
+
+    def test_csv_rows_use_import_format(self):
+        response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="products-', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(content.decode('utf-8-sig'))))
+        self.assertEqual([row['slug'] for row in rows], ['door-a', 'window-b', 'door-c'])
+        door, window = rows[0], rows[1]
+        self.assertEqual((door['category'], door['is_active']), ('doors', 'True'))
+        self.assertEqual((door['specification_items'], door['spec_source']), ('Width: 60 mm', 'product'))
+        self.assertEqual(door['feature_items'], 'Thermal break: yes')
+        # 没有自身规格的产品导出模板的规格
+        self.assertEqual(
+            (window['template'], window['specification_items'], window['spec_source']),
+            ('Window template', 'Thickness: 1.4 mm', 'template')
+        )
+
+    def test_ndjson_keeps_lists(self):
+        _, content = self.export(output='ndjson', category='doors', is_active='true')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row['slug'] for row in rows], ['door-a'])
+        self.assertEqual(rows[0]['specification_items'], [['Width', '60 mm']])
+
+    def test_xlsx(self):
+        _, content = self.export(output='xlsx', is_active='false')
+        workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True)
+        rows = list(workbook.active.iter_rows(values_only=True))
+        workbook.close()
+        header = list(rows[0])
+        self.assertEqual(header[:3], ['id', 'slug', 'name'])
+        self.assertEqual([row[header.index('slug')] for row in rows[1:]], ['door-c'])
+
+    def test_invalid_parameters(self):
+        for params in ({'output': 'pdf'}, {'date_from': '2024-13-01'}):
+            self.assertEqual(self.client.get('/api/products/export/', params).status_code, 400)
+
+
+class ImageResizeTests(SimpleTestCase):
+    """按需缩放图片：尺寸白名单、路径校验和缓存头"""
+
+    def setUp(self):
+        self.media_root = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=str(self.media_root))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # 缩放缓存目录在模块导入时确定，测试中指向临时目录
+        cache_dir = str(self.media_root / '.resize-cache')
+        for patcher in [
+            mock.patch.object(image_resize, 'RESIZE_CACHE_DIR', cache_dir),
+            mock.patch.object(image_resize.resize_cache, 'directory', cache_dir),
+            mock.patch.object(image_resize.resize_cache, '_size', None),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for directory, color in [('products', 'red'), ('.watermark', 'blue')]:
+            (self.media_root / directory).mkdir()
+            Image.new('RGB', (800, 400), color).save(self.media_root / directory / 'door.jpg')
+
+    def get(self, url, **headers):
+        response = self.client.get(url, **headers)
+        if response.streaming:
+            response.content_bytes = b''.join(response.streaming_content)
+            response.close()
+        return response
+
+    def test_allowed_size_is_rendered_once_and_cached(self):
+        response = self.get('/media-resize/320x0/products/door.jpg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response['Content-Type'], response['X-Cache']), ('image/jpeg', 'MISS'))
+        self.assertEqual(response['Cache-Control'], f'public, max-age={image_resize.RESIZE_MAX_AGE}')
+        with Image.open(io.BytesIO(response.content_bytes)) as image:
+            self.assertEqual(image.size, (320, 160))
+
+        again = self.get('/media-resize/320x0/products/door.jpg')
+        self.assertEqual(again['X-Cache'], 'HIT')
+        not_modified = self.get('/media-resize/320x0/products/door.jpg', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_versioned_url_is_immutable_until_the_source_changes(self):
+        url = image_resize.resized_url('products/door.jpg', 120, 120, fit='cover', output_format='webp')
+        self.assertRegex(url, r'^/media-resize/120x120/products/door\.jpg\?fit=cover&fm=webp&v=[0-9a-f]{12}$')
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(response['Cache-Control'], image_resize.IMMUTABLE)
+        with Image.open(io.BytesIO(response.content_bytes)) as image:
+            self.assertEqual(image.size, (120, 120))
+
+        # 原图被改写后旧版本号不再按 immutable 缓存
+        Image.new('RGB', (400, 400), 'green').save(self.media_root / 'products' / 'door.jpg')
+        stale = self.get(url)
+        self.assertEqual(stale['Cache-Control'], f'public, max-age={image_resize.RESIZE_MAX_AGE}')
+        self.assertEqual(stale['X-Cache'], 'MISS')
+
+    def test_invalid_parameters_are_rejected(self):
+        for url in [
+            '/media-resize/321x0/products/door.jpg',          # 不在尺寸白名单中
+            '/media-resize/0x0/products/door.jpg',
+            '/media-resize/9999x0/products/door.jpg',
+            '/media-resize/320x0/products/door.jpg?fit=stretch',
+            '/media-resize/320x0/products/door.jpg?fm=tiff',
+        ]:
+            self.assertEqual(self.get(url).status_code, 400, url)
+
+    def test_hidden_and_outside_paths_are_not_served(self):
+        for url in [
+            '/media-resize/320x0/.watermark/door.jpg',
+            '/media-resize/320x0/products/../.watermark/door.jpg',
+            '/media-resize/320x0/products/../../door.jpg',
+            '/media-resize/320x0/products/missing.jpg',
+            '/media-resize/320x0/products/door.txt',
+        ]:
+            self.assertEqual(self.get(url).status_code, 404, url)
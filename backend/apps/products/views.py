@@ -1,17 +1,48 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.permissions import IsAuthenticatedOrReadOnly, AllowAny, IsAdminUser
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.urls import replace_query_param
 from django.shortcuts import get_object_or_404
-from .models import Category, SubCategory, Product, ProductImage, ProductTemplate
+from django.db.models import Q
+from django.utils.http import parse_etags
+from .models import Category, SubCategory, Product, ProductImage, ProductTemplate, RelatedProduct
 from .serializers import (
     CategorySerializer, SubCategorySerializer, ProductSerializer, ProductDetailSerializer,
     TranslatedCategorySerializer, TranslatedSubCategorySerializer, TranslatedProductSerializer, TranslatedProductDetailSerializer,
     CategoryWithSubcategoriesSerializer, TranslatedCategoryWithSubcategoriesSerializer,
-    ProductImageSerializer
+    ProductImageSerializer, ProductCardSerializer, build_detail_context, translation_tables
 )
 from .template_serializers import ProductTemplateSerializer
 from .services import translation_service
+from .caching import cached_response
+from .search import product_search_index
+from .suggest import suggest_index
+from .facets import facet_index, filter_queryset_by_ids
+from .spec_ranges import spec_range_index
+from .pagination import ProductCursorPagination
+from .fieldsets import ProductFieldset, ALWAYS_COLUMNS, CARD_COLUMNS
+from .related import RELATED_LIMIT
+from .compare import COMPARE_MAX_IDS, cached_comparison
+from .pages import HOME_SECTIONS, build_page
+from .navigation import category_tree
+from .bulk import bulk_write_products
+from .exports import (
+    PRODUCT_EXPORT_COLUMNS, TRANSLATION_EXPORT_COLUMNS, TRANSLATED_MODELS,
+    get_export_format, streaming_export_response, filter_products, iter_product_rows, iter_translation_rows
+)
+
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+SUGGEST_LIMIT = 8
+SUGGEST_MAX_LIMIT = 20
+RELATED_DEFAULT_LIMIT = 4
+BATCH_MAX_IDS = 50
+
+# 返回产品列表的action，支持 ?view=card / ?fields= 稀疏字段集
+PRODUCT_LIST_ACTIONS = ['list', 'featured', 'search']
 
 
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -40,27 +71,48 @@ class CategoryViewSet(viewsets.ModelViewSet):
         context['language'] = self.request.query_params.get('lang', 'zh')
         return context
     
+    def get_queryset(self):
+        """带子分类输出时一次预取子分类"""
+        queryset = super().get_queryset()
+        if self.request.query_params.get('include_subcategories', 'false').lower() == 'true':
+            queryset = queryset.prefetch_related('subcategories')
+        return queryset
+    
+    @cached_response('categories.list', ['categories', 'translations'])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @action(detail=False, methods=['get'])
+    def tree(self, request):
+        """导航分类树（分类 -> 激活子分类 -> 激活产品数量），内容未变化时返回304"""
+        etag, tree = category_tree.get(request.query_params.get('lang', 'zh'), request)
+        # 弱比较：压缩中间件会把ETag改为弱ETag
+        if etag in [tag.removeprefix('W/') for tag in parse_etags(request.headers.get('If-None-Match', ''))]:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response({'results': tree})
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
+    
     @action(detail=True, methods=['get'])
+    @cached_response('categories.products', ['products', 'categories', 'translations'])
     def products(self, request, pk=None):
         """获取分类下的产品"""
         category = self.get_object()
-        products = Product.objects.filter(
+        language = request.query_params.get('lang', 'zh')
+        fieldset = ProductFieldset(request.query_params, language)
+        products = fieldset.optimize(Product.objects.filter(
             category=category, 
             is_active=True
-        ).order_by('order', '-created_at')
+        ))
+        paginator = ProductCursorPagination()
+        page = paginator.paginate_queryset(products, request, view=self)
         
-        # 检查是否需要翻译
-        language = request.query_params.get('lang', 'zh')
-        if language != 'zh':
-            serializer = TranslatedProductSerializer(
-                products, 
-                many=True, 
-                context={'language': language}
-            )
-        else:
-            serializer = ProductSerializer(products, many=True)
+        # 按语言和字段集选择序列化器
+        serializer = fieldset.serializer_class()(page, many=True, context=fieldset.context())
         
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
     
     @action(detail=True, methods=['get'])
     def subcategories(self, request, pk=None):
@@ -105,26 +157,23 @@ class SubCategoryViewSet(viewsets.ModelViewSet):
         return context
     
     @action(detail=True, methods=['get'])
+    @cached_response('subcategories.products', ['products', 'categories', 'translations'])
     def products(self, request, pk=None):
         """获取子分类下的产品"""
         subcategory = self.get_object()
-        products = Product.objects.filter(
+        language = request.query_params.get('lang', 'zh')
+        fieldset = ProductFieldset(request.query_params, language)
+        products = fieldset.optimize(Product.objects.filter(
             subcategory=subcategory, 
             is_active=True
-        ).order_by('order', '-created_at')
+        ))
+        paginator = ProductCursorPagination()
+        page = paginator.paginate_queryset(products, request, view=self)
         
-        # 检查是否需要翻译
-        language = request.query_params.get('lang', 'zh')
-        if language != 'zh':
-            serializer = TranslatedProductSerializer(
-                products, 
-                many=True, 
-                context={'language': language}
-            )
-        else:
-            serializer = ProductSerializer(products, many=True)
+        # 按语言和字段集选择序列化器
+        serializer = fieldset.serializer_class()(page, many=True, context=fieldset.context())
         
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
 
 
 class ProductViewSet(viewsets.ModelViewSet):
@@ -132,6 +181,13 @@ class ProductViewSet(viewsets.ModelViewSet):
     queryset = Product.objects.filter(is_active=True).order_by('order', '-created_at')
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = ProductCursorPagination
+    
+    def get_fieldset(self):
+        """列表类action的字段集（?view=card / ?fields=）"""
+        if not hasattr(self, '_fieldset'):
+            self._fieldset = ProductFieldset(self.request.query_params, self.request.query_params.get('lang', 'zh'))
+        return self._fieldset
     
     def get_serializer_class(self):
         """根据action和语言参数选择序列化器"""
@@ -142,6 +198,9 @@ class ProductViewSet(viewsets.ModelViewSet):
                 return TranslatedProductDetailSerializer
             return ProductDetailSerializer
         
+        if self.action in PRODUCT_LIST_ACTIONS:
+            return self.get_fieldset().serializer_class()
+        
         if language != 'zh':
             return TranslatedProductSerializer
         
@@ -151,12 +210,18 @@ class ProductViewSet(viewsets.ModelViewSet):
         """添加语言参数到序列化器上下文"""
         context = super().get_serializer_context()
         context['language'] = self.request.query_params.get('lang', 'zh')
+        if self.action in PRODUCT_LIST_ACTIONS:
+            context.update(self.get_fieldset().context())
         return context
     
     def get_queryset(self):
         """过滤查询集"""
         queryset = super().get_queryset()
         
+        # 列表只查询输出需要的列和关联
+        if self.action in PRODUCT_LIST_ACTIONS:
+            queryset = self.get_fieldset().optimize(queryset)
+        
         # 按分类过滤
         category_id = self.request.query_params.get('category')
         if category_id:
@@ -167,57 +232,228 @@ class ProductViewSet(viewsets.ModelViewSet):
         if subcategory_id:
             queryset = queryset.filter(subcategory_id=subcategory_id)
         
-        # 按推荐状态过滤
-        featured = self.request.query_params.get('featured')
+        # 按推荐状态过滤（is_featured 为兼容参数名）
+        featured = self.request.query_params.get('featured', self.request.query_params.get('is_featured'))
         if featured is not None:
             featured = featured.lower() == 'true'
             queryset = queryset.filter(is_featured=featured)
         
+        # 按属性过滤（牌号/状态/表面处理/颜色），由内存倒排索引求交集
+        attribute_filters = facet_index.parse_filters(self.request.query_params)
+        if attribute_filters:
+            queryset = filter_queryset_by_ids(queryset, facet_index.filter_ids(attribute_filters))
+        
+        # 按规格数值范围过滤（spec_range=名称:最小值:最大值[:单位]）
+        spec_ranges = self._spec_ranges()
+        if spec_ranges:
+            queryset = filter_queryset_by_ids(queryset, spec_range_index.filter_ids(spec_ranges))
+        
         return queryset
     
+    def _spec_ranges(self):
+        try:
+            return spec_range_index.parse_ranges(self.request.query_params)
+        except ValueError:
+            raise ValidationError({'spec_range': '规格范围参数无效，格式为 名称:最小值:最大值[:单位]'})
+    
+    @cached_response('products.list', ['products', 'categories', 'templates', 'translations'])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @cached_response('products.detail', ['products', 'categories', 'templates', 'factory_images', 'translations'])
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
     @action(detail=False, methods=['get'])
+    @cached_response('products.featured', ['products', 'categories', 'translations'])
     def featured(self, request):
         """获取推荐产品"""
         products = self.get_queryset().filter(is_featured=True)
+        page = self.paginate_queryset(products)
         
-        # 检查是否需要翻译
-        language = request.query_params.get('lang', 'zh')
-        if language != 'zh':
-            serializer = TranslatedProductSerializer(
-                products, 
-                many=True, 
-                context={'language': language}
-            )
-        else:
-            serializer = self.get_serializer(products, many=True)
+        # 序列化器按语言和字段集选择（见 get_serializer_class）
+        serializer = self.get_serializer(page, many=True)
         
-        return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @cached_response('products.search', ['products', 'categories', 'translations'])
     def search(self, request):
-        """搜索产品"""
-        query = request.query_params.get('q', '')
+        """搜索产品（全文索引，按相关度排序并分页）"""
+        query = request.query_params.get('q', '').strip()
         if not query:
             return Response({'error': '请提供搜索关键词'}, status=status.HTTP_400_BAD_REQUEST)
         
-        products = self.get_queryset().filter(
-            name__icontains=query
-        ) | self.get_queryset().filter(
-            description__icontains=query
-        )
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+            page_size = min(max(int(request.query_params.get('page_size', SEARCH_PAGE_SIZE)), 1), SEARCH_MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({'error': '分页参数无效'}, status=status.HTTP_400_BAD_REQUEST)
+        offset = (page - 1) * page_size
         
-        # 检查是否需要翻译
-        language = request.query_params.get('lang', 'zh')
-        if language != 'zh':
-            serializer = TranslatedProductSerializer(
-                products, 
-                many=True, 
-                context={'language': language}
-            )
+        queryset = self.get_queryset()
+        result = product_search_index.search(query, offset, page_size, within=queryset)
+        if result is None:
+            # 索引不可用时回退到数据库模糊查询
+            queryset = queryset.filter(Q(name__icontains=query) | Q(description__icontains=query))
+            total = queryset.count()
+            products = list(queryset[offset:offset + page_size])
         else:
-            serializer = self.get_serializer(products, many=True)
+            total, ids = result
+            product_map = queryset.in_bulk(ids)
+            products = [product_map[pk] for pk in ids if pk in product_map]
         
-        return Response(serializer.data)
+        serializer = self.get_serializer(products, many=True)
+        url = request.build_absolute_uri()
+        return Response({
+            'count': total,
+            'next': replace_query_param(url, 'page', page + 1) if offset + page_size < total else None,
+            'previous': replace_query_param(url, 'page', page - 1) if page > 1 else None,
+            'results': serializer.data,
+        })
+
+    
+    @action(detail=False, methods=['get'])
+    @cached_response('products.batch', ['products', 'categories', 'templates', 'factory_images', 'translations'])
+    def batch(self, request):
+        """批量获取产品详情（?ids=1,2,3），与逐个调用详情接口的结果相同，按请求的顺序返回"""
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in request.query_params.get('ids', '').split(',') if pk.strip()))
+        except ValueError:
+            raise ValidationError({'ids': '产品ID必须为逗号分隔的整数'})
+        if not ids:
+            raise ValidationError({'ids': '请提供产品ID'})
+        if len(ids) > BATCH_MAX_IDS:
+            raise ValidationError({'ids': f'一次最多获取 {BATCH_MAX_IDS} 个产品'})
+        
+        language = request.query_params.get('lang', 'zh')
+        product_map = Product.objects.filter(is_active=True).select_related(
+            'category', 'subcategory', 'template'
+        ).prefetch_related(
+            'images', 'specification_items', 'feature_items', 'application_items'
+        ).in_bulk(ids)
+        products = [product_map[pk] for pk in ids if pk in product_map]
+        
+        context = self.get_serializer_context()
+        context.update(build_detail_context(products, language))
+        serializer_class = TranslatedProductDetailSerializer if language != 'zh' else ProductDetailSerializer
+        serializer = serializer_class(products, many=True, context=context)
+        return Response({
+            'results': serializer.data,
+            'missing': [pk for pk in ids if pk not in product_map],
+        })
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """批量创建/更新产品（请求体为产品列表或 {"items": [...]}）：带 id 或 slug 已存在时更新，否则创建
+
+        全部条目校验通过才写入；写入不逐条触发信号，结束后统一更新索引、缓存并在后台翻译。
+        """
+        items = request.data.get('items') if isinstance(request.data, dict) else request.data
+        created, updated = bulk_write_products(items)
+        return Response({
+            'created': created,
+            'updated': updated,
+            'count': len(created) + len(updated),
+        })
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        """流式导出产品（?output=csv|xlsx|ndjson），包括未启用的产品，规格为合并模板后的有效规格
+
+        过滤：category、subcategory（ID或slug）、is_active、date_from / date_to（更新日期），
+        ?lang= 时已翻译的字段导出译文。
+        """
+        output_format = get_export_format(request)
+        queryset = filter_products(Product.objects.all(), request.query_params)
+        language = request.query_params.get('lang')
+        rows = iter_product_rows(queryset, language if language != 'zh' else None)
+        return streaming_export_response(output_format, PRODUCT_EXPORT_COLUMNS, rows, 'products')
+    
+    @action(detail=False, methods=['get'])
+    def compare(self, request):
+        """产品规格对比（?ids=1,2,3）：规格为行、产品为列，值不一致的行标记 differs"""
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in request.query_params.get('ids', '').split(',') if pk.strip()))
+        except ValueError:
+            raise ValidationError({'ids': '产品ID必须为逗号分隔的整数'})
+        if len(ids) < 2:
+            raise ValidationError({'ids': '请至少提供两个产品ID'})
+        if len(ids) > COMPARE_MAX_IDS:
+            raise ValidationError({'ids': f'一次最多对比 {COMPARE_MAX_IDS} 个产品'})
+        
+        matrix, state, tag = cached_comparison(ids, request.query_params.get('lang', 'zh'), request)
+        response = Response(matrix)
+        response['X-Cache'] = state
+        response.cache_tag = tag
+        return response
+    
+    @action(detail=True, methods=['get'])
+    @cached_response('products.related', ['products', 'categories', 'translations'])
+    def related(self, request, pk=None):
+        """相关产品（预计算的近邻列表，按索引读取）"""
+        try:
+            limit = min(max(int(request.query_params.get('limit', RELATED_DEFAULT_LIMIT)), 1), RELATED_LIMIT)
+        except ValueError:
+            limit = RELATED_DEFAULT_LIMIT
+        product = get_object_or_404(Product.objects.only('id'), pk=pk, is_active=True)
+        links = list(
+            RelatedProduct.objects.filter(product=product, related__is_active=True)
+            .select_related('related', 'related__category')
+            .only('score', 'rank', *(f'related__{column}' for column in ALWAYS_COLUMNS + CARD_COLUMNS))
+            .order_by('rank')[:limit]
+        )
+        language = request.query_params.get('lang', 'zh')
+        serializer = ProductCardSerializer(
+            [link.related for link in links],
+            many=True,
+            context={
+                'language': language, 'request': request,
+                'translations': translation_tables(language, ['product', 'category']),
+            }
+        )
+        results = serializer.data
+        for item, link in zip(results, links):
+            item['score'] = link.score
+        return Response({'results': results})
+    
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """属性筛选：返回命中的产品ID及其他属性的实时分面计数"""
+        filters = facet_index.parse_filters(request.query_params, include_dimensions=True)
+        spec_ranges = self._spec_ranges()
+        base_ids = spec_range_index.filter_ids(spec_ranges) if spec_ranges else None
+        ids, facets = facet_index.facet(filters, base_ids=base_ids)
+        return Response({'count': len(ids), 'ids': ids, 'facets': facets})
+    
+    @action(detail=False, methods=['get'])
+    def spec_ranges(self, request):
+        """可按范围筛选的规格及其数值范围"""
+        return Response({'results': spec_range_index.summary()})
+    
+    @action(detail=False, methods=['get'], authentication_classes=[], permission_classes=[AllowAny])
+    def suggest(self, request):
+        """搜索框输入联想（进程内前缀索引，不访问数据库）"""
+        query = request.query_params.get('q', '')
+        language = request.query_params.get('lang', 'zh')
+        try:
+            limit = min(max(int(request.query_params.get('limit', SUGGEST_LIMIT)), 1), SUGGEST_MAX_LIMIT)
+        except ValueError:
+            limit = SUGGEST_LIMIT
+        return Response({'query': query, 'results': suggest_index.suggest(query, language, limit)})
+
+
+class PageViewSet(viewsets.ViewSet):
+    """页面聚合视图集 - 首屏所需的各区块一次返回"""
+    
+    @action(detail=False, methods=['get'])
+    def home(self, request):
+        """首页：工厂图片、推荐产品、分类树、友情链接和前端翻译"""
+        data, states, tag = build_page(HOME_SECTIONS, request, request.query_params.get('lang', 'zh'))
+        response = Response(data)
+        response['X-Cache'] = ','.join(f'{name}={state}' for name, state in states.items())
+        response.cache_tag = tag
+        return response
 
 
 class ProductImageViewSet(viewsets.ModelViewSet):
@@ -271,6 +507,20 @@ class TranslationViewSet(viewsets.ViewSet):
         content = translation_service.get_all_frontend_content(language)
         return Response({'content': content})
     
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        """流式导出某一语言的 原文/译文 对照（?lang=&model=product,category,subcategory&output=csv|xlsx|ndjson）"""
+        output_format = get_export_format(request)
+        language = request.query_params.get('lang')
+        if not language:
+            raise ValidationError({'lang': '请指定导出的语言'})
+        model_names = [name for name in request.query_params.get('model', '').split(',') if name]
+        invalid = [name for name in model_names if name not in TRANSLATED_MODELS]
+        if invalid:
+            raise ValidationError({'model': f'模型必须为 {"/".join(TRANSLATED_MODELS)}'})
+        rows = iter_translation_rows(language, model_names)
+        return streaming_export_response(output_format, TRANSLATION_EXPORT_COLUMNS, rows, f'translations-{language}')
+    
     @action(detail=False, methods=['get'])
     def translate_frontend(self, request):
         """翻译前端内容"""